@@ -1,23 +1,38 @@
 import datetime
 import os
+import numpy as np
 import pandas as pd
 import json
 import re
-from websocket import create_connection
 import random
 import string
-import gspread
-from google.oauth2.service_account import Credentials
+from sheets_client import get_sheets_client
 
 class Interval:
     min_30 = "30"
 
+# Backfill defaults
+BACKFILL_CHUNK_BARS = 5000           # bars per request (create_series / request_more_data)
+BACKFILL_MAX_RETRIES = 3             # reconnects after a failed page
+BACKFILL_MAX_GAP = datetime.timedelta(days=5)  # largest gap allowed between two chunks (weekends, holidays)
+BAR_COLUMNS = ["open", "high", "low", "close", "volume"]
+
 class TradingViewData:
     __ws_headers = json.dumps({"Origin": "https://data.tradingview.com"})
     __ws_timeout = 5
+    ws_url = "wss://data.tradingview.com/socket.io/websocket"
 
-    def __init__(self) -> None:
+    def __init__(self, ws_url=None, ws_timeout=None, connect=None) -> None:
+        """
+        ws_url: websocket endpoint (e.g. a local replay server for tests).
+        connect: connection factory connect(url, headers, timeout) returning an object
+            with send(str) / recv() -> str / close(); defaults to websocket.create_connection.
+        """
         self.ws = None
+        if ws_url is not None:
+            self.ws_url = ws_url
+        self.ws_timeout = ws_timeout or self.__ws_timeout
+        self.connect = connect
         self.session = self.__generate_session()
         self.chart_session = self.__generate_chart_session()
 
@@ -30,12 +45,24 @@ class TradingViewData:
         return "cs_" + ''.join(random.choices(string.ascii_lowercase, k=12))
 
     def __create_connection(self):
-        self.ws = create_connection(
-            "wss://data.tradingview.com/socket.io/websocket", 
-            headers=self.__ws_headers, 
-            timeout=self.__ws_timeout
+        connect = self.connect
+        if connect is None:
+            from websocket import create_connection as connect
+
+        self.ws = connect(
+            self.ws_url,
+            headers=self.__ws_headers,
+            timeout=self.ws_timeout
         )
 
+    def __close_connection(self):
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+
     def __send_message(self, func, args):
         message = json.dumps({"m": func, "p": args}, separators=(",", ":"))
         self.ws.send(f"~m~{len(message)}~m~{message}")
@@ -92,18 +119,231 @@ class TradingViewData:
         days = (now - start_date).days
         return int(days * bars_per_day)
 
+    @staticmethod
+    def parse_frames(raw):
+        """
+        Splits a websocket message into its "~m~<length>~m~<payload>" frames.
+        """
+        frames = []
+        position = 0
+        while raw.startswith("~m~", position):
+            length_end = raw.index("~m~", position + 3)
+            length = int(raw[position + 3:length_end])
+            start = length_end + 3
+            frames.append(raw[start:start + length])
+            position = start + length
+        return frames
+
+    def __receive_messages(self):
+        """
+        Yields the JSON messages of the connection; heartbeats ("~h~<n>") are answered.
+        """
+        while True:
+            for frame in self.parse_frames(self.ws.recv()):
+                if frame.startswith("~h~"):
+                    self.ws.send(f"~m~{len(frame)}~m~{frame}")
+                    continue
+                try:
+                    message = json.loads(frame)
+                except ValueError:
+                    continue
+                if isinstance(message, dict) and "m" in message:
+                    yield message
+
+    def __request_page(self, interval, count, first):
+        """
+        Loads one chunk: the newest `count` bars (first request) or `count`
+        bars further back, and waits for series_completed.
+
+        Returns:
+            list: Bars as [timestamp, open, high, low, close, volume].
+        """
+        if first:
+            self.__send_message("create_series", [
+                self.chart_session, "s1", "s1", "symbol_1", interval, count
+            ])
+        else:
+            self.__send_message("request_more_data", [self.chart_session, "s1", count])
+
+        bars = []
+        for message in self.__receive_messages():
+            method, params = message["m"], message.get("p", [])
+            if method in ("symbol_error", "series_error", "critical_error", "protocol_error"):
+                raise RuntimeError(f"TradingView {method}: {params}")
+            if method == "timescale_update" and len(params) > 1:
+                for bar in params[1].get("s1", {}).get("s", []):
+                    values = list(bar["v"][:6])
+                    bars.append(values + [np.nan] * (6 - len(values)))
+            if method == "series_completed":
+                return bars
+
+    @staticmethod
+    def backfill_paths(store_dir, symbol, exchange, interval):
+        """
+        Checkpoint file and chunk directory of one symbol's backfill.
+        """
+        name = f"{exchange}_{symbol}_{interval}"
+        return os.path.join(store_dir, f"{name}.checkpoint.json"), os.path.join(store_dir, name)
+
+    @staticmethod
+    def __write_checkpoint(path, checkpoint):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def __merge_ranges(ranges):
+        merged = []
+        for low, high in sorted(ranges):
+            if merged and low <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], high)
+            else:
+                merged.append([low, high])
+        return merged
+
+    def backfill(self, symbol, exchange, store_dir, start_date, interval=Interval.min_30,
+                 chunk_bars=BACKFILL_CHUNK_BARS, max_retries=BACKFILL_MAX_RETRIES, max_gap=BACKFILL_MAX_GAP):
+        """
+        Downloads the history back to start_date in chunks of chunk_bars, paging
+        backward with request_more_data, and writes every chunk to
+        store_dir/<exchange>_<symbol>_<interval>/chunk_<n>.npz (columnar arrays).
+
+        A checkpoint lists the time ranges already stored. It is updated after
+        every chunk, so an interrupted run resumes: paging stops as soon as the
+        received bars join a stored range that already reaches start_date (or
+        the start of the history), and stored bars are not written again. The
+        same makes later runs fetch only the bars added since.
+
+        Bars must be strictly increasing, every chunk must end right before the
+        previous one started, and no two consecutive bars may be more than
+        max_gap apart; a failed or discontinuous page reconnects and retries up
+        to max_retries times.
+
+        Returns:
+            pandas.DataFrame: The stored bars from start_date on (see load_backfill).
+        """
+        checkpoint_path, chunk_dir = self.backfill_paths(store_dir, symbol, exchange, interval)
+        os.makedirs(chunk_dir, exist_ok=True)
+        checkpoint = {"ranges": [], "chunks": 0, "history_start": None}
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+
+        start_ts = int(pd.Timestamp(start_date).timestamp())
+        for attempt in range(max_retries + 1):
+            try:
+                self.__backfill_session(symbol, exchange, interval, chunk_bars, max_gap, start_ts,
+                                        checkpoint, checkpoint_path, chunk_dir)
+                break
+            except Exception as e:
+                if attempt >= max_retries:
+                    raise RuntimeError(f"Backfill of {exchange}:{symbol} failed after {attempt + 1} attempts: {e}")
+                print(f"Backfill of {exchange}:{symbol} interrupted ({e}); resuming from checkpoint.")
+            finally:
+                self.__close_connection()
+
+        return self.load_backfill(store_dir, symbol, exchange, interval, start_date)
+
+    def __backfill_session(self, symbol, exchange, interval, chunk_bars, max_gap, start_ts,
+                           checkpoint, checkpoint_path, chunk_dir):
+        self.__create_connection()
+        self.__send_message("chart_create_session", [self.chart_session, ""])
+        self.__send_message("resolve_symbol", [
+            self.chart_session, "symbol_1", f'={{"symbol":"{exchange}:{symbol}"}}'
+        ])
+
+        newest_seen = oldest_seen = None
+        first = True
+        while True:
+            bars = self.__request_page(interval, chunk_bars, first)
+            first = False
+
+            # Only bars older than everything received in this session are new
+            page = np.array(bars, dtype=np.float64).reshape(-1, 6)
+            if oldest_seen is not None:
+                page = page[page[:, 0] < oldest_seen]
+            if not len(page):
+                # Nothing older: the start of the available history
+                if oldest_seen is not None:
+                    checkpoint["history_start"] = oldest_seen
+                    self.__write_checkpoint(checkpoint_path, checkpoint)
+                return
+
+            # Continuity: strictly increasing within the chunk, and joining the previous chunk
+            times = page[:, 0].astype(np.int64)
+            steps = np.diff(np.append(times, oldest_seen)) if oldest_seen is not None else np.diff(times)
+            if (steps <= 0).any():
+                raise RuntimeError("bars within a chunk are not strictly increasing")
+            if (steps > max_gap.total_seconds()).any():
+                at = int(times[np.argmax(steps > max_gap.total_seconds())])
+                raise RuntimeError(f"gap of more than {max_gap} in the data after {datetime.datetime.fromtimestamp(at)}")
+            newest_seen = int(times[-1]) if newest_seen is None else newest_seen
+            oldest_seen = int(times[0])
+
+            # Write the bars not stored yet, then record the session's span as stored
+            stored = np.zeros(len(times), dtype=bool)
+            for low, high in checkpoint["ranges"]:
+                stored |= (times >= low) & (times <= high)
+            if not stored.all():
+                new = page[~stored]
+                chunk_path = os.path.join(chunk_dir, f"chunk_{checkpoint['chunks']:06d}.npz")
+                tmp_path = f"{chunk_path}.tmp.npz"
+                np.savez(tmp_path, time=new[:, 0].astype(np.int64),
+                         **{column: new[:, i + 1] for i, column in enumerate(BAR_COLUMNS)})
+                os.replace(tmp_path, chunk_path)
+                checkpoint["chunks"] += 1
+            checkpoint["ranges"] = self.__merge_ranges(checkpoint["ranges"] + [[oldest_seen, newest_seen]])
+            self.__write_checkpoint(checkpoint_path, checkpoint)
+
+            # Done once the stored range we are in reaches start_date or the start of the history
+            current = next(r for r in checkpoint["ranges"] if r[0] <= oldest_seen <= r[1])
+            history_start = checkpoint.get("history_start")
+            if current[0] <= start_ts or (history_start is not None and current[0] <= history_start):
+                return
+
+    def load_backfill(self, store_dir, symbol, exchange, interval=Interval.min_30, start_date=None):
+        """
+        Reads the stored chunks of a symbol into one sorted frame
+        (same columns as get_hist), dropping duplicate bars.
+        """
+        _, chunk_dir = self.backfill_paths(store_dir, symbol, exchange, interval)
+        names = sorted(name for name in os.listdir(chunk_dir)
+                       if name.startswith("chunk_") and name.endswith(".npz") and ".tmp" not in name) \
+            if os.path.isdir(chunk_dir) else []
+        if not names:
+            return pd.DataFrame(columns=["symbol", "datetime"] + BAR_COLUMNS)
+
+        columns = {column: [] for column in ["time"] + BAR_COLUMNS}
+        for name in names:
+            with np.load(os.path.join(chunk_dir, name)) as chunk:
+                for column in columns:
+                    columns[column].append(chunk[column])
+        arrays = {column: np.concatenate(values) for column, values in columns.items()}
+
+        # Sort by time; later chunks win for duplicated bars
+        order = np.lexsort((np.arange(len(arrays["time"])), arrays["time"]))
+        times = arrays["time"][order]
+        keep = np.ones(len(times), dtype=bool)
+        keep[:-1] = times[1:] != times[:-1]
+        rows = order[keep]
+
+        data = pd.DataFrame({column: arrays[column][rows] for column in BAR_COLUMNS})
+        data.insert(0, "datetime", [datetime.datetime.fromtimestamp(int(ts)) for ts in arrays["time"][rows]])
+        data.insert(0, "symbol", symbol)
+        if start_date is not None:
+            data = data[data["datetime"] >= pd.Timestamp(start_date)].reset_index(drop=True)
+        return data
+
     def save_to_google_sheets(self, data, ticker, sheet_url, credentials_path):
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = Credentials.from_service_account_file(credentials_path, scopes=scope)
-        client = gspread.authorize(creds)
-        
-        sheet = client.open_by_url(sheet_url)
+        # Shared, rate-limited Google Sheets session
+        client = get_sheets_client(credentials_path)
+
+        sheet = client.spreadsheet(sheet_url)
         worksheet_name = f"{ticker}30"
-        try:
-            worksheet = sheet.worksheet(worksheet_name)
+        worksheet = client.worksheet(sheet_url, worksheet_name)
+        if worksheet is not None:
             sheet.del_worksheet(worksheet)
-        except gspread.exceptions.WorksheetNotFound:
-            pass
         worksheet = sheet.add_worksheet(title=worksheet_name, rows=str(len(data) + 1), cols="7")
 
         # Reformat datetime and reorder columns
@@ -1,7 +1,6 @@
 import pandas as pd
 import numpy as np
-import gspread
-from google.oauth2.service_account import Credentials
+from sheets_client import get_sheets_client
 
 def calculate_indicators_for_dates(data, dates):
     """
@@ -60,19 +59,11 @@ def load_trading_data(sheet_url):
         pandas.DataFrame: Processed trading data
     """
     try:
-        scopes = ['https://www.googleapis.com/auth/spreadsheets', 
-                  'https://www.googleapis.com/auth/drive']
-        
-        credentials = Credentials.from_service_account_file(
-            r"C:\Users\Reio\Desktop\Folderid\Proge\Projektid\Stock analysis\fourth-gantry-443708-n2-48cba6184af8.json", 
-            scopes=scopes
+        client = get_sheets_client(
+            r"C:\Users\Reio\Desktop\Folderid\Proge\Projektid\Stock analysis\fourth-gantry-443708-n2-48cba6184af8.json"
         )
-        client = gspread.authorize(credentials)
-        
-        sheet = client.open_by_url(sheet_url)
-        worksheet = sheet.sheet1  # Assuming data is in the first sheet
         
-        all_values = worksheet.get_all_values()
+        all_values = client.get_all_values(sheet_url)  # Assuming data is in the first sheet
 
         headers = all_values[0]
         data_rows = all_values[1:]
@@ -97,9 +88,109 @@ def load_trading_data(sheet_url):
     except Exception:
         return None
 
+SMA_WINDOWS = [3, 5, 10, 20, 50, 100, 200]
+EMA_WINDOWS = [3, 5, 10, 20, 50, 100, 200]
+MACD_SPANS = (12, 26, 9)  # fast, slow, signal
+
+# Columns added by calculate_indicators
+INDICATOR_COLUMNS = (
+    [f'SMA_{window}' for window in SMA_WINDOWS]
+    + [f'EMA_{span}' for span in EMA_WINDOWS + list(MACD_SPANS[:2])]
+    + ['MACD_Line', 'MACD_Signal', 'MACD_Histogram', 'RSI']
+)
+
+# Largest decay exponent (natural log) covered by one EMA block, keeps d**-k far from overflow
+_EMA_LOG_RANGE = 200.0
+
+def sma_block(values, windows):
+    """
+    Simple moving averages for several windows from one cumulative sum.
+    Matches pandas rolling(window).mean(): NaN until a full window is available.
+    Agreement with pandas is within ~1e-12 relative for price-like data.
+
+    Parameters:
+        values (numpy.ndarray): 1-D float array without NaNs
+        windows (list): Window lengths
+
+    Returns:
+        numpy.ndarray: (bars x windows) float array
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full((n, len(windows)), np.nan)
+    # Cumulative sum of the deviations from the first value keeps the sums small
+    base = values[0] if n else 0.0
+    cumulative = np.empty(n + 1)
+    cumulative[0] = 0.0
+    np.cumsum(values - base, out=cumulative[1:])
+    for column, window in enumerate(windows):
+        if window <= n:
+            out[window - 1:, column] = (cumulative[window:] - cumulative[:-window]) / window + base
+    return out
+
+def ema_block(values, spans):
+    """
+    Exponential moving averages for several spans in one pass over a (bars x spans) array.
+    Same recurrence as pandas ewm(span=span, adjust=False).mean():
+        y[0] = x[0],  y[t] = (1 - a) * y[t-1] + a * x[t],  a = 2 / (span + 1)
+
+    The series is processed in blocks; inside a block the recurrence is solved in
+    closed form with one cumulative sum, so the work is a few vectorized operations
+    per block instead of one Python-level call per span.
+    The difference from pandas is an absolute one, within ~1e-14 times the
+    largest |value| of the series (~1e-13 on the MACD of prices around 100). It
+    is only that small relative to the result when the series stays away from
+    zero: MACD values near zero have shown ~5e-9 relative differences, so
+    compare with an absolute tolerance.
+
+    Parameters:
+        values (numpy.ndarray): 1-D float array without NaNs
+        spans (list): EMA spans
+
+    Returns:
+        numpy.ndarray: (bars x spans) float array
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    alpha = 2.0 / (np.asarray(spans, dtype=np.float64) + 1.0)
+    decay = 1.0 - alpha
+    out = np.empty((n, len(spans)))
+    if n == 0:
+        return out
+
+    block_length = int(max(1, min(n, _EMA_LOG_RANGE // np.max(-np.log(decay)))))
+    steps = np.arange(1, block_length + 1, dtype=np.float64)[:, None]
+    growth = decay ** -steps   # d**-(j+1)
+    shrink = decay ** steps    # d**(k+1)
+
+    carry = np.full(len(spans), values[0])  # y[-1] = x[0] gives y[0] = x[0]
+    for start in range(0, n, block_length):
+        chunk = values[start:start + block_length, None]
+        length = len(chunk)
+        scaled = np.cumsum(chunk * growth[:length], axis=0)
+        block = shrink[:length] * (carry + alpha * scaled)
+        out[start:start + length] = block
+        carry = block[-1]
+    return out
+
+def _rsi(close_series):
+    delta = close_series.diff()
+    up = delta.clip(lower=0)
+    down = -1 * delta.clip(upper=0)
+
+    ma_up = up.ewm(com=14-1, adjust=True, min_periods=14).mean()
+    ma_down = down.ewm(com=14-1, adjust=True, min_periods=14).mean()
+    rs = ma_up / ma_down
+    return 100.0 - (100.0 / (1.0 + rs))
+
 def calculate_indicators(data, close_column='Close'):
     """
     Calculate comprehensive technical indicators for the given DataFrame.
+
+    All SMA windows come from one cumulative sum and all EMA spans (including
+    the MACD ones) from one fused pass, see sma_block and ema_block.
+    Indicators are computed in float64 and stored in the dtype of the close
+    column, so compact (float32) input gives float32 indicators.
     
     Parameters:
         data (pandas.DataFrame): Input trading data
@@ -108,37 +199,144 @@ def calculate_indicators(data, close_column='Close'):
     Returns:
         pandas.DataFrame: DataFrame with added technical indicators
     """
-    df = data.copy()
-    
-    # SMA
-    sma_windows = [3, 5, 10, 20, 50, 100, 200]
-    for window in sma_windows:
-        df[f'SMA_{window}'] = df[close_column].rolling(window=window).mean()
-    
-    # EMA
-    ema_windows = [3, 5, 10, 20, 50, 100, 200]
-    for window in ema_windows:
-        df[f'EMA_{window}'] = df[close_column].ewm(span=window, adjust=False).mean()
-    
-    # MACD
-    df['EMA_12'] = df[close_column].ewm(span=12, adjust=False).mean()
-    df['EMA_26'] = df[close_column].ewm(span=26, adjust=False).mean()
-    df['MACD_Line'] = df['EMA_12'] - df['EMA_26']
-    df['MACD_Signal'] = df['MACD_Line'].ewm(span=9, adjust=False).mean()
-    df['MACD_Histogram'] = df['MACD_Line'] - df['MACD_Signal']
-    
+    close_series = data[close_column]
+    close = close_series.to_numpy(dtype=np.float64)
+    fast_span, slow_span, signal_span = MACD_SPANS
+    ema_spans = EMA_WINDOWS + [fast_span, slow_span]
+    columns = {}
+
+    if len(close) and np.isfinite(close).all():
+        # SMA
+        sma_values = sma_block(close, SMA_WINDOWS)
+        for column, window in enumerate(SMA_WINDOWS):
+            columns[f'SMA_{window}'] = sma_values[:, column]
+
+        # EMA (+ MACD fast/slow)
+        ema_values = ema_block(close, ema_spans)
+        for column, span in enumerate(ema_spans):
+            columns[f'EMA_{span}'] = ema_values[:, column]
+
+        # MACD
+        macd_line = columns[f'EMA_{fast_span}'] - columns[f'EMA_{slow_span}']
+        macd_signal = ema_block(macd_line, [signal_span])[:, 0]
+    else:
+        # NaNs (or no rows): keep the exact pandas NaN handling
+        for window in SMA_WINDOWS:
+            columns[f'SMA_{window}'] = close_series.rolling(window=window).mean().to_numpy()
+        for span in ema_spans:
+            columns[f'EMA_{span}'] = close_series.ewm(span=span, adjust=False).mean().to_numpy()
+        macd_line = columns[f'EMA_{fast_span}'] - columns[f'EMA_{slow_span}']
+        macd_signal = pd.Series(macd_line).ewm(span=signal_span, adjust=False).mean().to_numpy()
+
+    columns['MACD_Line'] = macd_line
+    columns['MACD_Signal'] = macd_signal
+    columns['MACD_Histogram'] = macd_line - macd_signal
+
     # RSI
-    delta = df[close_column].diff()
-    up = delta.clip(lower=0)
-    down = -1 * delta.clip(upper=0)
+    columns['RSI'] = _rsi(close_series).to_numpy()
 
-    ma_up = up.ewm(com=14-1, adjust=True, min_periods=14).mean()
-    ma_down = down.ewm(com=14-1, adjust=True, min_periods=14).mean()
-    rs = ma_up / ma_down
-    df['RSI'] = 100.0 - (100.0 / (1.0 + rs))
-    
+    output_dtype = close_series.dtype if close_series.dtype == np.float32 else np.float64
+    indicators = pd.DataFrame(columns, index=data.index).astype(output_dtype, copy=False)
+    if indicators.columns.intersection(data.columns).empty:
+        return pd.concat([data, indicators], axis=1)
+
+    # Recalculating: overwrite the existing indicator columns in place
+    df = data.copy()
+    for name in indicators.columns:
+        df[name] = indicators[name]
     return df
 
+# Signals compared at the same bar: name -> (left column, right column or constant, operator)
+LEVEL_SIGNALS = {
+    'sma_10_above_20': ('SMA_10', 'SMA_20', '>'),
+    'sma_20_above_50': ('SMA_20', 'SMA_50', '>'),
+    'sma_50_above_100': ('SMA_50', 'SMA_100', '>'),
+    'sma_100_above_200': ('SMA_100', 'SMA_200', '>'),
+    'ema_10_above_20': ('EMA_10', 'EMA_20', '>'),
+    'ema_20_above_50': ('EMA_20', 'EMA_50', '>'),
+    'ema_50_above_100': ('EMA_50', 'EMA_100', '>'),
+    'ema_100_above_200': ('EMA_100', 'EMA_200', '>'),
+    'macd_above_signal': ('MACD_Line', 'MACD_Signal', '>'),
+    'macd_positive': ('MACD_Line', 0, '>'),
+    'rsi_oversold': ('RSI', 30, '<'),
+    'rsi_overbought': ('RSI', 70, '>'),
+    'price_above_sma_50': ('Close', 'SMA_50', '>'),
+    'price_above_ema_50': ('Close', 'EMA_50', '>'),
+}
+
+# Crossovers between the previous and the current bar: name -> (fast column, slow column, direction)
+CROSS_SIGNALS = {
+    'sma_golden_cross': ('SMA_50', 'SMA_200', 'up'),
+    'sma_death_cross': ('SMA_50', 'SMA_200', 'down'),
+    'ema_golden_cross': ('EMA_50', 'EMA_200', 'up'),
+    'ema_death_cross': ('EMA_50', 'EMA_200', 'down'),
+}
+
+SIGNAL_NAMES = list(LEVEL_SIGNALS) + list(CROSS_SIGNALS)
+
+def _level_signal(left, right, operator):
+    return left > right if operator == '>' else left < right
+
+def _cross_signal(fast, slow, fast_prev, slow_prev, direction):
+    if direction == 'up':
+        return (fast > slow) & (fast_prev <= slow_prev)
+    return (fast < slow) & (fast_prev >= slow_prev)
+
+def _signal_arrays(columns, prev_columns):
+    """
+    Evaluates every signal on aligned NumPy arrays.
+    Comparisons with NaN are False, exactly like the scalar comparisons.
+
+    Args:
+        columns (dict): Column name -> array of current values.
+        prev_columns (dict): Column name -> array of previous-bar values.
+
+    Returns:
+        dict: Signal name -> boolean array
+    """
+    signals = {}
+    with np.errstate(invalid='ignore'):
+        for name, (left, right, operator) in LEVEL_SIGNALS.items():
+            right_values = columns[right] if isinstance(right, str) else right
+            signals[name] = _level_signal(columns[left], right_values, operator)
+        for name, (fast, slow, direction) in CROSS_SIGNALS.items():
+            signals[name] = _cross_signal(
+                columns[fast], columns[slow], prev_columns[fast], prev_columns[slow], direction
+            )
+    return signals
+
+def _signal_input_columns():
+    names = set()
+    for left, right, _ in LEVEL_SIGNALS.values():
+        names.add(left)
+        if isinstance(right, str):
+            names.add(right)
+    for fast, slow, _ in CROSS_SIGNALS.values():
+        names.update((fast, slow))
+    return sorted(names)
+
+def get_signal_columns(df):
+    """
+    Vectorized trading signals over the whole history.
+
+    Parameters:
+        df (pandas.DataFrame): DataFrame with technical indicators
+
+    Returns:
+        pandas.DataFrame: One boolean column per signal, aligned with df's index.
+                          Crossovers are False on the first row.
+    """
+    columns = {name: df[name].to_numpy(dtype=float) for name in _signal_input_columns()}
+    prev_columns = {}
+    for name, values in columns.items():
+        prev = np.empty_like(values)
+        prev[:1] = np.nan
+        prev[1:] = values[:-1]
+        prev_columns[name] = prev
+
+    signals = _signal_arrays(columns, prev_columns)
+    return pd.DataFrame(signals, index=df.index, columns=SIGNAL_NAMES)
+
 def get_trading_signals(df):
     """
     Generate trading signals based on technical indicators.
@@ -149,47 +347,53 @@ def get_trading_signals(df):
     Returns:
         dict: Dictionary of trading signals and conditions
     """
-    signals = {}
-    last_row = df.iloc[-1]
-    
-    # SMA Signals
-    signals['sma_10_above_20'] = last_row['SMA_10'] > last_row['SMA_20']
-    signals['sma_20_above_50'] = last_row['SMA_20'] > last_row['SMA_50']
-    signals['sma_50_above_100'] = last_row['SMA_50'] > last_row['SMA_100']
-    signals['sma_100_above_200'] = last_row['SMA_100'] > last_row['SMA_200']
-    
-    # EMA Signals
-    signals['ema_10_above_20'] = last_row['EMA_10'] > last_row['EMA_20']
-    signals['ema_20_above_50'] = last_row['EMA_20'] > last_row['EMA_50']
-    signals['ema_50_above_100'] = last_row['EMA_50'] > last_row['EMA_100']
-    signals['ema_100_above_200'] = last_row['EMA_100'] > last_row['EMA_200']
-    
-    # MACD Signals
-    signals['macd_above_signal'] = last_row['MACD_Line'] > last_row['MACD_Signal']
-    signals['macd_positive'] = last_row['MACD_Line'] > 0
-    
-    # RSI Signals
-    signals['rsi_oversold'] = last_row['RSI'] < 30
-    signals['rsi_overbought'] = last_row['RSI'] > 70
-    
-    # Price vs Moving Averages
-    signals['price_above_sma_50'] = last_row['Close'] > last_row['SMA_50']
-    signals['price_above_ema_50'] = last_row['Close'] > last_row['EMA_50']
-    
-    # Crossover Signals (need at least 2 rows)
-    if len(df) > 1:
-        prev_row = df.iloc[-2]
-        signals['sma_golden_cross'] = (last_row['SMA_50'] > last_row['SMA_200']) and (prev_row['SMA_50'] <= prev_row['SMA_200'])
-        signals['sma_death_cross'] = (last_row['SMA_50'] < last_row['SMA_200']) and (prev_row['SMA_50'] >= prev_row['SMA_200'])
-        signals['ema_golden_cross'] = (last_row['EMA_50'] > last_row['EMA_200']) and (prev_row['EMA_50'] <= prev_row['EMA_200'])
-        signals['ema_death_cross'] = (last_row['EMA_50'] < last_row['EMA_200']) and (prev_row['EMA_50'] >= prev_row['EMA_200'])
-    else:
-        signals['sma_golden_cross'] = False
-        signals['sma_death_cross'] = False
-        signals['ema_golden_cross'] = False
-        signals['ema_death_cross'] = False
-    
-    return signals
+    return get_signal_columns(df.iloc[-2:]).iloc[-1].to_dict()
+
+def screen_universe(universe):
+    """
+    Evaluate the latest trading signals for a whole universe in one batched pass.
+
+    Only the last two rows of each ticker are needed; they are stacked into one
+    (rows x columns) array with a single concat, split into (tickers x columns)
+    current and previous arrays, and every signal is computed once for all tickers.
+
+    Parameters:
+        universe (dict): Ticker -> DataFrame. Indicators are calculated for
+                         frames that do not have them yet.
+
+    Returns:
+        pandas.DataFrame: Boolean matrix with one row per ticker and one column per signal.
+    """
+    tickers = list(universe)
+    input_columns = _signal_input_columns()
+    current = np.full((len(tickers), len(input_columns)), np.nan)
+    previous = np.full((len(tickers), len(input_columns)), np.nan)
+
+    tails = []
+    positions = []
+    for position, ticker in enumerate(tickers):
+        df = universe[ticker]
+        if df is None or df.empty:
+            continue
+        if 'EMA_10' not in df.columns:
+            df = calculate_indicators(df)
+        tails.append(df.iloc[-2:])
+        positions.append(position)
+
+    if tails:
+        stacked = pd.concat(tails, ignore_index=True)[input_columns].to_numpy(dtype=float)
+        lengths = np.array([len(tail) for tail in tails])
+        positions = np.array(positions)
+        last_rows = np.cumsum(lengths) - 1
+        current[positions] = stacked[last_rows]
+        # A ticker with a single row has no previous bar; its crossovers stay False
+        has_previous = lengths > 1
+        previous[positions[has_previous]] = stacked[last_rows[has_previous] - 1]
+
+    current = dict(zip(input_columns, current.T))
+    previous = dict(zip(input_columns, previous.T))
+    signals = _signal_arrays(current, previous)
+    return pd.DataFrame(signals, index=pd.Index(tickers, name='Ticker'), columns=SIGNAL_NAMES)
 
 def main(sheet_url):
     """
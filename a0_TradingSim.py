@@ -1,12 +1,24 @@
-from price_entry_tradesize import BudgetManager, entry_conditions, calculate_trade_size
+from price_entry_tradesize import (
+    BudgetManager,
+    CONDITIONS_LIBRARY,
+    contribution_calendar,
+    entry_conditions,
+    liquidity_conditions,
+    calculate_trade_size
+)
+from indicator_conditions import vectorized_conditions
 from data_loader import load_data
 from Indicators import calculate_indicators
-from user_io import get_user_inputs, final_summary, trade_summary
+from user_io import get_user_inputs, summary_metrics, print_summary_metrics, trade_summary, VERBOSITY_ADJUSTMENTS
+from result_cache import ResultCache, backtest_key
+from time_index import TimeIndex, rows_from, sorted_by_time
+from trade_ledger import TradeLedger
 from adjust_positions import (
     set_adjusted_for_new_position,
     set_adjusted_for_partial_sale,
     update_all_positions
 )
+import numpy as np
 import pandas as pd
 import trades_to_sheets
 
@@ -18,70 +30,357 @@ CREDENTIALS_PATH = r"fourth-gantry file"
 DAILY_SHEET_NAME = "Sheet1"      # daily sheet containing 'Stock' column
 INTRADAY_SHEET_NAME = "VRT30"   # or "TSLA30", "MSFT30", etc.
 
-def get_new_key(trade_dict):
+# "both" loads both sheets, "intraday" derives the daily bars from the intraday sheet
+DATA_SOURCE = "both"
+
+# Load float32 / categorical frames to save memory (see data_loader.compact_dtypes)
+COMPACT_FRAMES = False
+
+# "daily": enter at the daily Open (daily indicators); "intraday": enter at the Open of
+# any intraday bar, with the entry conditions evaluated on indicators of the intraday bars
+ENTRY_MODE = "daily"
+
+# Rows downloaded from the sheets are kept here; later runs only fetch the new rows (None: always full download)
+SHEET_CACHE_DIR = ".sheet_cache"
+
+# First daily date included in the simulation
+SIMULATION_START_DATE = '2024-01-01'
+
+# Reuse results of identical runs stored on local disk
+USE_RESULT_CACHE = True
+RESULT_CACHE_DIR = ".backtest_cache"
+
+# Continue the previous run from this state file (None: always run from scratch)
+INCREMENTAL_STATE_PATH = None
+
+# Stream the intraday bars month by month from this local store and write the closed
+# trades to CHUNKED_LEDGER_PATH (see chunked_simulation; None: all bars in memory)
+INTRADAY_STORE_DIR = None
+CHUNKED_LEDGER_PATH = "trade_ledger.pkl"
+
+# Trade summary detail (user_io.VERBOSITY_*; VERBOSITY_OFF for headless runs) and format ("text", "csv", "json")
+TRADE_SUMMARY_VERBOSITY = VERBOSITY_ADJUSTMENTS
+TRADE_SUMMARY_FORMAT = "text"
+
+class OpenPositions(dict):
     """
-    Generate the next numeric key for the dictionary.
+    Open positions (trade id -> trade) that also keep them grouped by ticker,
+    stage (before / after the partial sale) and adjusted SL/PT. Positions of a
+    group exit on exactly the same bars, so check_exits tests one threshold
+    pair per group and only visits the positions of groups that trigger.
+
+    The groups are rebuilt after positions are added or removed; code that
+    changes adjusted_SL / adjusted_PT outside open_trade and check_exits must
+    call invalidate_groups().
     """
-    return max(trade_dict.keys(), default=0) + 1
 
-def trading_loop():
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._groups = None
+
+    def invalidate_groups(self):
+        self._groups = None
+
+    def exit_groups(self):
+        """
+        Returns:
+            list: (adjusted_SL, adjusted_PT, keys in insertion order) per group.
+        """
+        if self._groups is None:
+            groups = {}
+            for key, position in self.items():
+                group = (position["ticker"], position["partial_sale_done"],
+                         position["adjusted_SL"], position["adjusted_PT"])
+                groups.setdefault(group, []).append(key)
+            self._groups = [(group[2], group[3], keys) for group, keys in groups.items()]
+        return self._groups
+
+    def triggered_keys(self, open_price, low_price, high_price):
+        """
+        Keys (in insertion order) of the positions whose SL or PT the bar reaches.
+        """
+        triggered = [
+            keys for sl_price, pt_price, keys in self.exit_groups()
+            if open_price <= sl_price or low_price < sl_price or open_price >= pt_price or high_price > pt_price
+        ]
+        if len(triggered) <= 1:
+            return list(triggered[0]) if triggered else []
+        order = {key: i for i, key in enumerate(self)}
+        return sorted((key for keys in triggered for key in keys), key=order.__getitem__)
+
+    def exit_thresholds(self):
+        """
+        (highest adjusted SL, lowest adjusted PT) over all positions.
+        """
+        groups = self.exit_groups()
+        return max(group[0] for group in groups), min(group[1] for group in groups)
+
+    def __setitem__(self, key, value):
+        self._groups = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._groups = None
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        self._groups = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self._groups = None
+        return super().popitem()
+
+    def clear(self):
+        self._groups = None
+        super().clear()
+
+    def update(self, *args, **kwargs):
+        self._groups = None
+        super().update(*args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        self._groups = None
+        return super().setdefault(key, default)
+
+class SimulationState:
     """
-    Simulates a basic trading loop by iterating over daily_data
-    for entry signals, and intraday data for SL/PT exits.
+    Everything the daily loop carries from one day to the next, so a run
+    can be stopped, persisted and continued later (see incremental.py).
     """
 
-    # Step 1: Load user inputs
-    user_inputs = get_user_inputs()
-
-    # Step 2: Initialize BudgetManager
-    budget_manager = BudgetManager(
-        starting_capital=user_inputs["starting_capital"],
-        monthly_contribution=user_inputs["monthly_contribution"]
-    )
+    def __init__(self, user_inputs):
+        self.budget_manager = BudgetManager(
+            starting_capital=user_inputs["starting_capital"],
+            monthly_contribution=user_inputs["monthly_contribution"]
+        )
+        self.trades = TradeLedger()  # trades are numbered 1, 2, ... in entry order
+        self.open_positions = OpenPositions()
+        self.last_trade_date = None
+        self.last_date = None
+        self.processed_days = 0  # rows of the simulated daily data already processed
+        self.processed_bars = 0  # rows of the simulated intraday bars already processed (intraday entry mode)
+
+def open_trade(state, ticker, user_inputs, entry_price, entry_date, size=None, open_positions=None):
+    """
+    Sizes and enters a new trade at entry_price, then applies the entry SL/PT adjustments.
 
-    # Step 3: Load daily & intraday data
-    # Returns: (daily_data, intraday_data, ticker_from_daily)
-    stock_data, intraday_data, ticker_from_daily = load_data(
-        sheet_url=SHEET_URL,
-        credentials_path=CREDENTIALS_PATH,
-        daily_sheet=DAILY_SHEET_NAME,
-        intraday_sheet=INTRADAY_SHEET_NAME
-    )
+    Args:
+        size (tuple): (shares, total cost) sized by the caller (default: calculate_trade_size).
+        open_positions (dict): Positions the trade joins (default: state.open_positions).
 
-    # If we found a ticker in the daily data, keep it; else default to something
-    ticker = ticker_from_daily if ticker_from_daily else "Unknown"
+    Returns:
+        dict: The new trade.
+    """
+    budget_manager = state.budget_manager
+    trades = state.trades
+    if open_positions is None:
+        open_positions = state.open_positions
+
+    # (b) Calculate trade size
+    if size is None:
+        size = calculate_trade_size(
+            budget_manager,
+            entry_price,
+            user_inputs["max_risk"],
+            user_inputs["first_SL"],
+            user_inputs["user_defined_max"]
+        )
+    initial_amount, total_cost = size
+
+    # (c) Enter trade
+    new_key = trades.next_id
+    budget_manager.remove_capital(total_cost, entry_date, new_key)
+    new_trade = {
+        "ticker": ticker,
+        "entry_price": entry_price,
+        "entry_date": entry_date,  # daily date (for reference) or bar time in intraday entry mode
+        "initial_amount": initial_amount,
+        "first_SL": entry_price * (1 - user_inputs["first_SL"] / 100),
+        "first_PT": entry_price * (1 + user_inputs["first_PT"] / 100),
+        "partial_sale_done": False,
+        "partial_sale_date": None,
+        "partial_sale_price": None,
+        "partial_sale_amount": None,
+        "remaining_sale_amount": None,
+        "second_SL": None,
+        "second_PT": None,
+        "adjusted_SL": None,
+        "adjusted_PT": None,
+        "adjustments": [],
+        "remaining_reason": None,
+        "remaining_date": None,
+        "remaining_price": None
+    }
+    trades.append(new_trade)
+    open_positions[new_key] = new_trade
+
+    # Apply entry adjustments
+    set_adjusted_for_new_position(open_positions, new_key)
+    update_all_positions(open_positions, entry_date)
+    return new_trade
+
+def _exit_position(open_positions, key, position, open_price, low_price, high_price, this_bar_time,
+                   budget_manager, user_inputs):
+    """
+    SL/PT checks of one position against one bar.
 
-    # Step 3a: Compute indicators on the full daily dataset
-    full_data_with_indicators = calculate_indicators(stock_data)
+    Returns:
+        bool: True if the position is fully closed.
+    """
+    sl_price = position["adjusted_SL"]
+    pt_price = position["adjusted_PT"]
+
+    # If partial sale not done yet
+    if not position["partial_sale_done"]:
+        # Stop-loss
+        if open_price <= sl_price:
+            execution_price = open_price
+        elif low_price < sl_price:
+            execution_price = sl_price
+        else:
+            execution_price = None
+
+        if execution_price is not None:
+            position["remaining_reason"] = "adjusted_SL"
+            # Store the actual intraday timestamp (bar["Datetime"])
+            position["remaining_date"] = this_bar_time
+            position["remaining_price"] = execution_price
+            position["remaining_sale_amount"] = position["initial_amount"]
+            budget_manager.add_capital(execution_price * position["initial_amount"], this_bar_time, key)
+            return True
+
+        # Profit-target
+        if open_price >= pt_price:
+            execution_price = open_price
+        elif high_price > pt_price:
+            execution_price = pt_price
+        else:
+            execution_price = None
+
+        if execution_price is not None:
+            partial_sale_amount = position["initial_amount"] * user_inputs["partial_sale_percentage"] // 100
+            position["partial_sale_done"] = True
+            # Store the actual intraday timestamp
+            position["partial_sale_date"] = this_bar_time
+            position["partial_sale_price"] = execution_price
+            position["partial_sale_amount"] = partial_sale_amount
+            position["remaining_sale_amount"] = position["initial_amount"] - partial_sale_amount
+            budget_manager.add_capital(partial_sale_amount * execution_price, this_bar_time, key)
+
+            # Now define second SL/PT
+            position["second_SL"] = position["adjusted_PT"] * (1 - user_inputs["first_SL"] / 100)
+            position["second_PT"] = position["adjusted_PT"] * (1 + user_inputs["first_PT"] / 100)
+            set_adjusted_for_partial_sale(open_positions, key)
+
+    # If partial sale done
+    if position["partial_sale_done"]:
+        # Re-fetch the updated SL/PT
+        sl_price = position["adjusted_SL"]
+        pt_price = position["adjusted_PT"]
+
+        if open_price <= sl_price:
+            execution_price = open_price
+        elif low_price < sl_price:
+            execution_price = sl_price
+        elif open_price >= pt_price:
+            execution_price = open_price
+        elif high_price > pt_price:
+            execution_price = pt_price
+        else:
+            execution_price = None
+
+        if execution_price is not None:
+            reason = "adjusted_SL" if execution_price <= sl_price else "adjusted_PT"
+            position["remaining_reason"] = reason
+            # Store the actual intraday timestamp
+            position["remaining_date"] = this_bar_time
+            position["remaining_price"] = execution_price
+            budget_manager.add_capital(execution_price * position["remaining_sale_amount"], this_bar_time, key)
+            return True
+    return False
+
+def check_exits(open_positions, open_price, low_price, high_price, this_bar_time, budget_manager, user_inputs):
+    """
+    SL/PT checks of all open positions against one intraday bar: stop-losses and
+    profit targets (with partial sale and second SL/PT), gap fills at the bar's open.
+    Fully closed positions are removed from open_positions.
 
-    # Step 3b: Filter daily data from a chosen start date
-    filtered_data = full_data_with_indicators[full_data_with_indicators['Date'] >= '2024-01-01'].copy()
-    filtered_data.reset_index(drop=True, inplace=True)
+    With OpenPositions only the positions of groups whose shared SL/PT the bar
+    reaches are visited (in the same order, so the cash flows are identical).
 
-    # Step 3c: Filter intraday data similarly + group by date
-    intraday_by_date = {}
-    if intraday_data is not None:
-        intraday_data = intraday_data[intraday_data['Datetime'] >= '2024-01-01'].copy()
-        intraday_data.reset_index(drop=True, inplace=True)
+    Returns:
+        list: Keys of the positions closed on this bar.
+    """
+    if isinstance(open_positions, OpenPositions):
+        keys = open_positions.triggered_keys(open_price, low_price, high_price)
+        if not keys:
+            return []
+        # Partial sales move positions to another group
+        open_positions.invalidate_groups()
+    else:
+        keys = list(open_positions)
+
+    trades_to_remove = [
+        key for key in keys
+        if _exit_position(open_positions, key, open_positions[key], open_price, low_price, high_price,
+                          this_bar_time, budget_manager, user_inputs)
+    ]
+
+    # Remove any fully closed positions this bar
+    for k in trades_to_remove:
+        open_positions.pop(k, None)
+    return trades_to_remove
+
+def _day_exits(state, user_inputs, times, opens, lows, highs, start, stop):
+    # SL/PT checks over the bars [start, stop), visiting only bars that can trigger
+    open_positions = state.open_positions
+    i = start
+    while i < stop and open_positions:
+        i = _next_exit_bar(open_positions, opens, lows, highs, i, stop)
+        if i >= stop:
+            break
+        check_exits(open_positions, float(opens[i]), float(lows[i]), float(highs[i]), times[i],
+                    state.budget_manager, user_inputs)
+        i += 1
+
+def simulate_days(stock_data, intraday_data, ticker, user_inputs, state, conditions_library=None,
+                  progress_callback=None, end_day=None):
+    """
+    Advances the simulation state over the daily rows it has not processed yet
+    (from state.processed_days up to end_day, default all): daily entries, then intraday SL/PT exits.
 
-        intraday_by_date = {
-            date_val: df_group
-            for date_val, df_group in intraday_data.groupby(intraday_data['Datetime'].dt.date)
-        }
+    Args:
+        intraday_data (pd.DataFrame or None): Intraday bars of (at least) the days to simulate;
+            each day's bars are found through a TimeIndex.
 
+    Returns:
+        bool: True if progress_callback stopped the run.
+    """
     # We'll just reassign these for clarity
-    stock_data = filtered_data
-    indicators = filtered_data
-
-    # Step 4: Initialize tracking variables
-    trades = {}
-    open_positions = {}
-    last_trade_date = None
-
-    # Step 5: Iterate over daily data
-    for current_index in range(len(stock_data)):
+    indicators = stock_data
+    budget_manager = state.budget_manager
+    open_positions = state.open_positions
+    last_trade_date = state.last_trade_date
+    contribution_days = contribution_calendar(stock_data['Date'])
+
+    # Intraday bars as arrays; the bars of daily row i are time_index.bars_of_row(i)
+    if intraday_data is not None and not intraday_data.empty:
+        intraday_data = sorted_by_time(intraday_data)
+        time_index = TimeIndex.from_frames(stock_data, intraday_data)
+        times = pd.DatetimeIndex(intraday_data['Datetime'])
+        # Prices may be stored as float32 (compact frames); simulate in float64
+        opens = intraday_data['Open'].to_numpy(dtype=np.float64)
+        lows = intraday_data['Low'].to_numpy(dtype=np.float64)
+        highs = intraday_data['High'].to_numpy(dtype=np.float64)
+    else:
+        time_index = None
+
+    end_day = len(stock_data) if end_day is None else min(end_day, len(stock_data))
+    for current_index in range(state.processed_days, end_day):
         current_date = stock_data.loc[current_index, 'Date']
-        budget_manager.add_monthly_contribution(current_date)
+        if contribution_days[current_index]:
+            budget_manager.add_monthly_contribution(current_date)
 
         # Prevent multiple trades on same date (if desired)
         if last_trade_date == current_date:
@@ -95,148 +394,42 @@ def trading_loop():
             budget_manager,
             user_inputs["max_risk"],
             user_inputs["first_SL"],
-            open_positions
+            open_positions,
+            conditions_library
         )
 
         if entry_price:
-            # (b) Calculate trade size
-            initial_amount, total_cost = calculate_trade_size(
-                budget_manager,
-                entry_price,
-                user_inputs["max_risk"],
-                user_inputs["first_SL"],
-                user_inputs["user_defined_max"]
-            )
+            # (b), (c) Size and enter the trade
+            open_trade(state, ticker, user_inputs, float(entry_price), current_date)
 
-            # (c) Enter trade
-            budget_manager.remove_capital(total_cost)
-            new_key = get_new_key(trades)
-            new_trade = {
-                "ticker": ticker,
-                "entry_price": entry_price,
-                "entry_date": current_date,  # daily date (for reference)
-                "initial_amount": initial_amount,
-                "first_SL": entry_price * (1 - user_inputs["first_SL"] / 100),
-                "first_PT": entry_price * (1 + user_inputs["first_PT"] / 100),
-                "partial_sale_done": False,
-                "partial_sale_date": None,
-                "partial_sale_price": None,
-                "partial_sale_amount": None,
-                "remaining_sale_amount": None,
-                "second_SL": None,
-                "second_PT": None,
-                "adjusted_SL": None,
-                "adjusted_PT": None,
-                "adjustments": [],
-                "remaining_reason": None,
-                "remaining_date": None,
-                "remaining_price": None
-            }
-            trades[new_key] = new_trade
-            open_positions[new_key] = new_trade
-
-            # Apply entry adjustments
-            set_adjusted_for_new_position(open_positions, new_key)
-            update_all_positions(open_positions, current_date)
-
-        # (d) Intraday SL/PT checks
-        closed_trades = []
-        day_key = current_date.date()
-        intraday_bars_for_today = intraday_by_date.get(day_key, pd.DataFrame())
-
-        if not intraday_bars_for_today.empty:
-            intraday_bars_for_today.sort_values(by='Datetime', inplace=True)
-            for row_index, bar in intraday_bars_for_today.iterrows():
-                open_price = bar['Open']
-                low_price = bar['Low']
-                high_price = bar['High']
-                this_bar_time = bar['Datetime']  # This is the full intraday timestamp
-
-                trades_to_remove = []
-                for key, position in open_positions.items():
-                    sl_price = position["adjusted_SL"]
-                    pt_price = position["adjusted_PT"]
-
-                    # If partial sale not done yet
-                    if not position["partial_sale_done"]:
-                        # Stop-loss
-                        if open_price <= sl_price:
-                            execution_price = open_price
-                        elif low_price < sl_price:
-                            execution_price = sl_price
-                        else:
-                            execution_price = None
-
-                        if execution_price is not None:
-                            position["remaining_reason"] = "adjusted_SL"
-                            # Store the actual intraday timestamp (bar["Datetime"])
-                            position["remaining_date"] = this_bar_time
-                            position["remaining_price"] = execution_price
-                            position["remaining_sale_amount"] = position["initial_amount"]
-                            budget_manager.add_capital(execution_price * position["initial_amount"])
-                            trades_to_remove.append(key)
-                            continue
-
-                        # Profit-target
-                        if open_price >= pt_price:
-                            execution_price = open_price
-                        elif high_price > pt_price:
-                            execution_price = pt_price
-                        else:
-                            execution_price = None
-
-                        if execution_price is not None:
-                            partial_sale_amount = position["initial_amount"] * user_inputs["partial_sale_percentage"] // 100
-                            position["partial_sale_done"] = True
-                            # Store the actual intraday timestamp
-                            position["partial_sale_date"] = this_bar_time
-                            position["partial_sale_price"] = execution_price
-                            position["partial_sale_amount"] = partial_sale_amount
-                            position["remaining_sale_amount"] = position["initial_amount"] - partial_sale_amount
-                            budget_manager.add_capital(partial_sale_amount * execution_price)
-
-                            # Now define second SL/PT
-                            position["second_SL"] = position["adjusted_PT"] * (1 - user_inputs["first_SL"] / 100)
-                            position["second_PT"] = position["adjusted_PT"] * (1 + user_inputs["first_PT"] / 100)
-                            set_adjusted_for_partial_sale(open_positions, key)
-
-                    # If partial sale done
-                    if position["partial_sale_done"]:
-                        # Re-fetch the updated SL/PT
-                        sl_price = position["adjusted_SL"]
-                        pt_price = position["adjusted_PT"]
-
-                        if open_price <= sl_price:
-                            execution_price = open_price
-                        elif low_price < sl_price:
-                            execution_price = sl_price
-                        elif open_price >= pt_price:
-                            execution_price = open_price
-                        elif high_price > pt_price:
-                            execution_price = pt_price
-                        else:
-                            execution_price = None
-
-                        if execution_price is not None:
-                            reason = "adjusted_SL" if execution_price <= sl_price else "adjusted_PT"
-                            position["remaining_reason"] = reason
-                            # Store the actual intraday timestamp
-                            position["remaining_date"] = this_bar_time
-                            position["remaining_price"] = execution_price
-                            budget_manager.add_capital(execution_price * position["remaining_sale_amount"])
-                            trades_to_remove.append(key)
-
-                # Remove any fully closed positions this bar
-                for k in trades_to_remove:
-                    closed_trades.append(k)
-                    open_positions.pop(k, None)
+        # (d) Intraday SL/PT checks on the day's bars
+        if time_index is not None and open_positions:
+            bar_start, bar_stop = time_index.bars_of_row(current_index)
+            _day_exits(state, user_inputs, times, opens, lows, highs, bar_start, bar_stop)
 
         last_trade_date = current_date
+        state.last_trade_date = last_trade_date
+        state.last_date = current_date
+        state.processed_days = current_index + 1
+
+        # (e) Let the caller stop the run early (e.g. drawdown pruning)
+        if progress_callback is not None and progress_callback(
+                current_date, float(stock_data.loc[current_index, 'Close']), budget_manager, open_positions):
+            return True
 
-    # Step 6: End of simulation – close open positions at final daily close
+    return False
+
+def close_open_positions(state, stock_data, date_column='Date', open_positions=None):
+    """
+    End of simulation: closes the open positions (default: state.open_positions)
+    at the final daily close (or the final bar's close, for intraday bars with
+    date_column='Datetime').
+    """
+    if open_positions is None:
+        open_positions = state.open_positions
     if not stock_data.empty:
-        final_close_price = stock_data.iloc[-1]['Close']
-        final_date = stock_data.iloc[-1]['Date']
+        final_close_price = float(stock_data.iloc[-1]['Close'])
+        final_date = stock_data.iloc[-1][date_column]
         for key, position in open_positions.items():
             current_price = final_close_price
             position["remaining_reason"] = "End of Simulation"
@@ -249,14 +442,274 @@ def trading_loop():
                 position["initial_amount"] if not position["partial_sale_done"]
                 else position["remaining_sale_amount"]
             )
-            budget_manager.add_capital(current_price * position["remaining_sale_amount"])
+            state.budget_manager.add_capital(current_price * position["remaining_sale_amount"], final_date, key)
+
+def _next_exit_bar(open_positions, opens, lows, highs, start, stop):
+    """
+    First bar in [start, stop) on which any open position could hit its SL or PT
+    (stop if none). Until then check_exits would not change anything.
+    """
+    if isinstance(open_positions, OpenPositions):
+        highest_SL, lowest_PT = open_positions.exit_thresholds()
+    else:
+        highest_SL = max(position["adjusted_SL"] for position in open_positions.values())
+        lowest_PT = min(position["adjusted_PT"] for position in open_positions.values())
+    chunk = 64
+    while start < stop:
+        end = min(stop, start + chunk)
+        hits = np.flatnonzero(
+            (opens[start:end] <= highest_SL) | (lows[start:end] < highest_SL)
+            | (opens[start:end] >= lowest_PT) | (highs[start:end] > lowest_PT)
+        )
+        if len(hits):
+            return start + hits[0]
+        start = end
+        chunk *= 2
+    return stop
+
+def simulate_bars(bars, signals, ticker, user_inputs, state):
+    """
+    Intraday entry mode: advances the simulation state over the bars it has not
+    processed yet (from state.processed_bars on). A new trade is entered at the
+    bar's Open if signals[i] holds (and liquidity allows), at most once per day
+    as in the daily simulation: the day of the last entry is
+    state.last_trade_date, and later signal bars of that day only check exits.
+    All open positions, including a new one, are checked against every bar.
+
+    Only bars on which something can happen are visited: signal bars, the first
+    bar of a month (contribution) and, while positions are open, bars that reach
+    an SL or PT. The result is the same as visiting every bar.
+    """
+    budget_manager = state.budget_manager
+    open_positions = state.open_positions
+    n = len(bars)
+    if state.processed_bars >= n:
+        return
+
+    times = pd.DatetimeIndex(bars['Datetime'])
+    opens = bars['Open'].to_numpy(dtype=np.float64)
+    lows = bars['Low'].to_numpy(dtype=np.float64)
+    highs = bars['High'].to_numpy(dtype=np.float64)
+
+    new_month = contribution_calendar(times)
+    entry_or_contribution_bars = np.flatnonzero(signals | new_month)
+
+    i = state.processed_bars
+    while i < n:
+        next_event = entry_or_contribution_bars.searchsorted(i)
+        stop = entry_or_contribution_bars[next_event] if next_event < len(entry_or_contribution_bars) else n
+        if open_positions:
+            i = _next_exit_bar(open_positions, opens, lows, highs, i, stop)
+        else:
+            i = stop
+        if i >= n:
+            break
+
+        bar_time = times[i]
+        if new_month[i]:
+            budget_manager.add_monthly_contribution(bar_time)
+
+        # (a) Entry at the bar's open, if none was made today
+        entered_today = state.last_trade_date is not None and \
+            state.last_trade_date.normalize() == bar_time.normalize()
+        if signals[i] and not entered_today and liquidity_conditions(
+                budget_manager, opens[i], user_inputs["max_risk"], user_inputs["first_SL"]):
+            open_trade(state, ticker, user_inputs, float(opens[i]), bar_time)
+            state.last_trade_date = bar_time
+
+        # (b) SL/PT checks on the same bar
+        if open_positions:
+            check_exits(open_positions, float(opens[i]), float(lows[i]), float(highs[i]), bar_time,
+                        budget_manager, user_inputs)
+
+        state.last_date = bar_time
+        state.processed_bars = i + 1
+        i += 1
+
+    state.processed_bars = n
+
+def run_intraday_simulation(intraday_data, ticker, user_inputs, start_date=SIMULATION_START_DATE,
+                            conditions_library=None, end_date=None):
+    """
+    Runs the simulation in intraday entry mode: indicators are computed on the
+    intraday bars, the entry conditions are evaluated on all bars at once
+    (vectorized_conditions) and entries and SL/PT exits interleave bar by bar.
+
+    Args:
+        intraday_data (pd.DataFrame): Intraday bars with 'Datetime', 'Open', 'High', 'Low' and 'Close'.
+        ticker (str): Ticker symbol of the traded stock.
+        user_inputs (dict): Simulation parameters (see user_io.get_user_inputs).
+        start_date (str): First date included in the simulation.
+        conditions_library (dict): Entry condition toggles (defaults to CONDITIONS_LIBRARY).
+        end_date (str): Last date included in the simulation (default: all data).
+
+    Returns:
+        tuple: (trades, budget_manager, simulated intraday bars with indicators)
+    """
+    if conditions_library is None:
+        conditions_library = CONDITIONS_LIBRARY
+    if not intraday_data['Datetime'].is_monotonic_increasing:
+        intraday_data = intraday_data.sort_values(by='Datetime', kind='stable')
+
+    # Indicators on the full intraday history, conditions on the simulated bars
+    # (like the daily mode evaluates them on the simulated days)
+    if 'EMA_10' not in intraday_data.columns:
+        intraday_data = calculate_indicators(intraday_data.reset_index(drop=True))
+    bars = rows_from(intraday_data, 'Datetime', start_date, end_date)
+    signals = vectorized_conditions(bars, conditions_library)
+
+    state = SimulationState(user_inputs)
+    simulate_bars(bars, signals, ticker, user_inputs, state)
+    close_open_positions(state, bars, date_column='Datetime')
+
+    return state.trades, state.budget_manager, bars
+
+def run_simulation(stock_data, intraday_data, ticker, user_inputs, start_date=SIMULATION_START_DATE,
+                   conditions_library=None, end_date=None, progress_callback=None):
+    """
+    Runs the simulation on already loaded data: iterates over the daily data
+    for entry signals, and the intraday data for SL/PT exits.
+
+    Args:
+        stock_data (pd.DataFrame): Daily data. Indicators are computed if not already present.
+        intraday_data (pd.DataFrame or None): Intraday bars with a 'Datetime' column.
+        ticker (str): Ticker symbol of the traded stock.
+        user_inputs (dict): Simulation parameters (see user_io.get_user_inputs).
+        start_date (str): First daily date included in the simulation.
+        conditions_library (dict): Entry condition toggles (defaults to CONDITIONS_LIBRARY).
+        end_date (str): Last daily date included in the simulation (default: all data).
+        progress_callback (callable): Called after every simulated day as
+            progress_callback(current_date, close_price, budget_manager, open_positions).
+            Returning True stops the run; open positions are then closed at that day's close.
+
+    Returns:
+        tuple: (trades, budget_manager, simulated daily data)
+    """
+
+    # Step 1: Compute indicators on the full daily dataset (unless already done)
+    if 'EMA_10' in stock_data.columns:
+        full_data_with_indicators = stock_data
+    else:
+        full_data_with_indicators = calculate_indicators(stock_data)
+
+    # Step 1a: Filter daily data from a chosen start date
+    stock_data = rows_from(full_data_with_indicators, 'Date', start_date, end_date)
+
+    # Step 1b: Filter intraday data similarly (simulate_days slices it by day)
+    if intraday_data is not None:
+        intraday_data = rows_from(intraday_data, 'Datetime', start_date, end_date)
+
+    # Step 2: Iterate over daily data
+    state = SimulationState(user_inputs)
+    stopped = simulate_days(
+        stock_data, intraday_data, ticker, user_inputs, state, conditions_library, progress_callback
+    )
+    if stopped:
+        stock_data = stock_data.iloc[:state.processed_days]
+
+    # Step 3: End of simulation – close open positions at final daily close
+    close_open_positions(state, stock_data)
+
+    return state.trades, state.budget_manager, stock_data
+
+def cached_simulation(cache, stock_data, intraday_data, ticker, user_inputs, start_date=SIMULATION_START_DATE,
+                      conditions_library=None, end_date=None):
+    """
+    Same as run_simulation, but identical runs are answered from the result cache.
+
+    Returns:
+        tuple: (trades, summary metrics)
+    """
+    key = backtest_key(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library, end_date)
+    result = cache.get(key)
+    if result is None:
+        trades, budget_manager, simulated_data = run_simulation(
+            stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library, end_date
+        )
+        result = {
+            "trades": trades,
+            "metrics": summary_metrics(trades, budget_manager, simulated_data)
+        }
+        cache.put(key, result)
+    return result["trades"], result["metrics"]
+
+def trading_loop():
+    """
+    Loads the configured sheets, runs the simulation and reports the results.
+    """
+
+    # Step 1: Load user inputs
+    user_inputs = get_user_inputs()
+
+    # Step 2: Load daily & intraday data
+    # Returns: (daily_data, intraday_data, ticker_from_daily)
+    stock_data, intraday_data, ticker_from_daily = load_data(
+        sheet_url=SHEET_URL,
+        credentials_path=CREDENTIALS_PATH,
+        daily_sheet=DAILY_SHEET_NAME,
+        intraday_sheet=INTRADAY_SHEET_NAME,
+        source=DATA_SOURCE,
+        compact=COMPACT_FRAMES,
+        cache_dir=SHEET_CACHE_DIR
+    )
+
+    # If we found a ticker in the daily data, keep it; else default to something
+    ticker = ticker_from_daily if ticker_from_daily else "Unknown"
+
+    # Step 3: Compute indicators on the full daily dataset and run the simulation
+    if ENTRY_MODE == "intraday":
+        # Entries on intraday bars; indicators are computed on the bars themselves
+        if intraday_data is None:
+            raise ValueError("ENTRY_MODE 'intraday' needs intraday data.")
+        full_data_with_indicators = calculate_indicators(stock_data)
+        trades, budget_manager, simulated_bars = run_intraday_simulation(intraday_data, ticker, user_inputs)
+        metrics = summary_metrics(trades, budget_manager, simulated_bars)
+    elif INTRADAY_STORE_DIR:
+        # Bounded memory: the downloaded bars go to the monthly store, which is then streamed
+        from chunked_simulation import write_intraday_store, iter_intraday_store, run_chunked_simulation
+
+        write_intraday_store(intraday_data, INTRADAY_STORE_DIR)
+        intraday_data = None
+        full_data_with_indicators = calculate_indicators(stock_data)
+        trades, budget_manager, simulated_data = run_chunked_simulation(
+            full_data_with_indicators,
+            iter_intraday_store(INTRADAY_STORE_DIR, SIMULATION_START_DATE),
+            ticker,
+            user_inputs,
+            CHUNKED_LEDGER_PATH
+        )
+        metrics = summary_metrics(trades, budget_manager, simulated_data)
+    elif INCREMENTAL_STATE_PATH:
+        # Only the bars appended since the previous run are processed
+        from incremental import run_incremental
+
+        trades, budget_manager, simulated_data, full_data_with_indicators = run_incremental(
+            stock_data, intraday_data, ticker, user_inputs, INCREMENTAL_STATE_PATH
+        )
+        metrics = summary_metrics(trades, budget_manager, simulated_data)
+    elif USE_RESULT_CACHE:
+        # Reuse a cached result of an identical run
+        full_data_with_indicators = calculate_indicators(stock_data)
+        trades, metrics = cached_simulation(
+            ResultCache(RESULT_CACHE_DIR),
+            full_data_with_indicators,
+            intraday_data,
+            ticker,
+            user_inputs
+        )
+    else:
+        full_data_with_indicators = calculate_indicators(stock_data)
+        trades, budget_manager, simulated_data = run_simulation(
+            full_data_with_indicators, intraday_data, ticker, user_inputs
+        )
+        metrics = summary_metrics(trades, budget_manager, simulated_data)
 
-    # Step 7: Summaries
-    trade_summary(trades)
-    final_summary(trades, budget_manager, stock_data, ticker)
+    # Step 4: Summaries
+    trade_summary(trades, verbosity=TRADE_SUMMARY_VERBOSITY, fmt=TRADE_SUMMARY_FORMAT)
+    print_summary_metrics(metrics, ticker)
 
 
-    # Step 8: Save trades to Google Sheets if needed
+    # Step 5: Save trades to Google Sheets if needed
     trades_to_sheets.save_trade_data(trades, full_data_with_indicators)
 
 
@@ -0,0 +1,436 @@
+import numpy as np
+import pandas as pd
+from a0_TradingSim import SIMULATION_START_DATE, rows_from
+from price_entry_tradesize import CONDITIONS_LIBRARY, contribution_calendar
+from indicator_conditions import vectorized_conditions
+from Indicators import calculate_indicators
+from time_index import TimeIndex, sorted_by_time
+from user_io import get_user_inputs, summary_metrics
+
+# User inputs that may differ between the lanes of a batch (the rest come from base_inputs)
+BATCH_PARAMETERS = ("first_SL", "first_PT", "max_risk", "user_defined_max", "partial_sale_percentage")
+
+INITIAL_SLOTS = 16
+
+# Exit reasons in the trade records
+REASON_SL = 0
+REASON_PT = 1
+REASON_END = 2
+REASON_NAMES = {REASON_SL: "adjusted_SL", REASON_PT: "adjusted_PT", REASON_END: "End of Simulation"}
+
+# Per-position slot arrays (lanes x slots)
+_SLOT_FIELDS = {
+    "open": bool,
+    "key": np.int64,
+    "entry_day": np.int64,
+    "entry_price": np.float64,
+    "initial": np.float64,
+    "first_sl": np.float64,
+    "first_pt": np.float64,
+    "sl": np.float64,
+    "pt": np.float64,
+    "second_sl": np.float64,
+    "second_pt": np.float64,
+    "partial": bool,
+    "partial_time": np.int64,
+    "partial_price": np.float64,
+    "partial_amount": np.float64,
+    "remaining": np.float64
+}
+
+def parameter_arrays(parameter_sets, base_inputs):
+    """
+    Stacks the BATCH_PARAMETERS of the parameter sets (dicts of overrides of
+    base_inputs) into one float64 array per parameter.
+    """
+    arrays = {
+        name: np.array([parameters.get(name, base_inputs[name]) for parameters in parameter_sets], dtype=np.float64)
+        for name in BATCH_PARAMETERS
+    }
+    if (arrays["max_risk"] <= 0).any() or (arrays["first_SL"] <= 0).any():
+        raise ValueError("max_risk and first_SL must be greater than zero in every parameter set.")
+    return arrays
+
+class _LaneBudget:
+    # The two BudgetManager getters summary_metrics needs
+    def __init__(self, liquidity, contributions):
+        self.liquidity = liquidity
+        self.contributions = contributions
+
+    def get_total_liquidity(self):
+        return self.liquidity
+
+    def get_total_contributions(self):
+        return self.contributions
+
+class BatchResult:
+    """
+    Outcome of run_batch_simulation: final cash per lane and the closed trades of all lanes.
+    """
+
+    def __init__(self, parameters, liquidity, contributions, feasible, records, simulated_data, ticker, bar_times):
+        self.parameters = parameters
+        self.liquidity = liquidity
+        self.contributions = contributions
+        self.feasible = feasible
+        self.records = records
+        self.simulated_data = simulated_data
+        self.ticker = ticker
+        self._bar_times = bar_times
+        self._lane_rows = None
+
+    def __len__(self):
+        return len(self.liquidity)
+
+    def _rows(self, lane):
+        if self._lane_rows is None:
+            order = np.lexsort((self.records["key"], self.records["lane"]))
+            offsets = self.records["lane"][order].searchsorted(np.arange(len(self) + 1))
+            self._lane_rows = (order, offsets)
+        order, offsets = self._lane_rows
+        return order[offsets[lane]:offsets[lane + 1]]
+
+    def trades(self, lane):
+        """
+        The trades of one lane in the format of run_simulation (the adjustment log is not kept).
+        """
+        records = self.records
+        dates = self.simulated_data['Date']
+        final_date = dates.iloc[-1] if len(dates) else None
+        trades = {}
+        for row in self._rows(lane):
+            partial = bool(records["partial"][row])
+            reason = int(records["reason"][row])
+            trades[int(records["key"][row])] = {
+                "ticker": self.ticker,
+                "entry_price": float(records["entry_price"][row]),
+                "entry_date": dates.iloc[records["entry_day"][row]],
+                "initial_amount": int(records["initial"][row]),
+                "first_SL": float(records["first_sl"][row]),
+                "first_PT": float(records["first_pt"][row]),
+                "partial_sale_done": partial,
+                "partial_sale_date": self._bar_times[records["partial_time"][row]] if partial else None,
+                "partial_sale_price": float(records["partial_price"][row]) if partial else None,
+                "partial_sale_amount": int(records["partial_amount"][row]) if partial else None,
+                "remaining_sale_amount": int(records["remaining"][row]),
+                "second_SL": float(records["second_sl"][row]) if partial else None,
+                "second_PT": float(records["second_pt"][row]) if partial else None,
+                "adjusted_SL": float(records["sl"][row]),
+                "adjusted_PT": float(records["pt"][row]),
+                "adjustments": [],
+                "remaining_reason": REASON_NAMES[reason],
+                "remaining_date": (final_date if reason == REASON_END
+                                   else self._bar_times[records["remaining_time"][row]]),
+                "remaining_price": float(records["remaining_price"][row])
+            }
+        return trades
+
+    def budget(self, lane):
+        """
+        Final liquidity and contributions of one lane, with the BudgetManager getters.
+        """
+        return _LaneBudget(float(self.liquidity[lane]), float(self.contributions[lane]))
+
+    def metrics(self, lane):
+        """
+        summary_metrics of one lane.
+        """
+        return summary_metrics(self.trades(lane), self.budget(lane), self.simulated_data)
+
+    def summary(self):
+        """
+        One row per lane: its parameters, feasibility, final liquidity, total
+        return (-inf for infeasible lanes, as in parameter_search) and trade count.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_return = np.where(self.contributions != 0, (self.liquidity / self.contributions - 1) * 100, 0.0)
+        report = pd.DataFrame(self.parameters)
+        report["feasible"] = self.feasible
+        report["total_capital"] = self.liquidity
+        report["total_return_percentage"] = np.where(self.feasible, total_return, -np.inf)
+        report["total_trades"] = np.bincount(self.records["lane"], minlength=len(self))
+        return report
+
+class _Lanes:
+    """
+    Simulation state of all lanes: cash per lane and (lanes x slots) position
+    arrays. A lane's open positions occupy its slots in key order; closed
+    slots are only reclaimed by compaction (which keeps the order).
+    """
+
+    def __init__(self, parameters, starting_capital, bar_times):
+        n = len(parameters["first_SL"])
+        self.n = n
+        self.p = parameters
+        self.liquidity = np.full(n, float(starting_capital))
+        self.contributions = np.full(n, float(starting_capital))
+        self.feasible = np.ones(n, dtype=bool)
+        self.next_slot = np.zeros(n, dtype=np.int64)
+        self.trade_count = np.zeros(n, dtype=np.int64)
+        self.highest_sl = np.full(n, -np.inf)
+        self.lowest_pt = np.full(n, np.inf)
+        self.slots = {name: np.zeros((n, INITIAL_SLOTS), dtype=dtype) for name, dtype in _SLOT_FIELDS.items()}
+        self.records = []
+        self.bar_times = bar_times
+
+    def _make_room(self, lanes):
+        # Compact the slots (keeping key order), and grow them if the lanes are still full
+        capacity = self.slots["open"].shape[1]
+        if (self.next_slot[lanes] < capacity).all():
+            return
+        order = np.argsort(~self.slots["open"], axis=1, kind='stable')
+        for name, values in self.slots.items():
+            self.slots[name] = np.take_along_axis(values, order, axis=1)
+        self.next_slot = self.slots["open"].sum(axis=1)
+        if (self.next_slot[lanes] >= capacity).any():
+            for name, values in self.slots.items():
+                grown = np.zeros((self.n, 2 * capacity), dtype=values.dtype)
+                grown[:, :capacity] = values
+                self.slots[name] = grown
+
+    def refresh_thresholds(self, lanes):
+        opened = self.slots["open"][lanes]
+        self.highest_sl[lanes] = np.where(opened, self.slots["sl"][lanes], -np.inf).max(axis=1)
+        self.lowest_pt[lanes] = np.where(opened, self.slots["pt"][lanes], np.inf).min(axis=1)
+
+    def enter(self, day, entry_price):
+        """
+        liquidity_conditions, calculate_trade_size, BudgetManager.remove_capital
+        and the entry SL/PT adjustments (set_adjusted_for_new_position,
+        update_all_positions) for all lanes at once.
+        """
+        p = self.p
+        liquidity = self.liquidity
+        lanes = np.flatnonzero(self.feasible & (liquidity >= entry_price)
+                               & ((liquidity * p["max_risk"] / p["first_SL"]) >= 1000))
+        if not len(lanes):
+            return
+
+        # calculate_trade_size
+        risk_amount = liquidity[lanes] * (p["max_risk"][lanes] / 100)
+        size = np.trunc(risk_amount / (entry_price * (p["first_SL"][lanes] / 100)))
+        cost = size * entry_price
+        capped = cost > p["user_defined_max"][lanes]
+        size = np.where(capped, np.trunc(p["user_defined_max"][lanes] / entry_price), size)
+        cost = size * entry_price
+
+        # remove_capital raises on insufficient liquidity: such a lane stops (infeasible)
+        short = cost > liquidity[lanes]
+        if short.any():
+            stopped = lanes[short]
+            self.feasible[stopped] = False
+            self.slots["open"][stopped] = False
+            self.highest_sl[stopped] = -np.inf
+            self.lowest_pt[stopped] = np.inf
+        lanes, size, cost = lanes[~short], size[~short], cost[~short]
+        if not len(lanes):
+            return
+        self.liquidity[lanes] -= cost
+
+        self._make_room(lanes)
+        slot = self.next_slot[lanes]
+        self.next_slot[lanes] += 1
+        self.trade_count[lanes] += 1
+        slots = self.slots
+        first_sl = entry_price * (1 - p["first_SL"][lanes] / 100)
+        first_pt = entry_price * (1 + p["first_PT"][lanes] / 100)
+        new_values = {
+            "open": True, "key": self.trade_count[lanes], "entry_day": day, "entry_price": entry_price,
+            "initial": size, "first_sl": first_sl, "first_pt": first_pt, "sl": first_sl, "pt": first_pt,
+            "second_sl": 0.0, "second_pt": 0.0, "partial": False, "partial_time": 0, "partial_price": 0.0,
+            "partial_amount": 0.0, "remaining": 0.0
+        }
+        for name, value in new_values.items():
+            slots[name][lanes, slot] = value
+
+        # update_all_positions: every open position of the lane gets the highest SL and PT
+        opened = slots["open"][lanes]
+        highest_sl = np.where(opened, slots["sl"][lanes], -np.inf).max(axis=1)
+        highest_pt = np.where(opened, slots["pt"][lanes], -np.inf).max(axis=1)
+        slots["sl"][lanes] = np.where(opened, highest_sl[:, None], slots["sl"][lanes])
+        slots["pt"][lanes] = np.where(opened, highest_pt[:, None], slots["pt"][lanes])
+        self.highest_sl[lanes] = highest_sl
+        self.lowest_pt[lanes] = highest_pt
+
+    def _close(self, lanes, columns, reason, price, time_index):
+        slots = self.slots
+        record = {name: slots[name][lanes, columns] for name in _SLOT_FIELDS if name != "open"}
+        record.update({
+            "lane": lanes,
+            "reason": np.broadcast_to(reason, lanes.shape).astype(np.int8),
+            "remaining_price": price,
+            "remaining_time": np.full(len(lanes), time_index, dtype=np.int64)
+        })
+        self.records.append(record)
+        slots["open"][lanes, columns] = False
+
+    def exits(self, bar, open_price, low_price, high_price):
+        """
+        check_exits for all lanes on one bar. The positions of a lane are
+        processed column by column, i.e. in key order, so each lane's cash
+        flows are added in the same order as the scalar loop.
+        """
+        lanes = np.flatnonzero(
+            (open_price <= self.highest_sl) | (low_price < self.highest_sl)
+            | (open_price >= self.lowest_pt) | (high_price > self.lowest_pt)
+        )
+        if not len(lanes):
+            return
+        p = self.p
+        slots = self.slots
+        opened = slots["open"][lanes]
+        for column in np.flatnonzero(opened.any(axis=0)):
+            active = lanes[opened[:, column]]
+            sl = slots["sl"][active, column]
+            pt = slots["pt"][active, column]
+            initial = slots["initial"][active, column]
+            pre = ~slots["partial"][active, column]
+
+            # Before the partial sale: stop-loss on all shares ...
+            sl_hit = pre & ((open_price <= sl) | (low_price < sl))
+            if sl_hit.any():
+                hit = active[sl_hit]
+                price = np.where(open_price <= sl[sl_hit], open_price, sl[sl_hit])
+                self.liquidity[hit] += price * initial[sl_hit]
+                slots["remaining"][hit, column] = initial[sl_hit]
+                self._close(hit, column, REASON_SL, price, bar)
+
+            # ... or the partial sale at the profit target, with the second SL/PT
+            pt_hit = pre & ~sl_hit & ((open_price >= pt) | (high_price > pt))
+            if pt_hit.any():
+                hit = active[pt_hit]
+                price = np.where(open_price >= pt[pt_hit], open_price, pt[pt_hit])
+                partial_amount = np.floor_divide(initial[pt_hit] * p["partial_sale_percentage"][hit], 100)
+                slots["partial"][hit, column] = True
+                slots["partial_time"][hit, column] = bar
+                slots["partial_price"][hit, column] = price
+                slots["partial_amount"][hit, column] = partial_amount
+                slots["remaining"][hit, column] = initial[pt_hit] - partial_amount
+                self.liquidity[hit] += partial_amount * price
+
+                second_sl = pt[pt_hit] * (1 - p["first_SL"][hit] / 100)
+                second_pt = pt[pt_hit] * (1 + p["first_PT"][hit] / 100)
+                slots["second_sl"][hit, column] = second_sl
+                slots["second_pt"][hit, column] = second_pt
+                slots["sl"][hit, column] = np.where(sl[pt_hit] < second_sl, second_sl, sl[pt_hit])
+                slots["pt"][hit, column] = np.where(pt[pt_hit] < second_pt, second_pt, pt[pt_hit])
+
+            # After the partial sale (including one just done): the rest at SL or PT
+            post = active[~sl_hit & slots["partial"][active, column]]
+            if len(post):
+                sl = slots["sl"][post, column]
+                pt = slots["pt"][post, column]
+                price = np.where(open_price <= sl, open_price,
+                                 np.where(low_price < sl, sl,
+                                          np.where(open_price >= pt, open_price,
+                                                   np.where(high_price > pt, pt, np.nan))))
+                done = ~np.isnan(price)
+                if done.any():
+                    hit = post[done]
+                    price = price[done]
+                    self.liquidity[hit] += price * slots["remaining"][hit, column]
+                    reason = np.where(price <= sl[done], REASON_SL, REASON_PT)
+                    self._close(hit, column, reason, price, bar)
+
+        self.refresh_thresholds(lanes)
+
+    def close_all(self, final_close):
+        """
+        close_open_positions: the open positions of every lane in key order at the final close.
+        """
+        slots = self.slots
+        for column in range(int(self.next_slot.max(initial=0))):
+            lanes = np.flatnonzero(slots["open"][:, column])
+            if not len(lanes):
+                continue
+            remaining = np.where(slots["partial"][lanes, column], slots["remaining"][lanes, column],
+                                 slots["initial"][lanes, column])
+            slots["remaining"][lanes, column] = remaining
+            self.liquidity[lanes] += final_close * remaining
+            self._close(lanes, column, REASON_END, np.full(len(lanes), final_close), -1)
+
+    def record_arrays(self):
+        fields = [name for name in _SLOT_FIELDS if name != "open"] + [
+            "lane", "reason", "remaining_price", "remaining_time"]
+        if not self.records:
+            return {name: np.zeros(0, dtype=np.int64) for name in fields}
+        return {name: np.concatenate([np.asarray(record[name]) for record in self.records]) for name in fields}
+
+def run_batch_simulation(stock_data, intraday_data, ticker, parameter_sets, base_inputs=None,
+                         start_date=SIMULATION_START_DATE, conditions_library=None, end_date=None):
+    """
+    Simulates many parameter sets in lockstep, as NumPy arrays over the lanes.
+
+    Every lane is one parameter set (its BATCH_PARAMETERS, the rest from
+    base_inputs) and follows run_simulation exactly: monthly contributions,
+    liquidity_conditions and calculate_trade_size at the daily entry, entry
+    SL/PT adjustments, SL/PT checks with partial sale on the intraday bars and
+    the end-of-simulation close. Cash per lane and the open positions
+    (lanes x slots) are arrays, so each day and bar advances all lanes with a
+    few vectorized operations. A lane that run_simulation would stop with an
+    insufficient-liquidity error is marked infeasible and frozen.
+
+    The entry signals do not depend on these parameters and are evaluated once.
+
+    Args:
+        stock_data (pd.DataFrame): Daily data. Indicators are computed if not already present.
+        intraday_data (pd.DataFrame or None): Intraday bars with a 'Datetime' column.
+        ticker (str): Ticker symbol.
+        parameter_sets (list): Dicts of BATCH_PARAMETERS overrides, one per lane.
+        base_inputs (dict): User inputs (default: get_user_inputs()).
+        start_date, conditions_library, end_date: See run_simulation.
+
+    Returns:
+        BatchResult: Per-lane cash and trades (trades(lane), metrics(lane), summary()).
+    """
+    if base_inputs is None:
+        base_inputs = get_user_inputs()
+    if conditions_library is None:
+        conditions_library = CONDITIONS_LIBRARY
+    parameter_sets = list(parameter_sets)
+    parameters = parameter_arrays(parameter_sets, base_inputs)
+
+    if 'EMA_10' not in stock_data.columns:
+        stock_data = calculate_indicators(stock_data)
+    daily = rows_from(stock_data, 'Date', start_date, end_date)
+    dates = pd.DatetimeIndex(daily['Date'])
+    entry_prices = daily['Open'].to_numpy(dtype=np.float64)
+    signals = vectorized_conditions(daily, conditions_library)
+    contribution_days = contribution_calendar(dates)
+
+    if intraday_data is not None:
+        bars = sorted_by_time(rows_from(intraday_data, 'Datetime', start_date, end_date))
+    else:
+        bars = pd.DataFrame({'Datetime': pd.DatetimeIndex([]), 'Open': [], 'Low': [], 'High': []})
+    time_index = TimeIndex.from_frames(daily, bars)
+    day_values = time_index.dates
+    day_starts, day_stops = time_index.day_starts, time_index.day_stops
+    times = pd.DatetimeIndex(bars['Datetime'])
+    opens = bars['Open'].to_numpy(dtype=np.float64)
+    lows = bars['Low'].to_numpy(dtype=np.float64)
+    highs = bars['High'].to_numpy(dtype=np.float64)
+
+    lanes = _Lanes(parameters, base_inputs["starting_capital"], times)
+    monthly_contribution = float(base_inputs["monthly_contribution"])
+
+    for day in range(len(daily)):
+        if contribution_days[day]:
+            lanes.liquidity += monthly_contribution
+            lanes.contributions += monthly_contribution
+        # A repeated date is only a contribution check (as in simulate_days)
+        if day > 0 and day_values[day] == day_values[day - 1]:
+            continue
+
+        if signals[day] and entry_prices[day]:
+            lanes.enter(day, entry_prices[day])
+
+        for bar in range(day_starts[day], day_stops[day]):
+            lanes.exits(bar, opens[bar], lows[bar], highs[bar])
+
+    if len(daily):
+        lanes.close_all(float(daily['Close'].iloc[-1]))
+
+    parameters = {name: [parameter_set.get(name, base_inputs[name]) for parameter_set in parameter_sets]
+                  for name in BATCH_PARAMETERS}
+    return BatchResult(parameters, lanes.liquidity, lanes.contributions, lanes.feasible,
+                       lanes.record_arrays(), daily, ticker, times)
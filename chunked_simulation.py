@@ -0,0 +1,182 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from a0_TradingSim import (
+    SimulationState,
+    SIMULATION_START_DATE,
+    rows_from,
+    simulate_days,
+    close_open_positions
+)
+from Indicators import calculate_indicators
+from time_index import NS_PER_DAY, day_floor, epoch_ns
+from trade_ledger import TradeLedger, append_ledger_record, iter_ledger_records
+
+# One pickle file of intraday bars per calendar month: <store_dir>/<YYYY-MM>.pkl
+MONTH_FILE_SUFFIX = ".pkl"
+
+def _month_path(store_dir, month):
+    return os.path.join(store_dir, f"{month}{MONTH_FILE_SUFFIX}")
+
+def _write_pickle(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def write_intraday_store(intraday_data, store_dir):
+    """
+    Adds intraday bars to a local store partitioned by month. Bars already in
+    the store are replaced by the new ones (same 'Datetime'), so the store can
+    be filled piece by piece, e.g. one download or backfill chunk at a time.
+
+    Returns:
+        list: The months ("YYYY-MM") written.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    if intraday_data is None or intraday_data.empty:
+        return []
+    months = intraday_data['Datetime'].dt.strftime('%Y-%m')
+    written = []
+    for month, bars in intraday_data.groupby(months, sort=True):
+        path = _month_path(store_dir, month)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                bars = pd.concat([pickle.load(f), bars], ignore_index=True)
+        bars = bars.drop_duplicates(subset='Datetime', keep='last')
+        _write_pickle(path, bars.sort_values(by='Datetime', kind='stable').reset_index(drop=True))
+        written.append(month)
+    return written
+
+def iter_intraday_store(store_dir, start_date=None, end_date=None, block_rows=None):
+    """
+    Streams the bars of a store written by write_intraday_store in time order:
+    one frame per month, or (with block_rows) frames of at least block_rows
+    bars. Blocks always end at a day boundary. Only one month (or block) is
+    held in memory at a time.
+
+    Yields:
+        pd.DataFrame: Bars with start_date <= 'Datetime' < the day after end_date.
+    """
+    if not os.path.isdir(store_dir):
+        return
+    months = sorted(name[:-len(MONTH_FILE_SUFFIX)] for name in os.listdir(store_dir)
+                    if name.endswith(MONTH_FILE_SUFFIX))
+    first_month = None if start_date is None else pd.Timestamp(start_date).strftime('%Y-%m')
+    last_month = None if end_date is None else pd.Timestamp(end_date).strftime('%Y-%m')
+
+    pending = []
+    pending_rows = 0
+    for month in months:
+        if (first_month is not None and month < first_month) or (last_month is not None and month > last_month):
+            continue
+        with open(_month_path(store_dir, month), "rb") as f:
+            bars = pickle.load(f)
+        if start_date is not None or end_date is not None:
+            bars = rows_from(bars, 'Datetime', start_date, end_date)
+        if bars.empty:
+            continue
+        if block_rows is None:
+            yield bars
+            continue
+
+        # Cut at the last day boundary once block_rows bars are collected
+        pending.append(bars)
+        pending_rows += len(bars)
+        while pending_rows >= block_rows:
+            block = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+            days = day_floor(epoch_ns(block['Datetime']))
+            cut = int(days.searchsorted(days[block_rows - 1], side='right'))
+            if cut >= len(block):
+                pending, pending_rows = [], 0
+                yield block
+                break
+            pending, pending_rows = [block.iloc[cut:].reset_index(drop=True)], len(block) - cut
+            yield block.iloc[:cut]
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+def read_cash_ledger(ledger_path):
+    """
+    The full cash ledger of a chunked run as column arrays (see BudgetManager.ledger_arrays).
+    """
+    parts = [record["cash"] for record in iter_ledger_records(ledger_path) if record["cash"] is not None]
+    if not parts:
+        return {}
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def flush_closed_trades(state, ledger_path):
+    """
+    Moves the closed trades that precede the oldest open position (TradeLedger.spill,
+    so the ledger stays in trade id order) and the recorded cash flows to the ledger file.
+    """
+    state.trades.spill(ledger_path)
+    append_ledger_record(ledger_path, cash=state.budget_manager.drain_ledger())
+
+def run_chunked_simulation(stock_data, intraday_chunks, ticker, user_inputs, ledger_path,
+                           start_date=SIMULATION_START_DATE, conditions_library=None, end_date=None,
+                           progress_callback=None):
+    """
+    Same results as run_simulation, with the intraday bars streamed in chunks
+    (e.g. iter_intraday_store) instead of held in memory.
+
+    Each chunk is simulated up to its last day; only the simulation state (budget
+    and open positions) carries over to the next chunk. After every chunk the
+    closed trades and the cash flows are appended to ledger_path and dropped
+    from memory, so peak memory depends on the chunk size, not on the length of
+    the history. Chunks must be in time order and must not split a day.
+
+    Args:
+        stock_data (pd.DataFrame): Daily data. Indicators are computed if not already present.
+        intraday_chunks (iterable): DataFrames of intraday bars with a 'Datetime' column.
+        ticker (str): Ticker symbol of the traded stock.
+        user_inputs (dict): Simulation parameters (see user_io.get_user_inputs).
+        ledger_path (str): On-disk ledger (overwritten).
+        start_date, conditions_library, end_date, progress_callback: See run_simulation.
+
+    Returns:
+        tuple: (trades as a TradeLedger spilled to ledger_path, budget_manager, simulated
+        daily data); the cash ledger is read with read_cash_ledger(ledger_path).
+    """
+    if 'EMA_10' not in stock_data.columns:
+        stock_data = calculate_indicators(stock_data)
+    stock_data = rows_from(stock_data, 'Date', start_date, end_date)
+    day_times = epoch_ns(stock_data['Date'])
+
+    open(ledger_path, "wb").close()
+    state = SimulationState(user_inputs)
+    state.trades = TradeLedger(spill_path=ledger_path)
+    stopped = False
+
+    for chunk in intraday_chunks:
+        chunk = rows_from(chunk, 'Datetime', start_date, end_date)
+        if chunk.empty:
+            continue
+        first_day, last_day = day_floor(epoch_ns(chunk['Datetime'].iloc[[0, -1]]))
+        if state.processed_days and first_day <= day_times[state.processed_days - 1]:
+            raise ValueError(f"Intraday chunk starting {chunk['Datetime'].iloc[0]:%Y-%m-%d} "
+                             "is out of order or splits a day.")
+
+        # Days before this chunk have no bars; the chunk's days get its bars
+        end_day = int(day_times.searchsorted(last_day + NS_PER_DAY, side='left'))
+        stopped = simulate_days(
+            stock_data, chunk, ticker, user_inputs, state,
+            conditions_library, progress_callback, end_day
+        )
+        del chunk
+        flush_closed_trades(state, ledger_path)
+        if stopped:
+            break
+
+    # Days after the last intraday bar
+    if not stopped:
+        stopped = simulate_days(stock_data, None, ticker, user_inputs, state, conditions_library, progress_callback)
+    if stopped:
+        stock_data = stock_data.iloc[:state.processed_days]
+
+    close_open_positions(state, stock_data)
+    state.open_positions.clear()
+    flush_closed_trades(state, ledger_path)
+
+    return state.trades, state.budget_manager, stock_data
@@ -1,34 +1,175 @@
-import gspread
-from google.oauth2.service_account import Credentials
+import hashlib
+import logging
+import os
+import pickle
+import numpy as np
 import pandas as pd
+from sheets_client import get_sheets_client
 
-def authenticate_google_sheet(credentials_path, scopes):
+logger = logging.getLogger(__name__)
+
+# Where load_data takes its bars from
+DATA_SOURCES = ("both", "daily", "intraday")
+
+# Compact mode: float32 holds integers exactly up to 2**24 and ~7 significant digits,
+# i.e. prices below $100,000 are stored within 1e-7 relative (well under a cent)
+COMPACT_FLOAT_DTYPE = np.float32
+FLOAT32_EXACT_INTEGER_LIMIT = 2 ** 24
+TICKER_COLUMNS = ['Stock']
+# Reported as-is (the S&P return of the period), so kept in float64
+FLOAT64_COLUMNS = ['Index']
+
+# Delta fetches: a full download every this many fetches of a sheet, to verify the stored rows
+DEFAULT_FULL_FETCH_EVERY = 20
+
+def compact_dtypes(data):
+    """
+    Convert a loaded (or indicator) frame to its compact representation, in place:
+        - float64 prices/indicators -> float32 (relative error <= 6e-8)
+        - volume-like columns stay float64 when they exceed float32's exact integer range,
+          FLOAT64_COLUMNS always
+        - ticker columns -> categorical
+        - timestamps stay datetime64 columns, i.e. int64 epochs underneath
+          (never strings or Python objects; .view('int64') is free)
+
+    The simulation itself always computes in float64; only the stored columns shrink.
+
+    Returns:
+        pandas.DataFrame: The same frame, for chaining.
+    """
+    for column in data.columns:
+        values = data[column]
+        if column in TICKER_COLUMNS:
+            data[column] = values.astype('category')
+        elif values.dtype == np.float64 and column not in FLOAT64_COLUMNS:
+            if column == 'Volume' and values.abs().max() >= FLOAT32_EXACT_INTEGER_LIMIT:
+                continue
+            data[column] = values.astype(COMPACT_FLOAT_DTYPE)
+    return data
+
+def authenticate_google_sheet(credentials_path, scopes=None):
     """
     Authenticate the client for accessing Google Sheets.
+    Returns the shared, rate-limited SheetsClient (see sheets_client.py); the Google
+    client libraries are only imported there, so offline runs never load them.
     """
     try:
-        credentials = Credentials.from_service_account_file(credentials_path, scopes=scopes)
-        return gspread.authorize(credentials)
+        sheets_client = get_sheets_client(credentials_path, scopes)
+        sheets_client.client  # authorise now, so credential problems surface here
+        return sheets_client
     except Exception as e:
         raise RuntimeError(f"Failed to authenticate Google Sheets: {e}")
 
-def fetch_sheet_data(client, sheet_url, sheet_name):
+def fetch_sheet_data(client, sheet_url, sheet_name, cache_dir=None, full_fetch_every=DEFAULT_FULL_FETCH_EVERY):
     """
-    Fetch raw data from a Google Sheet.
+    Fetch raw data from a Google Sheet (None if the worksheet does not exist).
+    client is a SheetsClient (see authenticate_google_sheet).
+    With cache_dir set, only the rows appended since the last fetch are downloaded (see fetch_worksheet_delta).
     """
     try:
-        sheet = client.open_by_url(sheet_url)
-        worksheet = sheet.worksheet(sheet_name)
+        worksheet = client.worksheet(sheet_url, sheet_name)
+        if worksheet is None:
+            return None
+        if cache_dir is not None:
+            return fetch_worksheet_delta(worksheet, sheet_cache_path(cache_dir, sheet_url, sheet_name),
+                                         full_fetch_every)
         return worksheet.get_all_values()
-    except gspread.exceptions.WorksheetNotFound:
-        return None
     except Exception as e:
         raise RuntimeError(f"Failed to fetch data from Google Sheet: {e}")
 
-def preprocess_data(raw_data, is_intraday=False):
+def fetch_sheets(client, sheet_url, sheet_names, cache_dir=None, full_fetch_every=DEFAULT_FULL_FETCH_EVERY):
+    """
+    Fetch raw data of several worksheets of one spreadsheet: in one batched
+    request, or sheet by sheet as delta fetches when cache_dir is set.
+
+    Returns:
+        dict: Sheet name -> raw rows (None for missing worksheets).
+    """
+    if cache_dir is not None:
+        return {name: fetch_sheet_data(client, sheet_url, name, cache_dir, full_fetch_every) for name in sheet_names}
+    try:
+        return client.batch_get(sheet_url, sheet_names)
+    except Exception as e:
+        raise RuntimeError(f"Failed to fetch data from Google Sheet: {e}")
+
+def sheet_cache_path(cache_dir, sheet_url, sheet_name):
+    """
+    File holding the locally stored rows of one worksheet.
+    """
+    digest = hashlib.sha256(f"{sheet_url}\n{sheet_name}".encode()).hexdigest()[:24]
+    return os.path.join(cache_dir, f"{digest}.pkl")
+
+def _column_letter(column_number):
+    """
+    A1 notation column letter of a 1-based column number (1 -> A, 27 -> AA).
+    """
+    letters = ""
+    while column_number > 0:
+        column_number, remainder = divmod(column_number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def _pad_rows(rows, width):
+    return [list(row) + [""] * (width - len(row)) for row in rows]
+
+def _save_sheet_rows(cache_path, stored):
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(stored, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+def fetch_worksheet_delta(worksheet, cache_path, full_fetch_every=DEFAULT_FULL_FETCH_EVERY):
+    """
+    Returns all values of a worksheet (like get_all_values), downloading only
+    the rows appended since the previous call.
+
+    The rows of the previous fetch are stored in cache_path, with the
+    worksheet's column count at the time. The delta range starts at the last
+    stored row, which must come back unchanged, and spans all the worksheet's
+    columns; the whole sheet is downloaded again and replaces the stored rows
+    when it does not (edited or deleted rows), when the column count changed
+    or the delta has values beyond the stored columns (added columns), and on
+    every full_fetch_every-th call. Stored rows that no longer match the sheet
+    are reported with a logged warning.
+
+    The worksheet only needs get_all_values(), get_values(range_name) and
+    col_count, so a local fake can stand in for a gspread worksheet.
+    """
+    stored = None
+    try:
+        with open(cache_path, "rb") as f:
+            stored = pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        pass
+
+    col_count = worksheet.col_count
+    if (stored is not None and stored["rows"] and stored.get("col_count") == col_count
+            and stored["fetches_since_full"] + 1 < full_fetch_every):
+        rows = stored["rows"]
+        width = max(len(row) for row in rows)
+        last_row = len(rows)  # 1-based sheet row of the last stored row
+        delta = worksheet.get_values(f"A{last_row}:{_column_letter(max(col_count, width))}")
+        delta = _pad_rows(delta, width)
+        new_columns = any(any(row[width:]) for row in delta)
+        if delta and not new_columns and delta[0][:width] == _pad_rows(rows[-1:], width)[0]:
+            rows = rows + [row[:width] for row in delta[1:]]
+            _save_sheet_rows(cache_path, {"rows": rows, "col_count": col_count,
+                                          "fetches_since_full": stored["fetches_since_full"] + 1})
+            return rows
+
+    # Full fetch: first run, periodic verification, or the stored rows no longer match the sheet
+    rows = worksheet.get_all_values()
+    if stored is not None and stored["rows"] and rows[:len(stored["rows"])] != stored["rows"]:
+        logger.warning("Stored rows of the sheet differed from the sheet; replaced them (%s).", cache_path)
+    _save_sheet_rows(cache_path, {"rows": rows, "col_count": col_count, "fetches_since_full": 0})
+    return rows
+
+def preprocess_data(raw_data, is_intraday=False, compact=False):
     """
     Preprocess raw data into a pandas DataFrame.
     Handles both daily and intraday data.
+    With compact=True the frame is converted by compact_dtypes.
     """
     try:
         if not raw_data:
@@ -81,29 +222,102 @@ def preprocess_data(raw_data, is_intraday=False):
         if 'High' in data.columns and 'Low' in data.columns:
             data['Average Price'] = (data['High'] + data['Low']) / 2
 
+        if compact:
+            compact_dtypes(data)
+
         return data
 
     except Exception as e:
         raise RuntimeError(f"Failed to preprocess data: {e}")
 
-def load_data(sheet_url, credentials_path, daily_sheet="Sheet1", intraday_sheet=None):
+def resample_intraday_to_daily(intraday_data, ticker=None):
+    """
+    Build daily OHLCV bars from (sorted) intraday bars.
+    Day boundaries are found once and every column is aggregated with a single reduceat.
+
+    Parameters:
+        intraday_data (pd.DataFrame): Preprocessed intraday data with a 'Datetime' column.
+        ticker (str): Optional ticker stored in a 'Stock' column, as in the daily sheet.
+
+    Returns:
+        pandas.DataFrame: Daily data with Date, Open, High, Low, Close, Volume and Average Price.
+    """
+    if intraday_data is None or intraday_data.empty:
+        raise RuntimeError("No intraday data to build daily bars from.")
+
+    if not intraday_data['Datetime'].is_monotonic_increasing:
+        intraday_data = intraday_data.sort_values(by='Datetime', kind='stable')
+
+    days = intraday_data['Datetime'].dt.normalize().to_numpy()
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], len(days)]
+
+    daily = {'Date': days[starts]}
+    if ticker is not None:
+        daily['Stock'] = ticker
+    daily['Open'] = intraday_data['Open'].to_numpy()[starts]
+    daily['High'] = np.maximum.reduceat(intraday_data['High'].to_numpy(), starts)
+    daily['Low'] = np.minimum.reduceat(intraday_data['Low'].to_numpy(), starts)
+    daily['Close'] = intraday_data['Close'].to_numpy()[ends - 1]
+    if 'Volume' in intraday_data.columns:
+        daily['Volume'] = np.add.reduceat(intraday_data['Volume'].to_numpy(), starts)
+
+    data = pd.DataFrame(daily)
+    data['Average Price'] = (data['High'] + data['Low']) / 2
+    return data
+
+def ticker_from_sheet_name(sheet_name):
+    """
+    Intraday sheets are named "<TICKER>30" (e.g. "VRT30" -> "VRT").
+    """
+    if sheet_name and sheet_name.endswith("30") and len(sheet_name) > 2:
+        return sheet_name[:-2]
+    return None
+
+def load_data(sheet_url, credentials_path, daily_sheet="Sheet1", intraday_sheet=None, source="both",
+              compact=False, cache_dir=None):
     """
     1) Load daily data from 'daily_sheet' (e.g. "Sheet1") and
        retrieve the stock ticker from the 'Stock' column (first row).
     2) If intraday_sheet is specified, load intraday data from that sheet name.
 
+    source selects which sheets are downloaded:
+        "both"     - daily and intraday sheets (default)
+        "daily"    - only the daily sheet, no intraday data
+        "intraday" - only the intraday sheet; the daily bars are derived from it
+                     (no 'Index' column, ticker taken from the sheet name)
+
+    compact=True returns compact frames (see compact_dtypes).
+    With cache_dir set, the sheets' rows are stored there and later calls only
+    download the rows appended since (see fetch_worksheet_delta).
+
     Returns:
         (daily_data, intraday_data, ticker)
     """
+    if source not in DATA_SOURCES:
+        raise ValueError(f"source must be one of {DATA_SOURCES}, got {source!r}")
+    if source == "intraday" and not intraday_sheet:
+        raise ValueError("source='intraday' requires an intraday_sheet.")
+
     scopes = [
         'https://www.googleapis.com/auth/spreadsheets',
         'https://www.googleapis.com/auth/drive'
     ]
     client = authenticate_google_sheet(credentials_path, scopes)
 
+    # Download the needed sheets together (one batched request without cache_dir)
+    sheet_names = []
+    if source != "intraday":
+        sheet_names.append(daily_sheet)
+    if intraday_sheet and source != "daily":
+        sheet_names.append(intraday_sheet)
+    raw_sheets = fetch_sheets(client, sheet_url, sheet_names, cache_dir)
+
     # 1) Fetch daily data
-    raw_daily_data = fetch_sheet_data(client, sheet_url, daily_sheet)
-    daily_data = preprocess_data(raw_daily_data, is_intraday=False) if raw_daily_data else None
+    daily_data = None
+    if source != "intraday":
+        raw_daily_data = raw_sheets[daily_sheet]
+        daily_data = preprocess_data(raw_daily_data, is_intraday=False, compact=compact) if raw_daily_data else None
 
     # Extract ticker from the daily data's 'Stock' column (assuming the first row is correct)
     ticker = None
@@ -113,10 +327,17 @@ def load_data(sheet_url, credentials_path, daily_sheet="Sheet1", intraday_sheet=
             ticker = non_na_stocks.iloc[0]  # e.g. "AAPL"
 
     # 2) Fetch intraday data (if intraday_sheet provided)
-    if intraday_sheet:
-        raw_intraday_data = fetch_sheet_data(client, sheet_url, intraday_sheet)
-        intraday_data = preprocess_data(raw_intraday_data, is_intraday=True) if raw_intraday_data else None
+    if intraday_sheet and source != "daily":
+        raw_intraday_data = raw_sheets[intraday_sheet]
+        intraday_data = preprocess_data(raw_intraday_data, is_intraday=True, compact=compact) if raw_intraday_data else None
     else:
         intraday_data = None
 
+    # 3) Derive the daily bars from the intraday bars
+    if source == "intraday" and intraday_data is not None:
+        ticker = ticker_from_sheet_name(intraday_sheet)
+        daily_data = resample_intraday_to_daily(intraday_data, ticker)
+        if compact:
+            compact_dtypes(daily_data)
+
     return daily_data, intraday_data, ticker
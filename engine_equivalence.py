@@ -0,0 +1,346 @@
+import math
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from a0_TradingSim import run_simulation
+from batch_simulation import BATCH_PARAMETERS, run_batch_simulation
+from chunked_simulation import iter_intraday_store, run_chunked_simulation, write_intraday_store
+from incremental import run_incremental
+from multi_strategy import run_strategies
+from portfolio import run_portfolio_simulation
+from user_io import get_user_inputs
+
+# Default tolerances of the ledger comparison
+DEFAULT_REL_TOL = 1e-9
+DEFAULT_ABS_TOL = 1e-9
+
+# Bar (timestamp) at which a ledger field is decided
+FIELD_BARS = {
+    "partial_sale_done": "partial_sale_date",
+    "partial_sale_date": "partial_sale_date",
+    "partial_sale_price": "partial_sale_date",
+    "partial_sale_amount": "partial_sale_date",
+    "second_SL": "partial_sale_date",
+    "second_PT": "partial_sale_date",
+    "remaining_reason": "remaining_date",
+    "remaining_date": "remaining_date",
+    "remaining_price": "remaining_date",
+    "remaining_sale_amount": "remaining_date",
+}
+
+def synthetic_market(seed=0, days=400, start="2023-06-01", bars_per_day=13, ticker="SYN",
+                     start_price=100.0, drift=0.0005, volatility=0.008, gap_probability=0.05, gap_size=0.04):
+    """
+    Generates a seeded random daily + 30 minute intraday dataset in the loaded-data layout.
+
+    Overnight gaps (probability gap_probability, size up to gap_size) make the first bar of a
+    day open beyond the previous close, so SL/PT gap fills are exercised.
+
+    Returns:
+        tuple: (daily data, intraday data)
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=days)
+    n_bars = days * bars_per_day
+
+    # Overnight move: small noise plus an occasional gap
+    overnight = rng.normal(0, 0.01, days)
+    gaps = rng.random(days) < gap_probability
+    overnight[gaps] += rng.uniform(-gap_size, gap_size, gaps.sum())
+
+    # Bar returns; the first bar of every day also carries the overnight move
+    returns = rng.normal(drift, volatility, n_bars)
+    opening_move = np.zeros(n_bars)
+    opening_move[::bars_per_day] = overnight
+    closes = start_price * np.cumprod((1 + opening_move) * (1 + returns))
+    opens = np.empty(n_bars)
+    opens[0] = start_price * (1 + overnight[0])
+    opens[1:] = closes[:-1] * (1 + opening_move[1:])
+
+    highs = np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.003, n_bars)))
+    lows = np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.003, n_bars)))
+    volumes = rng.integers(1000, 5000, n_bars).astype(float)
+
+    offsets = pd.Timedelta(hours=9, minutes=30) + pd.to_timedelta(np.arange(bars_per_day) * 30, unit="min")
+    datetimes = (np.repeat(dates.values, bars_per_day)
+                 + np.tile(offsets.values, days))
+    intraday_data = pd.DataFrame({
+        "Datetime": datetimes,
+        "Open": np.round(opens, 2),
+        "High": np.round(highs, 2),
+        "Low": np.round(lows, 2),
+        "Close": np.round(closes, 2),
+        "Volume": volumes
+    })
+    intraday_data["Average Price"] = (intraday_data["High"] + intraday_data["Low"]) / 2
+
+    starts = np.arange(0, n_bars, bars_per_day)
+    stock_data = pd.DataFrame({
+        "Stock": ticker,
+        "Date": dates,
+        "Open": intraday_data["Open"].to_numpy()[starts],
+        "High": np.maximum.reduceat(intraday_data["High"].to_numpy(), starts),
+        "Low": np.minimum.reduceat(intraday_data["Low"].to_numpy(), starts),
+        "Close": intraday_data["Close"].to_numpy()[starts + bars_per_day - 1],
+        "Volume": np.add.reduceat(volumes, starts)
+    })
+    stock_data["Average Price"] = (stock_data["High"] + stock_data["Low"]) / 2
+    return stock_data, intraday_data
+
+def parameter_sets(n, seed=0):
+    """
+    Draws n seeded random user input sets around get_user_inputs().
+    """
+    rng = np.random.default_rng(seed)
+    sets = []
+    for _ in range(n):
+        user_inputs = get_user_inputs()
+        user_inputs["first_SL"] = float(rng.choice([2, 3, 4, 5, 6]))
+        user_inputs["first_PT"] = float(rng.choice([5, 8, 10, 15, 20]))
+        user_inputs["max_risk"] = float(rng.choice([0.5, 1.0, 1.5, 2.0]))
+        user_inputs["partial_sale_percentage"] = int(rng.choice([0, 20, 30, 50, 100]))
+        sets.append(user_inputs)
+    return sets
+
+def reference_engine(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library=None):
+    """
+    The trading_loop simulation (run_simulation), the reference all other engines are checked against.
+    """
+    trades, budget_manager, _ = run_simulation(
+        stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library
+    )
+    return trades, budget_manager
+
+def incremental_engine(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library=None):
+    """
+    run_incremental on the first half of the days, then again on all of them.
+    """
+    with tempfile.TemporaryDirectory() as state_dir:
+        state_path = os.path.join(state_dir, "state.pkl")
+        cut_date = stock_data["Date"].iloc[len(stock_data) // 2]
+        first_intraday = None
+        if intraday_data is not None:
+            first_intraday = intraday_data[intraday_data["Datetime"] < cut_date]
+        run_incremental(stock_data[stock_data["Date"] < cut_date], first_intraday, ticker, user_inputs,
+                        state_path, start_date, conditions_library)
+        trades, budget_manager, _, _ = run_incremental(
+            stock_data, intraday_data, ticker, user_inputs, state_path, start_date, conditions_library
+        )
+    return trades, budget_manager
+
+def chunked_engine(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library=None):
+    """
+    run_chunked_simulation on the bars of an intraday store, streamed one month at a time.
+    """
+    with tempfile.TemporaryDirectory() as run_dir:
+        store_dir = os.path.join(run_dir, "store")
+        write_intraday_store(intraday_data, store_dir)
+        trades, budget_manager, _ = run_chunked_simulation(
+            stock_data, iter_intraday_store(store_dir), ticker, user_inputs,
+            os.path.join(run_dir, "ledger.pkl"), start_date, conditions_library
+        )
+        trades = dict(trades.items())  # read the spilled trades before the ledger file goes
+    return trades, budget_manager
+
+def portfolio_engine(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library=None):
+    """
+    run_portfolio_simulation on a universe of this one ticker, with top_k=1.
+    """
+    trades, budget_manager, _ = run_portfolio_simulation(
+        {ticker: (stock_data, intraday_data)}, user_inputs, start_date, conditions_library, top_k=1
+    )
+    return trades, budget_manager
+
+def multi_strategy_engine(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library=None):
+    """
+    run_strategies with these user inputs as its only strategy.
+    """
+    strategy = {} if conditions_library is None else {"conditions_library": conditions_library}
+    results, _ = run_strategies(stock_data, intraday_data, ticker, {"strategy": strategy}, user_inputs, start_date)
+    return results["strategy"]
+
+def batch_engine(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library=None):
+    """
+    run_batch_simulation with these user inputs as its only lane. The batch
+    engine keeps no adjustment log, so its trades are compared without one.
+    """
+    parameters = {name: user_inputs[name] for name in BATCH_PARAMETERS}
+    result = run_batch_simulation(stock_data, intraday_data, ticker, [parameters], user_inputs, start_date,
+                                  conditions_library)
+    if not result.feasible[0]:
+        raise ValueError("Insufficient liquidity to complete the transaction.")
+    trades = result.trades(0)
+    for trade in trades.values():
+        del trade["adjustments"]
+    return trades, result.budget(0)
+
+# Engines: name -> engine(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library)
+# returning (trades, budget_manager). Register fast paths here to have them checked.
+ENGINES = {
+    "reference": reference_engine,
+    "incremental": incremental_engine,
+    "chunked": chunked_engine,
+    "portfolio": portfolio_engine,
+    "multi_strategy": multi_strategy_engine,
+    "batch": batch_engine,
+}
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT
+
+def values_equal(reference, candidate, rel_tol=DEFAULT_REL_TOL, abs_tol=DEFAULT_ABS_TOL):
+    """
+    Compares two ledger values: numbers within the tolerances, everything else exactly.
+    """
+    if _is_missing(reference) or _is_missing(candidate):
+        return _is_missing(reference) and _is_missing(candidate)
+    if isinstance(reference, (bool, np.bool_)) or isinstance(candidate, (bool, np.bool_)):
+        return bool(reference) == bool(candidate)
+    if isinstance(reference, (int, float, np.number)) and isinstance(candidate, (int, float, np.number)):
+        return math.isclose(float(reference), float(candidate), rel_tol=rel_tol, abs_tol=abs_tol)
+    return reference == candidate
+
+def _earliest(*timestamps):
+    timestamps = [pd.Timestamp(value) for value in timestamps if not _is_missing(value)]
+    return min(timestamps) if timestamps else None
+
+def diff_ledgers(reference, candidate, rel_tol=DEFAULT_REL_TOL, abs_tol=DEFAULT_ABS_TOL):
+    """
+    Compares two trade ledgers field by field.
+
+    Every difference is attributed to the bar at which the field is decided
+    (entry, partial sale, final sale or adjustment date), so sorting by bar
+    gives the first point where the engines diverge. Adjustment logs are only
+    compared when the candidate trades have one ('adjustments').
+
+    Returns:
+        pandas.DataFrame: One row per difference (bar, trade_id, field, reference, candidate), sorted by bar.
+    """
+    rows = []
+
+    def add(trade_id, field, reference_value, candidate_value, bar):
+        rows.append({"bar": bar, "trade_id": trade_id, "field": field,
+                     "reference": reference_value, "candidate": candidate_value})
+
+    for trade_id in sorted(set(reference) | set(candidate)):
+        reference_trade = reference.get(trade_id)
+        candidate_trade = candidate.get(trade_id)
+        if reference_trade is None or candidate_trade is None:
+            trade = reference_trade if reference_trade is not None else candidate_trade
+            add(trade_id, "<trade>", reference_trade is not None, candidate_trade is not None, trade["entry_date"])
+            continue
+
+        entry_bar = _earliest(reference_trade["entry_date"], candidate_trade["entry_date"])
+        for field in sorted((set(reference_trade) | set(candidate_trade)) - {"adjustments"}):
+            reference_value = reference_trade.get(field)
+            candidate_value = candidate_trade.get(field)
+            if values_equal(reference_value, candidate_value, rel_tol, abs_tol):
+                continue
+            bar_field = FIELD_BARS.get(field)
+            bar = entry_bar
+            if bar_field is not None:
+                bar = _earliest(reference_trade.get(bar_field), candidate_trade.get(bar_field)) or entry_bar
+            add(trade_id, field, reference_value, candidate_value, bar)
+
+        if "adjustments" not in candidate_trade:
+            continue  # the engine keeps no adjustment log
+        reference_adjustments = reference_trade.get("adjustments", [])
+        candidate_adjustments = candidate_trade.get("adjustments", [])
+        for i in range(max(len(reference_adjustments), len(candidate_adjustments))):
+            if i >= len(reference_adjustments) or i >= len(candidate_adjustments):
+                # One ledger has more adjustments than the other
+                adjustment = reference_adjustments[i] if i < len(reference_adjustments) else candidate_adjustments[i]
+                add(trade_id, f"adjustments[{i}]", i < len(reference_adjustments), i < len(candidate_adjustments),
+                    adjustment["adjustment_date"])
+                continue
+            for field in sorted(set(reference_adjustments[i]) | set(candidate_adjustments[i])):
+                reference_value = reference_adjustments[i].get(field)
+                candidate_value = candidate_adjustments[i].get(field)
+                if not values_equal(reference_value, candidate_value, rel_tol, abs_tol):
+                    add(trade_id, f"adjustments[{i}].{field}", reference_value, candidate_value,
+                        _earliest(reference_adjustments[i].get("adjustment_date"),
+                                  candidate_adjustments[i].get("adjustment_date")))
+
+    report = pd.DataFrame(rows, columns=["bar", "trade_id", "field", "reference", "candidate"])
+    return report.sort_values(["bar", "trade_id"], kind="stable").reset_index(drop=True)
+
+def compare_engines(engines=None, seeds=range(5), n_parameter_sets=4, days=400, start_date="2024-01-01",
+                    rel_tol=DEFAULT_REL_TOL, abs_tol=DEFAULT_ABS_TOL, conditions_library=None,
+                    market_options=None):
+    """
+    Runs the reference engine and every other engine on seeded synthetic datasets
+    and parameter sets, diffs the ledgers and final budgets, and times each run.
+
+    Args:
+        engines (dict): Name -> engine (default: ENGINES). "reference" is always the baseline.
+        seeds (iterable): Dataset seeds (each seed also draws its own parameter sets).
+        n_parameter_sets (int): Parameter sets per dataset.
+        days (int): Trading days per dataset.
+        start_date (str): First simulated date.
+        market_options (dict): Extra arguments of synthetic_market.
+
+    Returns:
+        tuple: (runs DataFrame with one row per engine run, timing DataFrame with the speedup per engine)
+    """
+    engines = dict(ENGINES if engines is None else engines)
+    reference = engines.pop("reference", reference_engine)
+    runs = []
+
+    for seed in seeds:
+        stock_data, intraday_data = synthetic_market(seed, days, **(market_options or {}))
+        ticker = stock_data["Stock"].iloc[0]
+        for parameter_id, user_inputs in enumerate(parameter_sets(n_parameter_sets, seed)):
+            started = time.perf_counter()
+            reference_trades, reference_budget = reference(
+                stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library
+            )
+            reference_seconds = time.perf_counter() - started
+            runs.append({"engine": "reference", "seed": seed, "parameter_id": parameter_id,
+                         "seconds": reference_seconds, "trades": len(reference_trades),
+                         "differences": 0, "first_divergent_bar": None, "first_difference": None})
+
+            for name, engine in engines.items():
+                started = time.perf_counter()
+                trades, budget_manager = engine(
+                    stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library
+                )
+                seconds = time.perf_counter() - started
+
+                differences = diff_ledgers(reference_trades, trades, rel_tol, abs_tol)
+                first_bar = differences["bar"].iloc[0] if not differences.empty else None
+                first_difference = None
+                if not differences.empty:
+                    row = differences.iloc[0]
+                    first_difference = f"trade {row['trade_id']} {row['field']}: {row['reference']!r} != {row['candidate']!r}"
+                budget_differences = [
+                    label for label, getter in (("liquidity", "get_total_liquidity"),
+                                              ("contributions", "get_total_contributions"))
+                    if not values_equal(getattr(reference_budget, getter)(), getattr(budget_manager, getter)(),
+                                        rel_tol, abs_tol)
+                ]
+                if budget_differences and first_difference is None:
+                    first_difference = "final " + ", ".join(budget_differences)
+
+                runs.append({"engine": name, "seed": seed, "parameter_id": parameter_id,
+                             "seconds": seconds, "trades": len(trades),
+                             "differences": len(differences) + len(budget_differences),
+                             "first_divergent_bar": first_bar, "first_difference": first_difference})
+
+    runs = pd.DataFrame(runs)
+    timing = runs.groupby("engine", sort=False).agg(
+        runs=("seconds", "size"),
+        total_seconds=("seconds", "sum"),
+        median_seconds=("seconds", "median"),
+        failed_runs=("differences", lambda counts: int((counts > 0).sum()))
+    )
+    timing["speedup"] = timing.loc["reference", "total_seconds"] / timing["total_seconds"]
+    return runs, timing.reset_index()
+
+if __name__ == "__main__":
+    engine_runs, engine_timing = compare_engines()
+    failures = engine_runs[engine_runs["differences"] > 0]
+    if not failures.empty:
+        print(failures[["engine", "seed", "parameter_id", "first_divergent_bar", "first_difference"]].to_string())
+    print(engine_timing.to_string(index=False))
@@ -0,0 +1,123 @@
+import json
+import hashlib
+import os
+import pickle
+from a0_TradingSim import (
+    SimulationState,
+    SIMULATION_START_DATE,
+    rows_from,
+    simulate_days,
+    close_open_positions
+)
+from Indicators import calculate_indicators, INDICATOR_COLUMNS
+from price_entry_tradesize import enabled_conditions
+from result_cache import code_version, data_fingerprint
+
+STATE_FORMAT_VERSION = 3
+
+def run_key(ticker, user_inputs, start_date, conditions_library=None):
+    """
+    Identifies the run configuration a saved state belongs to (the data is checked separately).
+    """
+    key_material = {
+        "format": STATE_FORMAT_VERSION,
+        "ticker": str(ticker),
+        "user_inputs": {name: repr(value) for name, value in sorted(user_inputs.items())},
+        "start_date": str(start_date),
+        "conditions": enabled_conditions(conditions_library),
+        "code_version": code_version()
+    }
+    return hashlib.sha256(json.dumps(key_material, sort_keys=True).encode()).hexdigest()
+
+def load_run_state(state_path):
+    """
+    Loads a saved run state, or returns None if there is none (or it is unreadable).
+    """
+    try:
+        with open(state_path, "rb") as f:
+            return pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        return None
+
+def save_run_state(state_path, saved):
+    """
+    Writes the run state atomically.
+    """
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, state_path)
+
+def _reusable_state(saved, key, raw_daily):
+    """
+    The saved simulation state if it belongs to this configuration and the
+    daily bars it was computed from (row count and fingerprint) are an
+    unchanged prefix of the new data.
+    """
+    if saved is None or saved.get("key") != key:
+        return None
+    if saved["rows"] > len(raw_daily):
+        return None
+    if data_fingerprint(raw_daily.iloc[:saved["rows"]].reset_index(drop=True)) != saved["fingerprint"]:
+        return None
+    return saved["state"]
+
+def run_incremental(stock_data, intraday_data, ticker, user_inputs, state_path,
+                    start_date=SIMULATION_START_DATE, conditions_library=None):
+    """
+    Same results as run_simulation, but only the bars appended since the last call are processed.
+
+    The end-of-run state (budget, open positions, trade ledger and last processed
+    day) is saved to state_path, with the row count and fingerprint of the daily
+    bars it covers, before the final "End of Simulation" close is applied. On the
+    next call the indicators are computed on the full history (calculate_indicators
+    is vectorized, cheaper than storing and reloading the frame) and only the new
+    days are replayed. If the configuration, the code or any previously seen
+    bar changed, a full run is done instead.
+
+    The intraday bars of a day must be complete when that day is processed
+    (i.e. run after the close, as with the daily append).
+
+    Args:
+        stock_data (pd.DataFrame): Raw daily data (without indicators), full history.
+        intraday_data (pd.DataFrame or None): Intraday bars, full history.
+        ticker (str): Ticker symbol.
+        user_inputs (dict): Simulation parameters.
+        state_path (str): File holding the state between runs.
+
+    Returns:
+        tuple: (trades, budget_manager, simulated daily data, full daily data with indicators)
+    """
+    raw_daily = stock_data[[column for column in stock_data.columns if column not in INDICATOR_COLUMNS]]
+    raw_daily = raw_daily.reset_index(drop=True)
+    key = run_key(ticker, user_inputs, start_date, conditions_library)
+    state = _reusable_state(load_run_state(state_path), key, raw_daily)
+    if state is None:
+        state = SimulationState(user_inputs)
+
+    # Step 1: Indicators on the full history
+    full_data_with_indicators = calculate_indicators(raw_daily)
+    simulated_data = rows_from(full_data_with_indicators, 'Date', start_date)
+
+    # Step 2: Replay only the days not processed yet
+    if state.processed_days < len(simulated_data):
+        first_new_date = simulated_data.loc[state.processed_days, 'Date']
+        new_intraday = None
+        if intraday_data is not None:
+            new_intraday = rows_from(intraday_data, 'Datetime', first_new_date)
+        simulate_days(
+            simulated_data,
+            new_intraday,
+            ticker,
+            user_inputs,
+            state,
+            conditions_library
+        )
+
+    save_run_state(state_path, {"key": key, "state": state, "rows": len(raw_daily),
+                                "fingerprint": data_fingerprint(raw_daily)})
+
+    # Step 3: Close the open positions; the saved state stays open
+    close_open_positions(state, simulated_data)
+
+    return state.trades, state.budget_manager, simulated_data, full_data_with_indicators
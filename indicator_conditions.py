@@ -1,3 +1,5 @@
+import numpy as np
+
 def sma_5_10_condition(indicators_df, current_index):
     """
     Checks if SMA5 > SMA10 for the previous day.
@@ -129,3 +131,111 @@ def ema_200_condition(entry_price, indicators_df, current_index):
     """
     ema_200 = indicators_df.loc[current_index, 'EMA_200']
     return entry_price > ema_200
+
+
+# Vectorized conditions
+#
+# The functions below evaluate the conditions above for every row at once
+# (e.g. years of 30-minute bars). "Previous day" becomes "previous row" and the
+# entry price is the row's Open, so on daily data the result matches
+# entry_conditions row by row.
+
+def _pairwise_sum(terms):
+    """
+    Sums a list of equally long arrays element-wise in the order numpy's
+    pairwise summation (used by Series.mean) adds up to 15 numbers,
+    so window means are bit-identical to the scalar conditions.
+    """
+    if len(terms) < 8:
+        total = np.zeros_like(terms[0])
+        for term in terms:
+            total = total + term
+        return total
+    total = ((terms[0] + terms[1]) + (terms[2] + terms[3])) + ((terms[4] + terms[5]) + (terms[6] + terms[7]))
+    for term in terms[8:]:
+        total = total + term
+    return total
+
+def _trailing_mean(values, window):
+    """
+    Mean of values[max(0, i - window + 1) : i + 1] for every i, skipping NaNs
+    (like Series.loc[...].mean() on the slice). window must be below 16.
+    """
+    n = len(values)
+    means = np.full(n, np.nan)
+    finite = ~np.isnan(values)
+    filled = np.where(finite, values, 0.0)
+    for length in range(1, window + 1):
+        # Rows whose slice has `length` elements (only the first window-1 rows are shorter)
+        rows = np.arange(window - 1, n) if length == window else np.arange(length - 1, min(length, n))
+        if not len(rows):
+            continue
+        starts = rows - length + 1
+        terms = [filled[starts + k] for k in range(length)]
+        counts = sum(finite[starts + k].astype(np.int64) for k in range(length))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[rows] = np.where(counts > 0, _pairwise_sum(terms) / counts, np.nan)
+    return means
+
+def _previous(values, periods=1):
+    shifted = np.full(len(values), np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[:len(values) - periods]
+    return shifted
+
+def condition_signals(data_df, condition_names):
+    """
+    Evaluates each of the named entry conditions on every row of data_df.
+
+    Parameters:
+        data_df (pd.DataFrame): Prices (Open, High, Close) and indicators (see Indicators.calculate_indicators).
+        condition_names (iterable): Condition names (see price_entry_tradesize.CONDITIONS_LIBRARY).
+
+    Returns:
+        dict: Condition name -> boolean array, True where the condition holds for an entry at the row's Open.
+    """
+    def column(name):
+        return data_df[name].to_numpy(dtype=np.float64)
+
+    n = len(data_df)
+    has_previous = np.arange(n) >= 1
+    with np.errstate(invalid='ignore'):
+        condition_arrays = {
+            'rsi_condition': lambda: (column('RSI') > 40) & (column('RSI') < 70),
+            'macd_condition': lambda: (np.arange(n) >= 2) & (
+                _previous(column('MACD_Histogram'), 2) < _previous(column('MACD_Histogram'))),
+            'ema_10_condition': lambda: column('Open') > column('EMA_10'),
+            'ema_20_condition': lambda: column('Open') > column('EMA_20'),
+            'ema_50_condition': lambda: column('Open') > column('EMA_50'),
+            'ema_100_condition': lambda: column('Open') > column('EMA_100'),
+            'ema_200_condition': lambda: column('Open') > column('EMA_200'),
+            'sma_5_10_condition': lambda: has_previous & (
+                _previous(column('SMA_5')) > _previous(column('SMA_10'))),
+            'ema_50_avg_condition': lambda: has_previous & (
+                _previous(column('EMA_50')) > _previous(_trailing_mean(column('EMA_50'), 11))),
+            'high_avg_condition': lambda: has_previous & (
+                _previous(column('High')) > _previous(_trailing_mean(column('High'), 10))),
+            'prev_close_greater_than_open': lambda: has_previous & (
+                _previous(column('Close')) >= 0.985 * _previous(column('Open'))),
+            'ema_100_prev_close': lambda: has_previous & (
+                _previous(column('EMA_100')) <= 0.99 * _previous(column('Close')))
+        }
+
+        return {name: condition_arrays[name]() for name in condition_names}
+
+def vectorized_conditions(data_df, conditions_library):
+    """
+    Evaluates the enabled entry conditions on every row of data_df.
+
+    Parameters:
+        data_df (pd.DataFrame): Prices (Open, High, Close) and indicators (see Indicators.calculate_indicators).
+        conditions_library (dict): Condition name -> enabled (see price_entry_tradesize.CONDITIONS_LIBRARY).
+
+    Returns:
+        np.ndarray: Boolean array, True where all enabled conditions hold for an entry at the row's Open.
+    """
+    enabled = [condition for condition, is_enabled in conditions_library.items() if is_enabled]
+    signals = np.ones(len(data_df), dtype=bool)
+    for condition_signal in condition_signals(data_df, enabled).values():
+        signals &= condition_signal
+    return signals
@@ -0,0 +1,383 @@
+import json
+import numbers
+import os
+import pickle
+import socket
+import sys
+import time
+import uuid
+import pandas as pd
+from a0_TradingSim import run_simulation, SIMULATION_START_DATE
+from user_io import summary_metrics
+
+# Job states are directories; a job moves between them with atomic renames,
+# so only a shared filesystem is needed (no broker, no database server).
+STATES = ("pending", "running", "done", "failed")
+RESULTS_DIR = "results"
+
+DEFAULT_LEASE_SECONDS = 300   # a running job without heartbeat for this long is considered abandoned
+DEFAULT_MAX_ATTEMPTS = 3
+HEARTBEAT_SECONDS = 10
+
+# Suffixes of job files between two states (see _transition_path)
+TRANSITION_KINDS = ("claiming", "finishing", "stale")
+
+def init_queue(queue_dir):
+    """
+    Creates the queue directory layout (idempotent).
+    """
+    for state in STATES + (RESULTS_DIR,):
+        os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+    return queue_dir
+
+def _job_path(queue_dir, state, job_id):
+    return os.path.join(queue_dir, state, f"{job_id}.json")
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, default=str)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def _job_ids(queue_dir, state):
+    names = [name for name in os.listdir(os.path.join(queue_dir, state)) if name.endswith(".json")]
+    return sorted(name[:-len(".json")] for name in names)
+
+def save_dataset(path, stock_data, intraday_data, ticker):
+    """
+    Writes the data of one ticker to the shared filesystem for workers to load.
+    """
+    with open(path, "wb") as f:
+        pickle.dump({"daily": stock_data, "intraday": intraday_data, "ticker": ticker}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+def make_jobs(data_paths, candidates, date_ranges=((SIMULATION_START_DATE, None),), base_inputs=None):
+    """
+    Builds the jobs of a sweep: every dataset x parameter set x date range.
+
+    Args:
+        data_paths (list): Dataset files written by save_dataset (one per ticker).
+        candidates (list): Dicts of user input overrides; an optional "conditions_library" entry.
+        date_ranges (list): (start_date, end_date) tuples; end_date None means all data.
+        base_inputs (dict): User inputs the candidates override.
+
+    Returns:
+        list: Job dicts for submit_jobs.
+    """
+    jobs = []
+    for data_path in data_paths:
+        for candidate in candidates:
+            user_inputs = dict(base_inputs or {})
+            user_inputs.update({name: value for name, value in candidate.items() if name != "conditions_library"})
+            for start_date, end_date in date_ranges:
+                jobs.append({
+                    "data_path": data_path,
+                    "user_inputs": user_inputs,
+                    "conditions_library": candidate.get("conditions_library"),
+                    "start_date": str(start_date),
+                    "end_date": None if end_date is None else str(end_date)
+                })
+    return jobs
+
+def submit_jobs(queue_dir, jobs):
+    """
+    Adds jobs to the pending state.
+
+    Returns:
+        list: The job ids.
+    """
+    init_queue(queue_dir)
+    job_ids = []
+    for job in jobs:
+        job = dict(job)
+        job.setdefault("job_id", f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:12]}")
+        job.setdefault("attempts", 0)
+        job.setdefault("errors", [])
+        _write_json(_job_path(queue_dir, "pending", job["job_id"]), job)
+        job_ids.append(job["job_id"])
+    return job_ids
+
+def _transition_path(queue_dir, job_id, kind):
+    # Private name of a job file taken out of its state ("claiming", "finishing" or "stale").
+    # Only renames move a job between states; the name carries the time the file was
+    # taken, so requeue_stale_jobs can recover it if its worker dies mid-transition.
+    running_path = _job_path(queue_dir, "running", job_id)
+    return f"{running_path}.{time.time_ns()}.{uuid.uuid4().hex}.{kind}"
+
+def _transition_files(queue_dir):
+    """
+    Job files in transition: (path, job_id, time taken in seconds since the epoch).
+    """
+    files = []
+    running_dir = os.path.join(queue_dir, "running")
+    for name in os.listdir(running_dir):
+        parts = name.rsplit(".", 3)
+        if len(parts) == 4 and parts[3] in TRANSITION_KINDS and parts[0].endswith(".json"):
+            files.append((os.path.join(running_dir, name), parts[0][:-len(".json")], int(parts[1]) / 1e9))
+    return files
+
+def claim_job(queue_dir, worker_id):
+    """
+    Atomically claims the oldest pending job.
+
+    The job file is renamed to a private name (only one worker can win this
+    rename), the claim is written into it and it is renamed into running, so
+    the running file never carries the modification time it had in pending.
+
+    Returns:
+        dict or None: The claimed job, or None if nothing is pending.
+    """
+    for job_id in _job_ids(queue_dir, "pending"):
+        claiming_path = _transition_path(queue_dir, job_id, "claiming")
+        try:
+            os.rename(_job_path(queue_dir, "pending", job_id), claiming_path)
+        except FileNotFoundError:
+            continue
+        job = _read_json(claiming_path)
+        job["attempts"] += 1
+        job["worker_id"] = worker_id
+        job["claimed_at"] = time.time()
+        _write_json(claiming_path, job)  # a new file: the lease starts now
+        os.rename(claiming_path, _job_path(queue_dir, "running", job_id))
+        return job
+    return None
+
+def heartbeat(queue_dir, job_id):
+    """
+    Renews the lease of a running job.
+    """
+    try:
+        os.utime(_job_path(queue_dir, "running", job_id))
+    except FileNotFoundError:
+        pass
+
+def _take_running(queue_dir, job):
+    """
+    Takes running/<id>.json out of the running state (atomic rename) if it still
+    holds this claim of the job (same worker_id and claimed_at).
+
+    Returns:
+        str or None: The path the job file was moved to, or None if the lease was
+        lost (the job was requeued, and possibly claimed again).
+    """
+    running_path = _job_path(queue_dir, "running", job["job_id"])
+    finishing_path = _transition_path(queue_dir, job["job_id"], "finishing")
+    try:
+        os.rename(running_path, finishing_path)
+    except FileNotFoundError:
+        return None
+    current = _read_json(finishing_path)
+    if current.get("worker_id") != job.get("worker_id") or current.get("claimed_at") != job.get("claimed_at"):
+        os.rename(finishing_path, running_path)  # another worker's claim: give it back
+        return None
+    return finishing_path
+
+def _finish_job(queue_dir, job, state, taken_path):
+    # Writes the job into the file taken out of running, then moves it to its new state
+    _write_json(taken_path, job)
+    os.rename(taken_path, _job_path(queue_dir, state, job["job_id"]))
+
+def complete_job(queue_dir, job, trades, metrics):
+    """
+    Stores the trade ledger and moves the job (with its metrics) to done.
+
+    Returns:
+        bool: False (and nothing stored) if the job's lease was lost.
+    """
+    finishing_path = _take_running(queue_dir, job)
+    if finishing_path is None:
+        return False
+    with open(os.path.join(queue_dir, RESULTS_DIR, f"{job['job_id']}.pkl"), "wb") as f:
+        pickle.dump(trades, f, protocol=pickle.HIGHEST_PROTOCOL)
+    job["metrics"] = metrics
+    job["finished_at"] = time.time()
+    _finish_job(queue_dir, job, "done", finishing_path)
+    return True
+
+def fail_job(queue_dir, job, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Records an error and retries the job, or moves it to failed after max_attempts.
+
+    Returns:
+        bool: False (and nothing recorded) if the job's lease was lost.
+    """
+    finishing_path = _take_running(queue_dir, job)
+    if finishing_path is None:
+        return False
+    job["errors"].append(str(error))
+    _finish_job(queue_dir, job, "failed" if job["attempts"] >= max_attempts else "pending", finishing_path)
+    return True
+
+def requeue_stale_jobs(queue_dir, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Returns abandoned running jobs (crashed or lost workers) to pending,
+    or to failed after max_attempts. Job files left in transition by a worker
+    that died while claiming or finishing them are recovered the same way.
+
+    Returns:
+        int: Number of jobs requeued or failed.
+    """
+    now = time.time()
+    candidates = []
+    for job_id in _job_ids(queue_dir, "running"):
+        running_path = _job_path(queue_dir, "running", job_id)
+        try:
+            candidates.append((running_path, job_id, os.stat(running_path).st_mtime))
+        except FileNotFoundError:
+            continue
+    candidates.extend(_transition_files(queue_dir))
+
+    count = 0
+    for path, job_id, last_seen in candidates:
+        if now - last_seen < lease_seconds:
+            continue
+        # Take the stale job for requeueing (atomic, so two workers can't both requeue it)
+        stale_path = _transition_path(queue_dir, job_id, "stale")
+        try:
+            os.rename(path, stale_path)
+        except FileNotFoundError:
+            continue
+        job = _read_json(stale_path)
+        job["errors"].append(f"lease expired (worker {job.get('worker_id')})")
+        _finish_job(queue_dir, job, "failed" if job["attempts"] >= max_attempts else "pending", stale_path)
+        count += 1
+    return count
+
+def _json_value(value):
+    if isinstance(value, str):
+        return value
+    return int(value) if isinstance(value, numbers.Integral) else float(value)
+
+def _json_metrics(metrics):
+    return {name: _json_value(value) for name, value in metrics.items()}
+
+class _Heartbeat:
+    """
+    progress_callback for run_simulation that renews the job lease while it runs.
+    """
+
+    def __init__(self, queue_dir, job_id):
+        self.queue_dir = queue_dir
+        self.job_id = job_id
+        self.last_beat = time.time()
+
+    def __call__(self, current_date, close_price, budget_manager, open_positions):
+        if time.time() - self.last_beat >= HEARTBEAT_SECONDS:
+            heartbeat(self.queue_dir, self.job_id)
+            self.last_beat = time.time()
+        return False
+
+def run_job(queue_dir, job, datasets):
+    """
+    Runs one backtest job.
+
+    Returns:
+        tuple: (trades, summary metrics)
+    """
+    data_path = job["data_path"]
+    if data_path not in datasets:
+        with open(data_path, "rb") as f:
+            datasets[data_path] = pickle.load(f)
+    dataset = datasets[data_path]
+
+    trades, budget_manager, simulated_data = run_simulation(
+        dataset["daily"],
+        dataset["intraday"],
+        dataset["ticker"],
+        job["user_inputs"],
+        start_date=job["start_date"],
+        conditions_library=job.get("conditions_library"),
+        end_date=job.get("end_date"),
+        progress_callback=_Heartbeat(queue_dir, job["job_id"])
+    )
+    metrics = _json_metrics(summary_metrics(trades, budget_manager, simulated_data))
+    metrics["ticker"] = str(dataset["ticker"])
+    return trades, metrics
+
+def run_worker(queue_dir, worker_id=None, max_jobs=None, poll_interval=1.0, idle_timeout=None,
+               lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Claims and runs jobs until the queue stays empty for idle_timeout seconds
+    (forever if None) or max_jobs jobs have been processed.
+    Idle workers also requeue abandoned jobs, so no separate coordinator process is needed.
+
+    Returns:
+        int: Number of jobs processed.
+    """
+    init_queue(queue_dir)
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    datasets = {}
+    processed = 0
+    idle_since = time.time()
+
+    while max_jobs is None or processed < max_jobs:
+        job = claim_job(queue_dir, worker_id)
+        if job is None:
+            if requeue_stale_jobs(queue_dir, lease_seconds, max_attempts):
+                continue
+            if idle_timeout is not None and time.time() - idle_since >= idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            trades, metrics = run_job(queue_dir, job, datasets)
+        except Exception as e:
+            fail_job(queue_dir, job, e, max_attempts)
+        else:
+            complete_job(queue_dir, job, trades, metrics)
+        processed += 1
+        idle_since = time.time()
+
+    return processed
+
+def queue_status(queue_dir):
+    """
+    Number of jobs in every state.
+    """
+    return {state: len(_job_ids(queue_dir, state)) for state in STATES}
+
+def collect_results(queue_dir):
+    """
+    Aggregates the finished jobs into one table (one row per job: parameters, date range and metrics).
+    """
+    rows = []
+    for job_id in _job_ids(queue_dir, "done"):
+        job = _read_json(_job_path(queue_dir, "done", job_id))
+        row = {
+            "job_id": job_id,
+            "data_path": job["data_path"],
+            "start_date": job["start_date"],
+            "end_date": job["end_date"],
+            "attempts": job["attempts"],
+            "worker_id": job.get("worker_id")
+        }
+        row.update(job["user_inputs"])
+        row.update(job["metrics"])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def load_trades(queue_dir, job_id):
+    """
+    Loads the trade ledger of a finished job.
+    """
+    with open(os.path.join(queue_dir, RESULTS_DIR, f"{job_id}.pkl"), "rb") as f:
+        return pickle.load(f)
+
+if __name__ == "__main__":
+    # python job_queue.py worker <queue_dir>   - run a worker on this machine
+    # python job_queue.py status <queue_dir>   - show job counts
+    # python job_queue.py collect <queue_dir>  - print the aggregated results
+    command, directory = sys.argv[1], sys.argv[2]
+    if command == "worker":
+        run_worker(directory)
+    elif command == "status":
+        print(queue_status(directory))
+    elif command == "collect":
+        print(collect_results(directory).to_string())
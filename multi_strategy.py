@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from a0_TradingSim import (
+    SimulationState,
+    SIMULATION_START_DATE,
+    rows_from,
+    open_trade,
+    close_open_positions,
+    _day_exits
+)
+from price_entry_tradesize import CONDITIONS_LIBRARY, contribution_calendar, liquidity_conditions
+from indicator_conditions import condition_signals
+from Indicators import calculate_indicators
+from parameter_search import CONDITIONS_KEY
+from time_index import TimeIndex, sorted_by_time
+from user_io import get_user_inputs, summary_metrics
+
+def strategy_inputs(strategy, base_inputs):
+    """
+    User inputs and conditions library of one strategy: a dict of user input
+    overrides with an optional "conditions_library" entry (like the candidates
+    of parameter_search).
+    """
+    user_inputs = dict(base_inputs)
+    user_inputs.update({name: value for name, value in strategy.items() if name != CONDITIONS_KEY})
+    return user_inputs, strategy.get(CONDITIONS_KEY) or CONDITIONS_LIBRARY
+
+def strategy_signals(data, conditions_libraries):
+    """
+    Entry signals of several conditions libraries on the same rows; every
+    condition is evaluated once and shared by the strategies that enable it.
+
+    Returns:
+        list: One boolean array per library.
+    """
+    libraries = list(conditions_libraries)
+    names = sorted({name for library in libraries for name, enabled in library.items() if enabled})
+    arrays = condition_signals(data, names)
+    signals = []
+    for library in libraries:
+        signal = np.ones(len(data), dtype=bool)
+        for name, enabled in library.items():
+            if enabled:
+                signal &= arrays[name]
+        signals.append(signal)
+    return signals
+
+def run_strategies(stock_data, intraday_data, ticker, strategies, base_inputs=None,
+                   start_date=SIMULATION_START_DATE, end_date=None):
+    """
+    Simulates several strategies in one pass over the data.
+
+    The daily rows and intraday bars are read once into arrays; every day each
+    strategy gets its contribution, its entry (own conditions library and user
+    inputs) and its SL/PT checks over the day's bars, in lockstep. Every
+    strategy has its own SimulationState (budget, open positions and trades), so
+    the results are the same as separate run_simulation calls.
+
+    Args:
+        stock_data (pd.DataFrame): Daily data. Indicators are computed if not already present.
+        intraday_data (pd.DataFrame or None): Intraday bars with a 'Datetime' column.
+        ticker (str): Ticker symbol.
+        strategies (dict): Strategy name -> user input overrides, optionally with a "conditions_library".
+        base_inputs (dict): User inputs the strategies override (default: get_user_inputs()).
+        start_date (str): First daily date included in the simulation.
+        end_date (str): Last daily date included in the simulation (default: all data).
+
+    Returns:
+        tuple: (dict of strategy name -> (trades, budget_manager), simulated daily data)
+    """
+    if base_inputs is None:
+        base_inputs = get_user_inputs()
+    if 'EMA_10' not in stock_data.columns:
+        stock_data = calculate_indicators(stock_data)
+    daily = rows_from(stock_data, 'Date', start_date, end_date)
+
+    names = list(strategies)
+    inputs = [strategy_inputs(strategies[name], base_inputs) for name in names]
+    signals = strategy_signals(daily, [conditions_library for _, conditions_library in inputs])
+    states = [SimulationState(user_inputs) for user_inputs, _ in inputs]
+
+    # Daily rows
+    dates = pd.DatetimeIndex(daily['Date'])
+    entry_prices = daily['Open'].to_numpy(dtype=np.float64)
+    contribution_days = contribution_calendar(dates)
+
+    # Intraday bars, with each day's range of bars
+    if intraday_data is not None:
+        bars = sorted_by_time(rows_from(intraday_data, 'Datetime', start_date, end_date))
+    else:
+        bars = pd.DataFrame({'Datetime': pd.DatetimeIndex([]), 'Open': [], 'Low': [], 'High': []})
+    time_index = TimeIndex.from_frames(daily, bars)
+    day_values = time_index.dates
+    day_starts, day_stops = time_index.day_starts, time_index.day_stops
+    times = pd.DatetimeIndex(bars['Datetime'])
+    opens = bars['Open'].to_numpy(dtype=np.float64)
+    lows = bars['Low'].to_numpy(dtype=np.float64)
+    highs = bars['High'].to_numpy(dtype=np.float64)
+
+    for day in range(len(daily)):
+        current_date = dates[day]
+        # A repeated date is only a contribution check (as in simulate_days)
+        repeated = day > 0 and day_values[day] == day_values[day - 1]
+        for state, (user_inputs, _), signal in zip(states, inputs, signals):
+            if contribution_days[day]:
+                state.budget_manager.add_monthly_contribution(current_date)
+            if repeated:
+                continue
+
+            if signal[day] and entry_prices[day] and liquidity_conditions(
+                    state.budget_manager, entry_prices[day], user_inputs["max_risk"], user_inputs["first_SL"]):
+                open_trade(state, ticker, user_inputs, float(entry_prices[day]), current_date)
+
+            if state.open_positions and day_stops[day] > day_starts[day]:
+                _day_exits(state, user_inputs, times, opens, lows, highs, day_starts[day], day_stops[day])
+
+            state.last_trade_date = current_date
+            state.last_date = current_date
+            state.processed_days = day + 1
+
+    results = {}
+    for name, state in zip(names, states):
+        close_open_positions(state, daily)
+        results[name] = (state.trades, state.budget_manager)
+    return results, daily
+
+def compare_strategies(stock_data, intraday_data, ticker, strategies, base_inputs=None,
+                       start_date=SIMULATION_START_DATE, end_date=None):
+    """
+    Runs run_strategies and tabulates the summary metrics of every strategy.
+
+    Returns:
+        pandas.DataFrame: One row per strategy (index: strategy name), sorted by total return.
+    """
+    results, simulated_data = run_strategies(
+        stock_data, intraday_data, ticker, strategies, base_inputs, start_date, end_date
+    )
+    rows = {}
+    for name, (trades, budget_manager) in results.items():
+        rows[name] = summary_metrics(trades, budget_manager, simulated_data)
+    report = pd.DataFrame.from_dict(rows, orient='index')
+    return report.sort_values("total_return_percentage", ascending=False, kind="stable")
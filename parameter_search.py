@@ -0,0 +1,231 @@
+import itertools
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from a0_TradingSim import run_simulation, SIMULATION_START_DATE
+from Indicators import calculate_indicators
+from shared_dataset import SharedDataset, get_worker_dataset, init_worker
+from user_io import get_user_inputs, summary_metrics
+
+# Candidate keys that are not user inputs
+CONDITIONS_KEY = "conditions_library"
+
+def parameter_grid(space):
+    """
+    Expands a search space into a list of candidates.
+
+    Args:
+        space (dict): Parameter name -> list of values, e.g. {"first_SL": [3, 4, 5], "first_PT": [10, 15]}
+
+    Returns:
+        list: One dict per combination.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def sample_candidates(space, n, seed=None):
+    """
+    Draws n distinct random candidates from the grid spanned by space.
+    """
+    grid = parameter_grid(space)
+    if n >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, n)
+
+class DrawdownPruner:
+    """
+    progress_callback for run_simulation that stops a run as soon as it is clearly bad:
+        - equity drawdown from its peak exceeds max_drawdown (percent), or
+        - after min_days simulated days the return on contributions is below min_return (percent).
+
+    Equity is liquidity plus open shares marked at the day's close.
+    """
+
+    def __init__(self, max_drawdown=None, min_return=None, min_days=60):
+        self.max_drawdown = max_drawdown
+        self.min_return = min_return
+        self.min_days = min_days
+        self.days = 0
+        self.peak_equity = None
+        self.pruned_reason = None
+
+    def __call__(self, current_date, close_price, budget_manager, open_positions):
+        self.days += 1
+        equity = budget_manager.get_total_liquidity()
+        for position in open_positions.values():
+            shares = (position["remaining_sale_amount"] if position["partial_sale_done"]
+                      else position["initial_amount"])
+            equity += shares * close_price
+
+        self.peak_equity = equity if self.peak_equity is None else max(self.peak_equity, equity)
+        drawdown = (1 - equity / self.peak_equity) * 100 if self.peak_equity > 0 else 0
+        if self.max_drawdown is not None and drawdown > self.max_drawdown:
+            self.pruned_reason = f"drawdown {drawdown:.2f}% on {current_date:%d/%m/%Y}"
+            return True
+
+        contributions = budget_manager.get_total_contributions()
+        if (self.min_return is not None and self.days >= self.min_days and contributions > 0
+                and (equity / contributions - 1) * 100 < self.min_return):
+            self.pruned_reason = f"return below {self.min_return}% on {current_date:%d/%m/%Y}"
+            return True
+        return False
+
+def _rung_end_dates(dates, rungs, eta):
+    """
+    End dates of the rungs: the last rung covers all dates, every earlier rung 1/eta of the next one.
+    """
+    end_dates = []
+    for rung in range(rungs):
+        fraction = eta ** (rung - rungs + 1)
+        end_index = max(0, math.ceil(len(dates) * fraction) - 1)
+        end_dates.append(dates.iloc[end_index])
+    return end_dates
+
+def evaluate_candidate(stock_data, intraday_data, ticker, candidate, base_inputs, start_date, end_date,
+                       max_drawdown=None, min_return=None):
+    """
+    Runs one candidate through run_simulation with in-progress pruning.
+
+    Returns:
+        dict: Candidate values plus total_return_percentage, total_trades, pruned and pruned_reason.
+    """
+    user_inputs = dict(base_inputs)
+    user_inputs.update({name: value for name, value in candidate.items() if name != CONDITIONS_KEY})
+    pruner = DrawdownPruner(max_drawdown, min_return)
+
+    try:
+        trades, budget_manager, simulated_data = run_simulation(
+            stock_data, intraday_data, ticker, user_inputs,
+            start_date=start_date,
+            conditions_library=candidate.get(CONDITIONS_KEY),
+            end_date=end_date,
+            progress_callback=pruner
+        )
+    except ValueError as e:
+        # Infeasible parameters, e.g. a trade costing more than the available liquidity
+        return {
+            "total_return_percentage": -math.inf,
+            "total_trades": 0,
+            "pruned": True,
+            "pruned_reason": f"infeasible: {e}"
+        }
+
+    pruned = pruner.pruned_reason is not None
+    metrics = summary_metrics(trades, budget_manager, simulated_data) if not simulated_data.empty else None
+    return {
+        "total_return_percentage": (-math.inf if pruned or metrics is None
+                                    else metrics["total_return_percentage"]),
+        "total_trades": len(trades),
+        "pruned": pruned,
+        "pruned_reason": pruner.pruned_reason
+    }
+
+def _evaluate_shared(ticker, candidate, base_inputs, start_date, end_date, max_drawdown, min_return):
+    """
+    evaluate_candidate in a pool worker, on the frames attached by init_worker.
+    """
+    dataset = get_worker_dataset()
+    intraday_data = dataset.frame("intraday") if "intraday" in dataset.spec else None
+    return evaluate_candidate(
+        dataset.frame("daily"), intraday_data, ticker, candidate, base_inputs,
+        start_date, end_date, max_drawdown, min_return
+    )
+
+def successive_halving(stock_data, intraday_data, ticker, candidates, base_inputs=None,
+                       start_date=SIMULATION_START_DATE, end_date=None, rungs=3, eta=3,
+                       max_drawdown=None, min_return=None, workers=None):
+    """
+    Successive-halving search over strategy parameters.
+
+    Every candidate is first simulated on a short span starting at start_date
+    (1/eta**(rungs-1) of the dates); runs are stopped early when they breach
+    max_drawdown / min_return. Only the best 1/eta of each rung (by total return)
+    are promoted to the next, eta times longer span; the last rung covers all dates.
+
+    Args:
+        stock_data (pd.DataFrame): Daily data (indicators are computed once if missing).
+        intraday_data (pd.DataFrame or None): Intraday bars.
+        ticker (str): Ticker symbol.
+        candidates (list): Dicts of user input overrides (first_SL, first_PT, max_risk,
+            partial_sale_percentage, ...), optionally with a "conditions_library" entry.
+        base_inputs (dict): User inputs the candidates override (default: get_user_inputs()).
+        rungs (int): Number of rungs.
+        eta (int): Reduction factor between rungs.
+        max_drawdown (float): Prune runs whose equity drawdown exceeds this percentage.
+        min_return (float): Prune runs whose return falls below this percentage.
+        workers (int): Processes evaluating the candidates of each rung (default: run them
+            in this process). The daily and intraday frames are placed in shared memory once
+            and attached by the workers instead of being pickled into every task; the
+            candidates themselves must be picklable.
+
+    Returns:
+        pandas.DataFrame: One row per (candidate, rung) evaluation; the best
+        configurations are the top rows of the last rung.
+    """
+    if base_inputs is None:
+        base_inputs = get_user_inputs()
+    if 'EMA_10' not in stock_data.columns:
+        stock_data = calculate_indicators(stock_data)
+
+    dates = stock_data.loc[stock_data['Date'] >= start_date, 'Date']
+    if end_date is not None:
+        dates = dates[dates <= end_date]
+    if dates.empty:
+        raise ValueError("No daily data in the requested date range.")
+
+    rungs = max(1, rungs)
+    survivors = list(range(len(candidates)))
+    records = []
+
+    dataset = pool = None
+    if workers is not None and workers > 1:
+        dataset = SharedDataset.create({"daily": stock_data, "intraday": intraday_data})
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(dataset.spec,))
+    try:
+        for rung, rung_end in enumerate(_rung_end_dates(dates.reset_index(drop=True), rungs, eta)):
+            if pool is None:
+                outcomes = [
+                    evaluate_candidate(
+                        stock_data, intraday_data, ticker, candidates[candidate_id], base_inputs,
+                        start_date, rung_end, max_drawdown, min_return
+                    )
+                    for candidate_id in survivors
+                ]
+            else:
+                outcomes = pool.map(
+                    _evaluate_shared, *zip(*(
+                        (ticker, candidates[candidate_id], base_inputs, start_date, rung_end,
+                         max_drawdown, min_return)
+                        for candidate_id in survivors
+                    ))
+                )
+
+            results = []
+            for candidate_id, result in zip(survivors, outcomes):
+                results.append((candidate_id, result))
+                record = {"rung": rung, "end_date": rung_end, "candidate_id": candidate_id}
+                record.update(candidates[candidate_id])
+                record.update(result)
+                records.append(record)
+
+            ranked = sorted(
+                (item for item in results if not item[1]["pruned"]),
+                key=lambda item: item[1]["total_return_percentage"],
+                reverse=True
+            )
+            if rung < rungs - 1:
+                survivors = [candidate_id for candidate_id, _ in ranked[:max(1, math.ceil(len(survivors) / eta))]]
+                if not survivors:
+                    break
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+            dataset.close()
+
+    report = pd.DataFrame(records)
+    if report.empty:
+        return report
+    return report.sort_values(
+        ["rung", "total_return_percentage"], ascending=[False, False], kind="stable"
+    ).reset_index(drop=True)
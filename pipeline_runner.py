@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from a0_TradingSim import run_simulation, SIMULATION_START_DATE
+from data_loader import load_data
+from Indicators import calculate_indicators
+from user_io import get_user_inputs, summary_metrics
+
+# Loaded datasets waiting for a simulation worker; loaders block when the queue is full
+DEFAULT_PREFETCH = 4
+DEFAULT_IO_WORKERS = 4
+
+def sheet_loader(job):
+    """
+    Default loader: downloads and parses one ticker's sheets.
+
+    Args:
+        job (dict): load_data arguments: sheet_url, credentials_path and optionally
+            daily_sheet, intraday_sheet, source, compact, cache_dir.
+
+    Returns:
+        tuple: (daily_data, intraday_data, ticker)
+    """
+    return load_data(
+        job["sheet_url"],
+        job.get("credentials_path"),
+        daily_sheet=job.get("daily_sheet", "Sheet1"),
+        intraday_sheet=job.get("intraday_sheet"),
+        source=job.get("source", "both"),
+        compact=job.get("compact", False),
+        cache_dir=job.get("cache_dir")
+    )
+
+def simulate_loaded(stock_data, intraday_data, ticker, user_inputs, start_date=SIMULATION_START_DATE,
+                    conditions_library=None):
+    """
+    Compute stage of the pipeline (runs in a worker process): indicators, simulation and metrics.
+
+    Returns:
+        tuple: (trades, summary metrics, seconds spent)
+    """
+    started = time.perf_counter()
+    full_data_with_indicators = calculate_indicators(stock_data)
+    trades, budget_manager, simulated_data = run_simulation(
+        full_data_with_indicators, intraday_data, ticker, user_inputs, start_date, conditions_library
+    )
+    metrics = summary_metrics(trades, budget_manager, simulated_data)
+    return trades, metrics, time.perf_counter() - started
+
+def _load_into(loaded, stop, loader, job_index, job):
+    if stop.is_set():
+        return
+    started = time.perf_counter()
+    try:
+        item = {"dataset": loader(job)}
+    except Exception as e:
+        item = {"error": f"load failed: {e}"}
+    item.update({"job_index": job_index, "job": job, "load_seconds": time.perf_counter() - started})
+    # Blocks while max_prefetch datasets are waiting (backpressure); gives up when the run is stopped
+    while not stop.is_set():
+        try:
+            loaded.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+def run_pipeline(jobs, loader=sheet_loader, user_inputs=None, start_date=SIMULATION_START_DATE,
+                 conditions_library=None, io_workers=DEFAULT_IO_WORKERS, sim_workers=None,
+                 max_prefetch=DEFAULT_PREFETCH, executor=None):
+    """
+    Runs a universe of tickers with loading and simulation overlapped.
+
+    Background threads run loader(job) for upcoming jobs (network waits, parsing)
+    while worker processes simulate the tickers already loaded. Loaded datasets
+    wait in a queue of at most max_prefetch entries; when it is full the loader
+    threads block, and no more than sim_workers simulations are submitted at a
+    time, so at most max_prefetch + io_workers + sim_workers datasets are in
+    memory. The wall time approaches max(total I/O, total compute / sim_workers)
+    instead of their sum.
+
+    Args:
+        jobs (list): One loader argument per ticker (see sheet_loader).
+        loader (callable): job -> (daily_data, intraday_data, ticker); called in threads.
+        user_inputs (dict): Simulation parameters (default: get_user_inputs()).
+        io_workers (int): Loader threads.
+        sim_workers (int): Simulation processes (default: CPU count).
+        max_prefetch (int): Loaded datasets allowed to wait for a simulation worker.
+        executor (Executor): Simulation executor to use instead of a new process pool.
+
+    Yields:
+        dict: Per job, in completion order: job_index, job, ticker, trades, metrics,
+        error (None on success), load_seconds and simulate_seconds.
+    """
+    if user_inputs is None:
+        user_inputs = get_user_inputs()
+    jobs = list(jobs)
+    sim_workers = sim_workers or os.cpu_count() or 1
+    loaded = queue.Queue(maxsize=max(1, max_prefetch))
+
+    io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="prefetch")
+    own_executor = executor is None
+    sim_pool = ProcessPoolExecutor(max_workers=sim_workers) if own_executor else executor
+    stop = threading.Event()
+
+    def feed():
+        # Loads run in job order; each blocks on the full queue rather than piling up datasets
+        for job_index, job in enumerate(jobs):
+            if stop.is_set():
+                break
+            io_pool.submit(_load_into, loaded, stop, loader, job_index, job)
+
+    feeder = threading.Thread(target=feed, name="prefetch-feeder", daemon=True)
+    feeder.start()
+
+    running = {}
+    received = 0
+    try:
+        while received < len(jobs) or running:
+            # Keep the simulation workers busy while loaded datasets are available
+            while received < len(jobs) and len(running) < sim_workers:
+                try:
+                    item = loaded.get(timeout=0.05 if running else None)
+                except queue.Empty:
+                    break
+                received += 1
+                if "error" in item:
+                    yield _result(item, None, None, item["error"], None)
+                    continue
+                stock_data, intraday_data, ticker = item.pop("dataset")
+                future = sim_pool.submit(
+                    simulate_loaded, stock_data, intraday_data, ticker, user_inputs, start_date,
+                    conditions_library
+                )
+                item["ticker"] = ticker
+                running[future] = item
+
+            if not running:
+                continue
+            done, _ = wait(running, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                try:
+                    trades, metrics, simulate_seconds = future.result()
+                except Exception as e:
+                    yield _result(item, None, None, f"simulation failed: {e}", None)
+                else:
+                    yield _result(item, trades, metrics, None, simulate_seconds)
+    finally:
+        # Stop loading (e.g. the caller stopped iterating); blocked loaders give up their put
+        stop.set()
+        feeder.join()
+        io_pool.shutdown(wait=True, cancel_futures=True)
+        if own_executor:
+            sim_pool.shutdown(wait=True, cancel_futures=True)
+
+def _result(item, trades, metrics, error, simulate_seconds):
+    return {
+        "job_index": item["job_index"],
+        "job": item["job"],
+        "ticker": item.get("ticker"),
+        "trades": trades,
+        "metrics": metrics,
+        "error": error,
+        "load_seconds": item["load_seconds"],
+        "simulate_seconds": simulate_seconds
+    }
+
+def run_universe(jobs, **pipeline_options):
+    """
+    Runs run_pipeline to the end.
+
+    Returns:
+        tuple: (list of results in job order, timing dict with wall, io and compute seconds)
+    """
+    started = time.perf_counter()
+    results = sorted(run_pipeline(jobs, **pipeline_options), key=lambda result: result["job_index"])
+    timing = {
+        "wall_seconds": time.perf_counter() - started,
+        "io_seconds": sum(result["load_seconds"] for result in results),
+        "compute_seconds": sum(result["simulate_seconds"] or 0 for result in results)
+    }
+    return results, timing
@@ -0,0 +1,287 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from a0_TradingSim import (
+    SimulationState,
+    SIMULATION_START_DATE,
+    rows_from,
+    OpenPositions,
+    open_trade,
+    check_exits,
+    close_open_positions,
+    _next_exit_bar
+)
+from price_entry_tradesize import CONDITIONS_LIBRARY, batch_trade_sizes, contribution_calendar
+from indicator_conditions import vectorized_conditions, _previous
+from Indicators import calculate_indicators
+from time_index import TimeIndex, sorted_by_time
+
+# Entries allowed per day across the universe (None: as many as the liquidity funds)
+DEFAULT_TOP_K = 5
+
+MOMENTUM_DAYS = 20
+VOLUME_DAYS = 20
+RSI_OVERBOUGHT = 70
+
+def _momentum(data):
+    # Return over the MOMENTUM_DAYS days before the entry day
+    close = _previous(data['Close'].to_numpy(dtype=np.float64))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return close / _previous(close, MOMENTUM_DAYS) - 1
+
+def _rsi_distance(data):
+    # Room left below the overbought level on the previous day
+    return RSI_OVERBOUGHT - _previous(data['RSI'].to_numpy(dtype=np.float64))
+
+def _relative_volume(data):
+    # Previous day's volume relative to its trailing mean
+    if 'Volume' not in data.columns:
+        return np.full(len(data), np.nan)
+    volume = _previous(pd.to_numeric(data['Volume'], errors='coerce').to_numpy(dtype=np.float64))
+    trailing_mean = pd.Series(volume).rolling(VOLUME_DAYS, min_periods=1).mean().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return volume / trailing_mean
+
+def _trend(data):
+    # Entry price above the previous day's EMA 50
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return data['Open'].to_numpy(dtype=np.float64) / _previous(data['EMA_50'].to_numpy(dtype=np.float64)) - 1
+
+# Ranking factors: name -> function(daily data with indicators) -> one value per row,
+# known at the row's open. Add entries to rank by other features.
+RANKING_FACTORS = {
+    "momentum": _momentum,
+    "rsi_distance": _rsi_distance,
+    "volume": _relative_volume,
+    "trend": _trend
+}
+
+# Factor name -> weight of its cross-sectional z-score
+DEFAULT_RANKING = {"momentum": 1.0}
+
+def rank_candidates(factor_values, weights, top_k=None):
+    """
+    Scores same-day candidates by the weighted sum of their cross-sectional
+    factor z-scores (missing values count as average) and selects the best top_k.
+
+    Args:
+        factor_values (np.ndarray): Candidates x factors.
+        weights (np.ndarray): One weight per factor.
+        top_k (int): Number of candidates to keep (None: all).
+
+    Returns:
+        tuple: (indices of the selected candidates, best first, ties in input order;
+        scores of all candidates)
+    """
+    n = len(factor_values)
+    finite = np.isfinite(factor_values)
+    counts = np.maximum(finite.sum(axis=0), 1)
+    values = np.where(finite, factor_values, 0.0)
+    mean = values.sum(axis=0) / counts
+    deviations = np.where(finite, factor_values - mean, 0.0)
+    std = np.sqrt((deviations ** 2).sum(axis=0) / counts)
+    scores = (deviations / np.where(std > 0, std, np.inf)) @ weights
+
+    if top_k is not None and top_k < n:
+        selected = np.argpartition(-scores, top_k - 1)[:top_k] if top_k > 0 else np.zeros(0, dtype=np.int64)
+    else:
+        selected = np.arange(n)
+    order = np.lexsort((selected, -scores[selected]))
+    return selected[order], scores
+
+def _prepare_ticker(stock_data, intraday_data, start_date, end_date, conditions_library, factor_names):
+    """
+    Per-ticker arrays of the portfolio run: daily rows with their entry signal and
+    ranking factors, and the intraday bars with their TimeIndex.
+    """
+    if 'EMA_10' not in stock_data.columns:
+        stock_data = calculate_indicators(stock_data)
+    daily = rows_from(stock_data, 'Date', start_date, end_date)
+    prepared = {
+        "daily": daily,
+        "opens": daily['Open'].to_numpy(dtype=np.float64),
+        "signals": vectorized_conditions(daily, conditions_library) if len(daily) else np.zeros(0, dtype=bool),
+        "factors": np.column_stack([RANKING_FACTORS[name](daily) for name in factor_names])
+        if factor_names else np.zeros((len(daily), 0))
+    }
+
+    if intraday_data is not None:
+        bars = sorted_by_time(rows_from(intraday_data, 'Datetime', start_date, end_date))
+    else:
+        bars = pd.DataFrame({'Datetime': pd.DatetimeIndex([]), 'Open': [], 'Low': [], 'High': []})
+    time_index = TimeIndex.from_frames(daily, bars)
+    prepared.update({
+        "dates": time_index.dates,
+        "time_index": time_index,
+        "bar_times": pd.DatetimeIndex(bars['Datetime']),
+        "bar_opens": bars['Open'].to_numpy(dtype=np.float64),
+        "bar_lows": bars['Low'].to_numpy(dtype=np.float64),
+        "bar_highs": bars['High'].to_numpy(dtype=np.float64)
+    })
+    return prepared
+
+class _DeferredCash:
+    """
+    Collects the exit proceeds of one ticker's bars, so the proceeds of all
+    tickers can be booked in time order.
+    """
+
+    def __init__(self, ticker_index):
+        self.ticker_index = ticker_index
+        self.events = []
+
+    def add_capital(self, amount, timestamp=None, trade_id=None):
+        self.events.append((timestamp, self.ticker_index, amount, trade_id))
+
+def _day_exits(prepared, open_positions, day, user_inputs, cash):
+    """
+    SL/PT checks of one ticker's open positions over its bars of the day.
+    """
+    start, stop = prepared["time_index"].bars_of_day(day)
+    opens, lows, highs = prepared["bar_opens"], prepared["bar_lows"], prepared["bar_highs"]
+
+    i = start
+    while i < stop and open_positions:
+        i = _next_exit_bar(open_positions, opens, lows, highs, i, stop)
+        if i >= stop:
+            break
+        check_exits(open_positions, float(opens[i]), float(lows[i]), float(highs[i]),
+                    prepared["bar_times"][i], cash, user_inputs)
+        i += 1
+
+def run_portfolio_simulation(universe, user_inputs, start_date=SIMULATION_START_DATE, conditions_library=None,
+                             end_date=None, ranking=None, top_k=DEFAULT_TOP_K):
+    """
+    Simulates a universe of tickers sharing one budget.
+
+    Every day the entry signals of all tickers are gathered (vectorized_conditions,
+    evaluated once per ticker over its whole history), the candidates are ranked
+    cross-sectionally (rank_candidates with the ranking weights) and the best
+    top_k are sized by batch_trade_sizes in rank order, each from the liquidity
+    left after the entries ranked above it, instead of in whatever order the
+    tickers happen to be visited.
+    The SL/PT exits then run per ticker on its intraday bars (positions of a
+    ticker only adjust each other, as in run_simulation), and their proceeds
+    are booked in time order.
+
+    Args:
+        universe (dict): Ticker -> (daily data, intraday data or None), e.g. from load_universe.
+        user_inputs (dict): Simulation parameters (see user_io.get_user_inputs).
+        start_date (str): First daily date included in the simulation.
+        conditions_library (dict): Entry condition toggles (defaults to CONDITIONS_LIBRARY).
+        end_date (str): Last daily date included in the simulation (default: all data).
+        ranking (dict): RANKING_FACTORS name -> weight (default: DEFAULT_RANKING).
+        top_k (int): Most entries per day (None: no limit).
+
+    Returns:
+        tuple: (trades, budget_manager, allocations DataFrame with one row per
+        entry: Date, ticker, score, rank, candidates, shares, cost)
+    """
+    if conditions_library is None:
+        conditions_library = CONDITIONS_LIBRARY
+    ranking = dict(DEFAULT_RANKING if ranking is None else ranking)
+    unknown = set(ranking) - set(RANKING_FACTORS)
+    if unknown:
+        raise ValueError(f"Unknown ranking factors: {sorted(unknown)}")
+    factor_names = list(ranking)
+    weights = np.array([ranking[name] for name in factor_names], dtype=np.float64)
+
+    tickers = list(universe)
+    prepared = [
+        _prepare_ticker(universe[ticker][0], universe[ticker][1], start_date, end_date,
+                        conditions_library, factor_names)
+        for ticker in tickers
+    ]
+
+    # Common calendar, and all (day, ticker) entry candidates grouped by day (CSR offsets)
+    calendar = np.unique(np.concatenate([p["dates"] for p in prepared] + [np.zeros(0, dtype=np.int64)]))
+    candidates = {"days": [], "tickers": [], "opens": [], "factors": [np.zeros((0, len(factor_names)))]}
+    for ticker_index, p in enumerate(prepared):
+        # Rows without a usable Open cannot be sized (as in run_simulation)
+        opens = p["opens"]
+        rows = np.flatnonzero(p["signals"] & np.isfinite(opens) & (opens > 0))
+        candidates["days"].append(calendar.searchsorted(p["dates"][rows]))
+        candidates["tickers"].append(np.full(len(rows), ticker_index))
+        candidates["opens"].append(p["opens"][rows])
+        candidates["factors"].append(p["factors"][rows])
+    candidates = {name: np.concatenate(values) if values else np.zeros(0) for name, values in candidates.items()}
+    order = np.lexsort((candidates["tickers"], candidates["days"]))
+    candidate_tickers = candidates["tickers"][order].astype(np.int64)
+    candidate_opens = candidates["opens"][order]
+    candidate_factors = candidates["factors"][order]
+    day_offsets = candidates["days"][order].searchsorted(np.arange(len(calendar) + 1))
+
+    state = SimulationState(user_inputs)
+    budget_manager = state.budget_manager
+    positions = [OpenPositions() for _ in tickers]
+    active = set()  # tickers with open positions
+    contribution_days = contribution_calendar(pd.DatetimeIndex(calendar))
+    allocations = []
+
+    for day_index, day in enumerate(calendar):
+        current_date = pd.Timestamp(day)
+        if contribution_days[day_index]:
+            budget_manager.add_monthly_contribution(current_date)
+
+        # (a) Cross-sectional ranking and batched sizing of the day's candidates
+        first, last = day_offsets[day_index], day_offsets[day_index + 1]
+        if last > first:
+            day_tickers = candidate_tickers[first:last]
+            selected, scores = rank_candidates(candidate_factors[first:last], weights, top_k)
+            entry_prices = candidate_opens[first:last][selected]
+            sizes, costs, entered = batch_trade_sizes(
+                budget_manager.get_total_liquidity(), entry_prices, user_inputs["max_risk"],
+                user_inputs["first_SL"], user_inputs["user_defined_max"]
+            )
+            for rank, (candidate, shares, cost) in enumerate(zip(selected, sizes, costs)):
+                if not entered[rank]:
+                    continue
+                ticker_index = day_tickers[candidate]
+                open_trade(state, tickers[ticker_index], user_inputs, float(entry_prices[rank]), current_date,
+                           size=(int(shares), float(cost)), open_positions=positions[ticker_index])
+                active.add(ticker_index)
+                allocations.append({
+                    "Date": current_date,
+                    "ticker": tickers[ticker_index],
+                    "score": float(scores[candidate]),
+                    "rank": rank + 1,
+                    "candidates": int(last - first),
+                    "shares": int(shares),
+                    "cost": float(cost)
+                })
+
+        # (b) Intraday SL/PT checks per ticker; proceeds booked in bar time order
+        events = []
+        for ticker_index in sorted(active):
+            cash = _DeferredCash(ticker_index)
+            _day_exits(prepared[ticker_index], positions[ticker_index], day, user_inputs, cash)
+            events.extend(cash.events)
+            if not positions[ticker_index]:
+                active.discard(ticker_index)
+        events.sort(key=lambda event: (event[0], event[1]))
+        for timestamp, _, amount, trade_id in events:
+            budget_manager.add_capital(amount, timestamp, trade_id)
+
+    # (c) End of simulation: every ticker's positions close at its final daily close
+    for ticker_index in sorted(active):
+        close_open_positions(state, prepared[ticker_index]["daily"], open_positions=positions[ticker_index])
+
+    allocations = pd.DataFrame(allocations, columns=["Date", "ticker", "score", "rank", "candidates", "shares", "cost"])
+    return state.trades, budget_manager, allocations
+
+def load_universe(jobs, loader=None, io_workers=4):
+    """
+    Loads several tickers in parallel threads.
+
+    Args:
+        jobs (list): Loader arguments, one per ticker (see pipeline_runner.sheet_loader).
+        loader (callable): job -> (daily_data, intraday_data, ticker) (default: pipeline_runner.sheet_loader).
+
+    Returns:
+        dict: Ticker -> (daily data, intraday data), the input of run_portfolio_simulation.
+    """
+    if loader is None:
+        from pipeline_runner import sheet_loader as loader
+    with ThreadPoolExecutor(max_workers=io_workers) as pool:
+        loaded = list(pool.map(loader, jobs))
+    return {ticker: (daily_data, intraday_data) for daily_data, intraday_data, ticker in loaded}
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from indicator_conditions import (
     rsi_condition,
@@ -14,14 +15,90 @@ from indicator_conditions import (
     ema_100_prev_close_condition
 )
 
+# Cash ledger event kinds
+CASH_START = 0
+CASH_CONTRIBUTION = 1
+CASH_REMOVE = 2
+CASH_ADD = 3
+CASH_EVENT_NAMES = {
+    CASH_START: "start",
+    CASH_CONTRIBUTION: "contribution",
+    CASH_REMOVE: "remove",
+    CASH_ADD: "add"
+}
+
+# Ledger time of the starting capital (before any real timestamp) and "no trade" id
+LEDGER_START_TIME = np.iinfo(np.int64).min + 1
+NO_TRADE_ID = -1
+
+def _timestamp_ns(timestamp):
+    """
+    Nanosecond epoch of a Timestamp / datetime64 / date string.
+    """
+    value = getattr(timestamp, "value", None)
+    if value is None:
+        value = pd.Timestamp(timestamp).value
+    return value
+
+def contribution_calendar(dates):
+    """
+    Marks the dates on which a monthly contribution is paid: the first date of
+    every (year, month) in the (sorted) simulation dates, i.e. exactly where
+    BudgetManager.add_monthly_contribution would add one.
+
+    Returns:
+        np.ndarray: Boolean array, one entry per date.
+    """
+    dates = pd.DatetimeIndex(dates)
+    months = dates.year.to_numpy() * 12 + dates.month.to_numpy()
+    calendar = np.ones(len(months), dtype=bool)
+    calendar[1:] = months[1:] != months[:-1]
+    return calendar
+
 class BudgetManager:
-    def __init__(self, starting_capital, monthly_contribution):
+    def __init__(self, starting_capital, monthly_contribution, ledger_capacity=256):
         self.starting_capital = starting_capital
         self.monthly_contribution = monthly_contribution
         self.total_liquidity = starting_capital
         self.total_contributions = starting_capital  # Start with initial capital
         self.current_month = None
 
+        # Append-only cash ledger (column arrays, grown by doubling)
+        self._ledger_size = 0
+        self._ledger_times = np.empty(ledger_capacity, dtype=np.int64)
+        self._ledger_kinds = np.empty(ledger_capacity, dtype=np.int8)
+        self._ledger_amounts = np.empty(ledger_capacity, dtype=np.float64)
+        self._ledger_balances = np.empty(ledger_capacity, dtype=np.float64)
+        self._ledger_trade_ids = np.empty(ledger_capacity, dtype=np.int64)
+        self._last_time = LEDGER_START_TIME
+        self._record(CASH_START, starting_capital, None, None)
+
+    def _record(self, kind, amount, timestamp, trade_id):
+        """
+        Appends one cash flow with the liquidity after it. Timestamps are clamped
+        to be non-decreasing (e.g. the end-of-simulation close carries the daily
+        date, which is earlier than that day's last intraday exit); None means
+        "at the latest recorded time".
+        """
+        if self._ledger_size == len(self._ledger_times):
+            capacity = 2 * len(self._ledger_times)
+            for name in ("_ledger_times", "_ledger_kinds", "_ledger_amounts",
+                         "_ledger_balances", "_ledger_trade_ids"):
+                old = getattr(self, name)
+                grown = np.empty(capacity, dtype=old.dtype)
+                grown[:len(old)] = old
+                setattr(self, name, grown)
+
+        if timestamp is not None:
+            self._last_time = max(self._last_time, _timestamp_ns(timestamp))
+        i = self._ledger_size
+        self._ledger_times[i] = self._last_time
+        self._ledger_kinds[i] = kind
+        self._ledger_amounts[i] = amount
+        self._ledger_balances[i] = self.total_liquidity
+        self._ledger_trade_ids[i] = NO_TRADE_ID if trade_id is None else trade_id
+        self._ledger_size = i + 1
+
     def add_monthly_contribution(self, current_date):
         month = current_date.month
         year = current_date.year
@@ -29,14 +106,17 @@ class BudgetManager:
             self.total_liquidity += self.monthly_contribution
             self.total_contributions += self.monthly_contribution
             self.current_month = (year, month)
+            self._record(CASH_CONTRIBUTION, self.monthly_contribution, current_date, None)
 
-    def remove_capital(self, amount):
+    def remove_capital(self, amount, timestamp=None, trade_id=None):
         if amount > self.total_liquidity:
             raise ValueError("Insufficient liquidity to complete the transaction.")
         self.total_liquidity -= amount
+        self._record(CASH_REMOVE, -amount, timestamp, trade_id)
 
-    def add_capital(self, amount):
+    def add_capital(self, amount, timestamp=None, trade_id=None):
         self.total_liquidity += amount
+        self._record(CASH_ADD, amount, timestamp, trade_id)
 
     def get_total_liquidity(self):
         return self.total_liquidity
@@ -44,32 +124,109 @@ class BudgetManager:
     def get_total_contributions(self):
         return self.total_contributions
 
-def entry_conditions(data_df, indicators_df, current_index, budget_manager, max_risk, stop_loss, open_positions):
-    conditions_library = {
-        'rsi_condition': False,
-        'macd_condition': False,
-        'ema_10_condition': False,
-        'ema_20_condition': False,
-        'ema_50_condition': False,
-        'ema_100_condition': False,
-        'ema_200_condition': False,
-        'sma_5_10_condition': True,
-        'ema_50_avg_condition': True,
-        'high_avg_condition': True, #toimib
-        'prev_close_greater_than_open': True, #toimib
-        'ema_100_prev_close': True #toimib
-    }
+    def ledger_arrays(self):
+        """
+        The cash ledger as read-only column arrays: times (datetime64[ns]), kinds,
+        amounts (signed), balances (liquidity after the event) and trade_ids (-1: none).
+        """
+        n = self._ledger_size
+        arrays = {
+            "times": self._ledger_times[:n].view("datetime64[ns]"),
+            "kinds": self._ledger_kinds[:n],
+            "amounts": self._ledger_amounts[:n],
+            "balances": self._ledger_balances[:n],
+            "trade_ids": self._ledger_trade_ids[:n]
+        }
+        for values in arrays.values():
+            values.flags.writeable = False
+        return arrays
+
+    def drain_ledger(self):
+        """
+        Returns the cash flows recorded since the last drain (copies of the
+        ledger_arrays columns) and empties the ledger, so long runs can move it
+        to disk. Liquidity and contributions are unaffected; ledger_arrays,
+        cash_ledger and liquidity_at only cover the flows recorded afterwards.
+        """
+        arrays = {name: values.copy() for name, values in self.ledger_arrays().items()}
+        self._ledger_size = 0
+        return arrays
+
+    def cash_ledger(self):
+        """
+        The cash ledger as a DataFrame (one row per cash flow, in recording order).
+        """
+        arrays = self.ledger_arrays()
+        ledger = pd.DataFrame({
+            "time": arrays["times"],
+            "kind": pd.Categorical.from_codes(arrays["kinds"], list(CASH_EVENT_NAMES.values())),
+            "amount": arrays["amounts"],
+            "balance": arrays["balances"],
+            "trade_id": pd.array(np.where(arrays["trade_ids"] == NO_TRADE_ID, None, arrays["trade_ids"]),
+                                 dtype="Int64")
+        })
+        ledger.loc[ledger["kind"] == "start", "time"] = pd.NaT
+        return ledger
+
+    def liquidity_at(self, timestamps):
+        """
+        Liquidity right after all cash flows recorded at or before the given
+        timestamp(s): one searchsorted over the ledger.
+
+        Returns:
+            float or np.ndarray: Liquidity per timestamp.
+        """
+        n = self._ledger_size
+        scalar = np.ndim(timestamps) == 0
+        times = np.asarray(pd.DatetimeIndex(np.atleast_1d(timestamps)).as_unit("ns").asi8)
+        rows = np.searchsorted(self._ledger_times[:n], times, side="right") - 1
+        liquidity = self._ledger_balances[np.maximum(rows, 0)]
+        return float(liquidity[0]) if scalar else liquidity
+
+# Entry conditions toggled on/off for the simulation
+CONDITIONS_LIBRARY = {
+    'rsi_condition': False,
+    'macd_condition': False,
+    'ema_10_condition': False,
+    'ema_20_condition': False,
+    'ema_50_condition': False,
+    'ema_100_condition': False,
+    'ema_200_condition': False,
+    'sma_5_10_condition': True,
+    'ema_50_avg_condition': True,
+    'high_avg_condition': True, #toimib
+    'prev_close_greater_than_open': True, #toimib
+    'ema_100_prev_close': True #toimib
+}
+
+def enabled_conditions(conditions_library=None):
+    """
+    Returns the sorted names of the enabled entry conditions.
+    """
+    if conditions_library is None:
+        conditions_library = CONDITIONS_LIBRARY
+    return sorted(name for name, enabled in conditions_library.items() if enabled)
+
+def liquidity_conditions(budget_manager, entry_price, max_risk, stop_loss):
+    """
+    Checks that the liquidity covers at least one share and the risk budget is at least 1000.
+    """
+    liquidity = budget_manager.get_total_liquidity()
+    liquidity_condition = liquidity >= entry_price
+    risk_condition = (liquidity * max_risk / stop_loss) >= 1000
+    return liquidity_condition and risk_condition
+
+def entry_conditions(data_df, indicators_df, current_index, budget_manager, max_risk, stop_loss, open_positions,
+                     conditions_library=None):
+    if conditions_library is None:
+        conditions_library = CONDITIONS_LIBRARY
 
     try:
         # Set entry price to the current day's Open price
         entry_price = data_df.loc[current_index, 'Open']
 
         # Check liquidity and risk conditions
-        liquidity = budget_manager.get_total_liquidity()
-        liquidity_condition = liquidity >= entry_price
-        risk_condition = (liquidity * max_risk / stop_loss) >= 1000
-
-        if not (liquidity_condition and risk_condition):
+        if not liquidity_conditions(budget_manager, entry_price, max_risk, stop_loss):
             return False
 
         # Calculate the proposed first profit target for the new trade
@@ -150,3 +307,41 @@ def calculate_trade_size(budget_manager, entry_price, max_risk, stop_loss, user_
     except Exception as e:
         raise RuntimeError(f"Unexpected error in calculate_trade_size: {e}")
 
+def batch_trade_sizes(liquidity, entry_prices, max_risk, stop_loss, user_defined_max):
+    """
+    liquidity_conditions and calculate_trade_size for many same-day entries,
+    taken in the given (priority) order as if each were opened before the next
+    is sized: every entry is checked and sized against the liquidity left after
+    the entries before it (the risk budget is that liquidity * max_risk%, the
+    cost of each trade is capped at user_defined_max). An entry failing
+    liquidity_conditions, or costing more than is left, is not entered and uses
+    none of the liquidity, so a later, cheaper entry can still be. As in
+    run_simulation, an entered trade may buy no shares.
+
+    Returns:
+        tuple: (np.ndarray of int64 trade sizes, np.ndarray of float costs,
+        np.ndarray of bool: entered)
+    """
+    entry_prices = np.asarray(entry_prices, dtype=np.float64)
+    if max_risk <= 0 or stop_loss <= 0 or (entry_prices <= 0).any():
+        raise ValueError("Input error in batch_trade_sizes: max_risk, stop_loss, and entry_price must be greater than zero.")
+
+    sizes = np.zeros(len(entry_prices), dtype=np.int64)
+    costs = np.zeros(len(entry_prices))
+    entered = np.zeros(len(entry_prices), dtype=bool)
+    for i, entry_price in enumerate(entry_prices.tolist()):
+        # liquidity_conditions on what is left
+        if liquidity < entry_price or (liquidity * max_risk / stop_loss) < 1000:
+            continue
+        risk_amount = liquidity * (max_risk / 100)
+        size = int(risk_amount / (entry_price * (stop_loss / 100)))
+        cost = size * entry_price
+        if cost > user_defined_max:
+            size = int(user_defined_max / entry_price)
+            cost = size * entry_price
+        if cost > liquidity:
+            continue  # run_simulation stops here with an insufficient-liquidity error
+        sizes[i], costs[i], entered[i] = size, cost, True
+        liquidity -= cost
+    return sizes, costs, entered
+
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import pickle
+import pandas as pd
+from price_entry_tradesize import enabled_conditions
+
+# Modules whose source code determines the simulation results
+ENGINE_MODULES = [
+    "a0_TradingSim.py",
+    "price_entry_tradesize.py",
+    "indicator_conditions.py",
+    "adjust_positions.py",
+    "Indicators.py",
+    "time_index.py",
+    "trade_ledger.py",
+    "user_io.py",
+    "result_cache.py"
+]
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+
+_code_version = None
+
+def code_version():
+    """
+    Hash of the engine source files, so results are invalidated when the code changes.
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for module_file in ENGINE_MODULES:
+            path = os.path.join(base_dir, module_file)
+            digest.update(module_file.encode())
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+def data_fingerprint(data):
+    """
+    Content hash of a DataFrame (values, index, column names and dtypes).
+    Returns "None" for missing data.
+    """
+    if data is None:
+        return "None"
+    digest = hashlib.sha256()
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in data.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    return digest.hexdigest()
+
+def backtest_key(stock_data, intraday_data, ticker, user_inputs, start_date, conditions_library=None, end_date=None):
+    """
+    Builds the cache key of a backtest run from its data, parameters,
+    enabled entry conditions and the code version.
+    """
+    key_material = {
+        "daily": data_fingerprint(stock_data),
+        "intraday": data_fingerprint(intraday_data),
+        "ticker": str(ticker),
+        "user_inputs": {name: repr(value) for name, value in sorted(user_inputs.items())},
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "conditions": enabled_conditions(conditions_library),
+        "code_version": code_version()
+    }
+    return hashlib.sha256(json.dumps(key_material, sort_keys=True).encode()).hexdigest()
+
+class ResultCache:
+    """
+    Content-addressed backtest results on local disk with size-bounded LRU eviction.
+    Every entry is one pickle file; its modification time is the last access time.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Returns the cached result for key, or None if it is not cached.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError):
+            # Corrupted entry: drop it and recompute
+            self._remove(path)
+            return None
+        os.utime(path)  # mark as recently used
+        return result
+
+    def put(self, key, result):
+        """
+        Stores result under key (atomically) and evicts least recently used entries.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+    def clear(self):
+        """
+        Removes all cached results.
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
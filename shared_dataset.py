@@ -0,0 +1,228 @@
+import atexit
+import uuid
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+# Dataset attached by init_worker in a pool worker process
+_worker_dataset = None
+
+def _create_segment(nbytes):
+    name = f"tsim_{uuid.uuid4().hex[:16]}"
+    return shared_memory.SharedMemory(name=name, create=True, size=max(int(nbytes), 1))
+
+def _attach_segment(name):
+    try:
+        # Python 3.13+: the owner alone is responsible for unlinking
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def _split_columns(data):
+    """
+    Groups DataFrame columns by storage: plain NumPy dtypes (numbers, bools, naive
+    datetimes) by their dtype string, everything else (strings, objects,
+    categoricals, extension dtypes) under "codes".
+    """
+    blocks = {}
+    for column, dtype in data.dtypes.items():
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+            blocks.setdefault(dtype.str, []).append(column)
+        else:
+            blocks.setdefault("codes", []).append(column)
+    return blocks
+
+class SharedDataset:
+    """
+    Preprocessed OHLCV and indicator frames placed in shared memory once, so
+    process-pool workers can attach to them by name instead of unpickling copies.
+
+    Every frame is stored column-major, one segment per dtype:
+        <dtype>  - block (columns x rows) of each plain NumPy dtype in the frame, e.g.
+                   '<f8' for prices and indicators, '<i8' for volumes, '|b1' for
+                   flags, '<M8[ns]' for dates; stored and returned as is
+        codes    - int32 block (columns x rows): codes of other columns (e.g. 'Stock'),
+                   whose categories and original dtypes travel in the (small, picklable) spec
+    frame() restores the original dtypes, so a frame round-trips unchanged apart
+    from its index, which becomes a RangeIndex.
+
+    The creating process owns the segments and unlinks them on close (or at exit);
+    attached workers only close their mappings.
+    """
+
+    def __init__(self, spec, segments, owner):
+        self.spec = spec
+        self._segments = segments
+        self._owner = owner
+        self._closed = False
+        atexit.register(self.close)
+
+    @classmethod
+    def create(cls, frames):
+        """
+        Copies the frames into new shared memory segments.
+
+        Args:
+            frames (dict): Name -> DataFrame, e.g. {"daily": daily_with_indicators, "intraday": intraday_data}
+
+        Returns:
+            SharedDataset: Owning handle; pass handle.spec to the workers.
+        """
+        spec = {}
+        segments = {}
+        try:
+            for frame_name, data in frames.items():
+                if data is None:
+                    continue
+                frame_spec = {"rows": len(data), "columns": list(data.columns), "blocks": {}}
+
+                for block_name, columns in _split_columns(data).items():
+                    dtype = np.dtype(np.int32 if block_name == "codes" else block_name)
+                    shape = (len(columns), len(data))
+                    segment = _create_segment(dtype.itemsize * shape[0] * shape[1])
+                    segments[segment.name] = segment
+                    block = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+                    block_spec = {"segment": segment.name, "columns": columns, "dtype": dtype.str}
+
+                    if block_name == "codes":
+                        block_spec["categories"] = {}
+                        block_spec["dtypes"] = {}
+                        block_spec["missing"] = {}
+                        for i, column in enumerate(columns):
+                            categorical = pd.Categorical(data[column])
+                            block[i] = categorical.codes
+                            block_spec["categories"][column] = categorical.categories
+                            block_spec["dtypes"][column] = data[column].dtype
+                            if data[column].dtype == object and (categorical.codes < 0).any():
+                                # None and NaN both become code -1; keep the one the column used
+                                block_spec["missing"][column] = data[column][data[column].isna()].iloc[0]
+                    else:
+                        for i, column in enumerate(columns):
+                            block[i] = data[column].to_numpy()
+
+                    frame_spec["blocks"][block_name] = block_spec
+                spec[frame_name] = frame_spec
+        except Exception:
+            for segment in segments.values():
+                segment.close()
+                segment.unlink()
+            raise
+
+        return cls(spec, segments, owner=True)
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Attaches to segments created by another process (zero-copy).
+        """
+        segments = {}
+        for frame_spec in spec.values():
+            for block_spec in frame_spec["blocks"].values():
+                name = block_spec["segment"]
+                if name not in segments:
+                    segments[name] = _attach_segment(name)
+        return cls(spec, segments, owner=False)
+
+    def _block(self, frame_name, block_name):
+        frame_spec = self.spec[frame_name]
+        block_spec = frame_spec["blocks"].get(block_name)
+        if block_spec is None:
+            return None, None
+        shape = (len(block_spec["columns"]), frame_spec["rows"])
+        segment = self._segments[block_spec["segment"]]
+        block = np.ndarray(shape, dtype=np.dtype(block_spec["dtype"]), buffer=segment.buf)
+        block.flags.writeable = self._owner
+        return block, block_spec
+
+    def arrays(self, frame_name):
+        """
+        Column name -> NumPy view into shared memory in the column's own dtype
+        (columns of the "codes" block as int32 codes).
+        """
+        if self._closed:
+            raise RuntimeError("SharedDataset is closed.")
+        result = {}
+        for block_name in self.spec[frame_name]["blocks"]:
+            block, block_spec = self._block(frame_name, block_name)
+            for i, column in enumerate(block_spec["columns"]):
+                result[column] = block[i]
+        return result
+
+    def frame(self, frame_name):
+        """
+        Builds a read-only DataFrame on top of the shared arrays, in the original column order
+        and dtypes. Columns of plain NumPy dtypes are wrapped without copying; the "codes"
+        columns are decoded into new arrays. Keep the handle open while using the frame.
+        """
+        frame_spec = self.spec[frame_name]
+        arrays = self.arrays(frame_name)
+
+        block_spec = frame_spec["blocks"].get("codes")
+        if block_spec is not None:
+            for column in block_spec["columns"]:
+                codes = arrays[column]
+                categories = block_spec["categories"][column]
+                dtype = block_spec["dtypes"][column]
+                if isinstance(dtype, pd.CategoricalDtype):
+                    arrays[column] = pd.Categorical.from_codes(
+                        codes, dtype=pd.CategoricalDtype(categories, ordered=dtype.ordered)
+                    )
+                elif dtype == object:
+                    values = np.asarray(categories, dtype=object).take(codes)
+                    if column in block_spec["missing"]:
+                        values[codes < 0] = block_spec["missing"][column]
+                    arrays[column] = pd.Series(values, dtype=object, copy=False)
+                else:
+                    arrays[column] = pd.Series(pd.Categorical.from_codes(codes, categories=categories)).astype(dtype)
+
+        columns = {column: arrays[column] for column in frame_spec["columns"]}
+        return pd.DataFrame(columns, index=pd.RangeIndex(frame_spec["rows"]), copy=False)
+
+    def close(self):
+        """
+        Releases the mappings; the owner also unlinks the segments.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for segment in self._segments.values():
+            try:
+                segment.close()
+            except BufferError:
+                # A view is still alive somewhere; the mapping goes away with the process
+                pass
+            if self._owner:
+                try:
+                    segment.unlink()
+                except FileNotFoundError:
+                    pass
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        raise TypeError("Pass SharedDataset.spec to workers and attach there, not the handle itself.")
+
+def init_worker(spec):
+    """
+    Process-pool initializer: attaches the dataset once per worker process.
+
+    Example:
+        with SharedDataset.create({"daily": daily, "intraday": intraday}) as dataset:
+            with ProcessPoolExecutor(initializer=init_worker, initargs=(dataset.spec,)) as pool:
+                ...
+    """
+    global _worker_dataset
+    _worker_dataset = SharedDataset.attach(spec)
+
+def get_worker_dataset():
+    """
+    Returns the dataset attached by init_worker in this process.
+    """
+    if _worker_dataset is None:
+        raise RuntimeError("No shared dataset attached; use init_worker as the pool initializer.")
+    return _worker_dataset
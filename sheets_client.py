@@ -0,0 +1,304 @@
+import random
+import threading
+import time
+
+DEFAULT_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive'
+]
+
+# Google Sheets allows 60 read requests per minute per user; stay just below it
+DEFAULT_REQUESTS_PER_MINUTE = 55
+DEFAULT_BURST = 10
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 64.0
+
+# HTTP status codes worth retrying: quota exceeded and transient backend errors
+RETRYABLE_STATUS_CODES = (429, 500, 503)
+QUOTA_STATUS_CODE = 429
+
+# Methods that only read, so repeating them after a backend error cannot apply anything twice.
+# Everything else (append_rows, update, clear, batch_update, ...) is retried on quota errors
+# only: those requests were rejected, while a 500/503 may come after the write was applied.
+IDEMPOTENT_METHODS = {
+    "open_by_url", "open_by_key", "worksheets", "worksheet", "get_worksheet", "get_all_values",
+    "get_all_records", "get_values", "get", "batch_get", "values_get", "values_batch_get",
+    "row_values", "col_values", "acell", "cell", "fetch_sheet_metadata"
+}
+
+# Spreadsheet methods that add, remove or rename worksheets
+_WORKSHEET_CHANGING_METHODS = {
+    "add_worksheet", "del_worksheet", "del_worksheet_by_id", "duplicate_sheet", "batch_update"
+}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: up to `burst` requests at once, refilled at `rate` requests per second.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one token, waiting until one is available.
+        """
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+def status_code(error):
+    """
+    HTTP status code of a Sheets API error (gspread.exceptions.APIError), or None.
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+def is_quota_error(error):
+    """
+    True for quota errors (429 / RESOURCE_EXHAUSTED): the request was rejected, not applied.
+    """
+    if status_code(error) == QUOTA_STATUS_CODE:
+        return True
+    message = str(error)
+    return "RESOURCE_EXHAUSTED" in message or "Quota exceeded" in message
+
+def is_retryable_error(error, idempotent=True):
+    """
+    True for quota errors, and for transient backend errors of idempotent requests.
+    """
+    if is_quota_error(error):
+        return True
+    return idempotent and status_code(error) in RETRYABLE_STATUS_CODES
+
+def _pad_values(values):
+    """
+    Pads ragged API rows to a rectangle, like Worksheet.get_all_values().
+    """
+    width = max((len(row) for row in values), default=0)
+    return [list(row) + [""] * (width - len(row)) for row in values]
+
+class _RateLimited:
+    """
+    Proxy of a gspread Spreadsheet or Worksheet: every method call goes through
+    SheetsClient.call (rate limit + retries; backend errors are only retried for
+    IDEMPOTENT_METHODS). Returned worksheets and spreadsheets are wrapped too;
+    plain attributes (id, title, ...) pass through.
+    """
+
+    def __init__(self, sheets_client, target, sheet_url=None):
+        self._sheets_client = sheets_client
+        self._target = target
+        self._sheet_url = sheet_url
+
+    @property
+    def unwrapped(self):
+        return self._target
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return self._sheets_client.wrap(value, self._sheet_url)
+
+        def call(*args, **kwargs):
+            args = [arg.unwrapped if isinstance(arg, _RateLimited) else arg for arg in args]
+            result = self._sheets_client.call(value, *args, idempotent=name in IDEMPOTENT_METHODS, **kwargs)
+            if name in _WORKSHEET_CHANGING_METHODS and self._sheet_url is not None:
+                self._sheets_client.forget_worksheets(self._sheet_url)
+            return self._sheets_client.wrap(result, self._sheet_url)
+
+        return call
+
+class SheetsClient:
+    """
+    One authorised Google Sheets session shared by all I/O modules.
+
+        - the gspread client is authorised once (lazily) and reused
+        - opened spreadsheets and worksheets are cached by URL / name
+        - every API request is rate limited (token bucket) and retried with
+          exponential backoff and jitter on quota and transient errors
+        - batch_get reads several worksheets in one request
+
+    Anything with gspread's open_by_url() can be passed as client
+    (e.g. a local fake for tests), in which case no credentials are needed.
+    """
+
+    def __init__(self, credentials_path=None, scopes=None, client=None,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, burst=DEFAULT_BURST,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.credentials_path = credentials_path
+        self.scopes = scopes or DEFAULT_SCOPES
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.sleep = sleep
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst, clock, sleep)
+        self._client = client
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        """
+        The authorised gspread client (authorised on first use).
+        """
+        with self._lock:
+            if self._client is None:
+                if self.credentials_path is None:
+                    raise RuntimeError("No credentials_path given for the Google Sheets client.")
+                import gspread
+                from google.oauth2.service_account import Credentials
+
+                credentials = Credentials.from_service_account_file(self.credentials_path, scopes=self.scopes)
+                self._client = gspread.authorize(credentials)
+            return self._client
+
+    def call(self, func, *args, idempotent=False, **kwargs):
+        """
+        Calls func (one API request) under the rate limit, retrying quota errors
+        and, if the request is idempotent (a read), transient backend errors.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e, idempotent):
+                    raise
+                delay = min(MAX_BACKOFF_SECONDS, self.backoff_seconds * 2 ** attempt)
+                self.sleep(delay + random.uniform(0, self.backoff_seconds))
+
+    def wrap(self, value, sheet_url=None):
+        """
+        Wraps spreadsheet and worksheet objects in a rate-limited proxy; other values are returned as is.
+        """
+        if isinstance(value, _RateLimited):
+            return value
+        if hasattr(value, "get_all_values") or hasattr(value, "worksheets"):
+            return _RateLimited(self, value, sheet_url)
+        return value
+
+    def spreadsheet(self, sheet_url):
+        """
+        The (cached) opened spreadsheet, as a rate-limited proxy.
+        """
+        with self._lock:
+            if sheet_url in self._spreadsheets:
+                return self._spreadsheets[sheet_url]
+        # Opened outside the lock (network time, retries), so other sheets are not blocked
+        spreadsheet = self.wrap(self.call(self.client.open_by_url, sheet_url, idempotent=True), sheet_url)
+        with self._lock:
+            return self._spreadsheets.setdefault(sheet_url, spreadsheet)
+
+    def _worksheet_map(self, sheet_url):
+        with self._lock:
+            if sheet_url in self._worksheets:
+                return self._worksheets[sheet_url]
+        worksheets = self.spreadsheet(sheet_url).worksheets()
+        worksheet_map = {worksheet.title: self.wrap(worksheet, sheet_url) for worksheet in worksheets}
+        with self._lock:
+            return self._worksheets.setdefault(sheet_url, worksheet_map)
+
+    def forget_worksheets(self, sheet_url):
+        """
+        Drops the cached worksheet list of a spreadsheet (after worksheets were added or removed).
+        """
+        with self._lock:
+            self._worksheets.pop(sheet_url, None)
+
+    def worksheet(self, sheet_url, sheet_name=None):
+        """
+        A worksheet by name (the first worksheet if sheet_name is None), as a
+        rate-limited proxy, or None if the spreadsheet has no such worksheet.
+        """
+        worksheets = self._worksheet_map(sheet_url)
+        if sheet_name is None:
+            return next(iter(worksheets.values()), None)
+        if sheet_name not in worksheets:
+            # Maybe created since the list was cached
+            self.forget_worksheets(sheet_url)
+            worksheets = self._worksheet_map(sheet_url)
+        return worksheets.get(sheet_name)
+
+    def get_all_values(self, sheet_url, sheet_name=None):
+        """
+        All values of a worksheet, or None if it does not exist.
+        """
+        worksheet = self.worksheet(sheet_url, sheet_name)
+        return None if worksheet is None else worksheet.get_all_values()
+
+    def batch_get(self, sheet_url, sheet_names):
+        """
+        Reads the full values of several worksheets of one spreadsheet in a single request.
+
+        Returns:
+            dict: Sheet name -> values (as get_all_values() returns them), None for missing worksheets.
+        """
+        worksheets = self._worksheet_map(sheet_url)
+        existing = [name for name in sheet_names if name in worksheets]
+        result = {name: None for name in sheet_names}
+        if existing:
+            ranges = ["'{}'".format(name.replace("'", "''")) for name in existing]
+            response = self.spreadsheet(sheet_url).values_batch_get(ranges)
+            for name, value_range in zip(existing, response.get("valueRanges", [])):
+                result[name] = _pad_values(value_range.get("values", []))
+        return result
+
+    def clear_cache(self):
+        """
+        Forgets the opened spreadsheets and worksheets (the session is kept).
+        """
+        with self._lock:
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+
+_shared_clients = {}  # (credentials_path, scopes) -> SheetsClient
+_override_client = None
+_shared_lock = threading.Lock()
+
+def get_sheets_client(credentials_path=None, scopes=None):
+    """
+    Returns the process-wide SheetsClient of these credentials, creating it on first use.
+    Every (credentials_path, scopes) pair gets its own client (its own session
+    and rate limit, as Google's quota is per account); a client installed with
+    set_sheets_client is returned for all of them.
+    """
+    key = (credentials_path, tuple(scopes or DEFAULT_SCOPES))
+    with _shared_lock:
+        if _override_client is not None:
+            return _override_client
+        if key not in _shared_clients:
+            _shared_clients[key] = SheetsClient(credentials_path, scopes)
+        return _shared_clients[key]
+
+def set_sheets_client(sheets_client):
+    """
+    Makes get_sheets_client return sheets_client whatever the credentials
+    (e.g. SheetsClient(client=fake) in tests); None goes back to one client per credentials.
+
+    Returns:
+        The previously installed client (or None).
+    """
+    global _override_client
+    with _shared_lock:
+        previous = _override_client
+        _override_client = sheets_client
+        return previous
@@ -0,0 +1,97 @@
+import re
+import pytest
+from data_loader import fetch_sheets, fetch_worksheet_delta
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+class FakeWorksheet:
+    """
+    Local stand-in for a gspread worksheet; records the requests it serves.
+    """
+
+    def __init__(self, rows, col_count=26):
+        self.rows = [list(row) for row in rows]
+        self.col_count = col_count
+        self.requests = []
+
+    def get_all_values(self):
+        self.requests.append("all")
+        width = max((len(row) for row in self.rows), default=0)
+        return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def get_values(self, range_name):
+        self.requests.append(range_name)
+        first_row, last_column = re.match(r"A(\d+):([A-Z]+)$", range_name).groups()
+        return [row[:_column_number(last_column)] for row in self.rows[int(first_row) - 1:]]
+
+class FakeClient:
+    # The part of SheetsClient that fetch_sheet_data uses
+    def __init__(self, worksheets):
+        self.worksheets = worksheets
+
+    def worksheet(self, sheet_url, sheet_name=None):
+        return self.worksheets.get(sheet_name)
+
+def _daily_rows(days):
+    return [["Date", "Open", "Close"]] + [[f"{day:02d}/01/2024", str(day), str(day + 1)] for day in range(1, days + 1)]
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "sheet.pkl")
+
+def test_first_fetch_is_full(cache_path):
+    worksheet = FakeWorksheet(_daily_rows(5))
+    assert fetch_worksheet_delta(worksheet, cache_path) == _daily_rows(5)
+    assert worksheet.requests == ["all"]
+
+def test_appended_rows_are_fetched_as_delta(cache_path):
+    worksheet = FakeWorksheet(_daily_rows(5))
+    fetch_worksheet_delta(worksheet, cache_path)
+    worksheet.rows = _daily_rows(8)
+
+    assert fetch_worksheet_delta(worksheet, cache_path) == _daily_rows(8)
+    assert worksheet.requests[1:] == ["A6:Z"]  # from the last stored row on
+
+@pytest.mark.parametrize("change", ["edited_last_row", "deleted_rows", "added_column", "resized_grid"])
+def test_changes_force_a_full_fetch(cache_path, change):
+    worksheet = FakeWorksheet(_daily_rows(5))
+    fetch_worksheet_delta(worksheet, cache_path)
+    if change == "edited_last_row":
+        worksheet.rows[-1][2] = "99"
+    elif change == "deleted_rows":
+        worksheet.rows = worksheet.rows[:-2]
+    elif change == "added_column":
+        worksheet.rows[0].append("Volume")
+        worksheet.rows.append(["06/01/2024", "6", "7", "500"])
+    else:
+        worksheet.col_count = 30
+
+    assert fetch_worksheet_delta(worksheet, cache_path) == worksheet.get_all_values()
+    assert worksheet.requests[-2] == "all"
+
+def test_periodic_full_fetch(cache_path):
+    worksheet = FakeWorksheet(_daily_rows(5))
+    for _ in range(3):
+        fetch_worksheet_delta(worksheet, cache_path, full_fetch_every=3)
+    assert worksheet.requests == ["all", "A6:Z", "A6:Z"]
+    fetch_worksheet_delta(worksheet, cache_path, full_fetch_every=3)
+    assert worksheet.requests[-1] == "all"
+
+def test_fetch_sheets_reuses_the_cache_dir(tmp_path):
+    daily = FakeWorksheet(_daily_rows(5))
+    intraday = FakeWorksheet([["Date", "Time", "Open"], ["01/01/2024", "09:30", "1"]])
+    client = FakeClient({"Sheet1": daily, "SYN30": intraday})
+    cache_dir = str(tmp_path / "cache")
+
+    first = fetch_sheets(client, "url", ["Sheet1", "SYN30", "missing"], cache_dir=cache_dir)
+    daily.rows = _daily_rows(6)
+    second = fetch_sheets(client, "url", ["Sheet1", "SYN30", "missing"], cache_dir=cache_dir)
+
+    assert first["missing"] is None and second["missing"] is None
+    assert second["Sheet1"] == _daily_rows(6) and second["SYN30"] == first["SYN30"]
+    assert daily.requests == ["all", "A6:Z"]
+    assert intraday.requests == ["all", "A2:Z"]
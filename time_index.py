@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 86_400_000_000_000
+
+def epoch_ns(values):
+    """
+    Datetime values (column, index, array or list) as int64 nanoseconds since
+    the epoch. Time zone aware values are taken at their local wall time, so
+    day boundaries match Timestamp.date().
+    """
+    times = pd.DatetimeIndex(values)
+    if times.tz is not None:
+        times = times.tz_localize(None)
+    return times.as_unit('ns').asi8
+
+def day_floor(times):
+    """
+    Start of the day (epoch ns) of every int64 time.
+    """
+    return times - np.mod(times, NS_PER_DAY)
+
+def time_bounds(start_date=None, end_date=None):
+    """
+    [start, stop) in epoch ns of the range start_date .. end of the day end_date
+    (None: unbounded).
+    """
+    start = np.iinfo(np.int64).min if start_date is None else int(epoch_ns([start_date])[0])
+    stop = np.iinfo(np.int64).max if end_date is None else int(day_floor(epoch_ns([end_date]))[0]) + NS_PER_DAY
+    return start, stop
+
+def row_range(times, start_date=None, end_date=None):
+    """
+    (first row, stop row) of the sorted int64 times inside start_date .. end_date.
+    """
+    start, stop = time_bounds(start_date, end_date)
+    return int(times.searchsorted(start, side='left')), int(times.searchsorted(stop, side='left'))
+
+def rows_from(data, column, start_date, end_date=None):
+    """
+    Rows with data[column] >= start_date (and on or before the day end_date), re-indexed from 0.
+    A slice (no copy of the data) found by searchsorted on the int64 times when
+    the column is sorted, a boolean mask otherwise.
+    """
+    times = epoch_ns(data[column])
+    if data[column].is_monotonic_increasing:
+        first_row, stop_row = row_range(times, start_date, end_date)
+        return data.iloc[first_row:stop_row].reset_index(drop=True)
+
+    start, stop = time_bounds(start_date, end_date)
+    return data[(times >= start) & (times < stop)].reset_index(drop=True)
+
+def sorted_by_time(data, column='Datetime'):
+    """
+    The frame in (stable) time order; the frame itself when it already is.
+    """
+    if data[column].is_monotonic_increasing:
+        return data
+    return data.sort_values(by=column, kind='stable').reset_index(drop=True)
+
+class TimeIndex:
+    """
+    Daily rows and intraday bars on one int64 time axis.
+
+    The bars are grouped by day in CSR form: the bars of days[j] are the bar
+    rows offsets[j]:offsets[j + 1]. Every daily row gets the [start, stop)
+    range of its day's bars (empty when there are none), so the bars of a day
+    are a slice of the bar arrays instead of a lookup and a copy.
+
+    Attributes:
+        dates (np.ndarray): int64 times of the daily rows.
+        bar_times (np.ndarray): int64 times of the (time ordered) bars.
+        days (np.ndarray): Distinct days of the bars.
+        offsets (np.ndarray): len(days) + 1 bar offsets.
+        day_starts, day_stops (np.ndarray): Bar range of every daily row.
+    """
+
+    def __init__(self, dates, bar_times=None):
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.bar_times = np.zeros(0, dtype=np.int64) if bar_times is None else np.asarray(bar_times, dtype=np.int64)
+        if len(self.bar_times) > 1 and (np.diff(self.bar_times) < 0).any():
+            raise ValueError("Intraday bars must be in time order (see sorted_by_time).")
+
+        bar_days = day_floor(self.bar_times)
+        firsts = np.flatnonzero(np.r_[True, bar_days[1:] != bar_days[:-1]]) if len(bar_days) \
+            else np.zeros(0, dtype=np.int64)
+        self.days = bar_days[firsts]
+        self.offsets = np.append(firsts, len(bar_days)).astype(np.int64)
+
+        # Daily row -> its day in the CSR table (days without bars get an empty range)
+        row_days = day_floor(self.dates)
+        positions = self.days.searchsorted(row_days)
+        found = positions < len(self.days)
+        found[found] = self.days[positions[found]] == row_days[found]
+        self.day_starts = np.where(found, self.offsets[positions], 0)
+        self.day_stops = np.where(found, self.offsets[np.minimum(positions + 1, len(self.days))], 0)
+
+    @classmethod
+    def from_frames(cls, daily, bars=None, date_column='Date', bar_column='Datetime'):
+        """
+        Index of a daily frame and a (time ordered) frame of intraday bars.
+        """
+        return cls(epoch_ns(daily[date_column]), None if bars is None else epoch_ns(bars[bar_column]))
+
+    def bars_of_row(self, row):
+        """
+        [start, stop) of the bars of the daily row's day.
+        """
+        return int(self.day_starts[row]), int(self.day_stops[row])
+
+    def bars_of_day(self, time):
+        """
+        [start, stop) of the bars of the day containing the int64 time.
+        """
+        day = int(time) - int(time) % NS_PER_DAY
+        j = int(self.days.searchsorted(day))
+        if j < len(self.days) and self.days[j] == day:
+            return int(self.offsets[j]), int(self.offsets[j + 1])
+        return 0, 0
@@ -0,0 +1,511 @@
+import pickle
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+# Fields of a trade, in the order of the trade dicts built by open_trade
+TRADE_FIELDS = (
+    "ticker", "entry_price", "entry_date", "initial_amount", "first_SL", "first_PT", "partial_sale_done",
+    "partial_sale_date", "partial_sale_price", "partial_sale_amount", "remaining_sale_amount", "second_SL",
+    "second_PT", "adjusted_SL", "adjusted_PT", "adjustments", "remaining_reason", "remaining_date",
+    "remaining_price"
+)
+ADJUSTMENT_FIELDS = ("adjustment_date", "adjusted_SL", "adjusted_PT", "adjustment_stage")
+
+# Column storage: float64 (NaN: None), int64 share counts and int64 epoch ns times
+# (MISSING: None), labels as int32 codes into a per-field label list (-1: None)
+FLOAT_FIELDS = ("entry_price", "first_SL", "first_PT", "partial_sale_price", "second_SL", "second_PT",
+                "adjusted_SL", "adjusted_PT", "remaining_price")
+AMOUNT_FIELDS = ("initial_amount", "partial_sale_amount", "remaining_sale_amount")
+TIME_FIELDS = ("entry_date", "partial_sale_date", "remaining_date")
+LABEL_FIELDS = ("ticker", "remaining_reason")
+MISSING = np.iinfo(np.int64).min  # the int64 value of NaT
+
+# Open trade dicts at which append first moves the closed ones to the columns
+SEAL_BATCH = 64
+
+def append_ledger_record(ledger_path, trades=None, cash=None):
+    """
+    Appends spilled trade columns (TradeLedger.spill) and/or drained cash flows
+    (BudgetManager.drain_ledger) to an on-disk ledger file.
+    """
+    with open(ledger_path, "ab") as f:
+        pickle.dump({"trades": trades, "cash": cash}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def iter_ledger_records(ledger_path):
+    """
+    Yields the records of a ledger file in the order they were appended.
+    """
+    with open(ledger_path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def _time_value(value, time_zones, name):
+    if value is None:
+        return MISSING
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is not None:
+        time_zones.setdefault(name, timestamp.tz)
+    return timestamp.value
+
+def _timestamp(value, tz):
+    return pd.Timestamp(int(value)) if tz is None else pd.Timestamp(int(value), tz="UTC").tz_convert(tz)
+
+def _times(values, tz):
+    # int64 epoch ns -> DatetimeIndex (NaT for MISSING) without copying
+    times = pd.DatetimeIndex(values.view("datetime64[ns]"))
+    return times if tz is None else times.tz_localize("UTC").tz_convert(tz)
+
+class TradeLedger(Mapping):
+    """
+    Append-only trade ledger: trade id -> trade, with monotonic ids (1, 2, ...).
+
+    Open trades are the dicts of open_trade, updated in place through the open
+    positions. Once a trade is closed (its remaining_reason is set) its fields
+    move to growable column arrays (doubling, amortised O(1) per trade) and its
+    SL/PT adjustment log to a columnar log; the dict is dropped. columns() and
+    adjustment_columns() give the whole ledger as arrays, which is what the
+    reports and metrics read (see trade_columns). Mapping access still works:
+    closed trades are rebuilt as dicts on demand (changing those copies does
+    not change the ledger).
+
+    With spill() the closed trades ahead of the oldest open one are appended to
+    an on-disk ledger file and dropped from memory; reads include them.
+    """
+
+    def __init__(self, spill_path=None, capacity=256):
+        self.spill_path = spill_path
+        self._first_id = 1  # id of row 0 (the ids before it are spilled)
+        self._size = 0
+        self._open = {}  # trade id -> trade dict, for the rows not sealed yet
+        self._seal_at = SEAL_BATCH
+        self._closed = np.zeros(capacity, dtype=bool)
+        self._columns = {"partial_sale_done": np.zeros(capacity, dtype=bool)}
+        self._columns.update({name: np.empty(capacity, dtype=np.float64) for name in FLOAT_FIELDS})
+        self._columns.update({name: np.empty(capacity, dtype=np.int64) for name in AMOUNT_FIELDS + TIME_FIELDS})
+        self._columns.update({name: np.empty(capacity, dtype=np.int32) for name in LABEL_FIELDS})
+        self._labels = {name: [] for name in LABEL_FIELDS + ("adjustment_stage",)}
+        self._time_zones = {}
+
+        # Adjustment log of the sealed rows: row r owns entries adjustment_starts[r]:adjustment_stops[r]
+        self._adjustment_starts = np.zeros(capacity, dtype=np.int64)
+        self._adjustment_stops = np.zeros(capacity, dtype=np.int64)
+        self._adjustment_size = 0
+        self._adjustments = {
+            "adjustment_date": np.empty(capacity, dtype=np.int64),
+            "adjusted_SL": np.empty(capacity, dtype=np.float64),
+            "adjusted_PT": np.empty(capacity, dtype=np.float64),
+            "adjustment_stage": np.empty(capacity, dtype=np.int32)
+        }
+        self._spilled = 0
+
+    # Appending and sealing
+
+    @property
+    def next_id(self):
+        """Id the next appended trade gets."""
+        return self._first_id + self._size
+
+    def append(self, trade):
+        """
+        Adds a new (open) trade dict under the next id.
+
+        Returns:
+            int: The trade id.
+        """
+        if self._size == len(self._closed):
+            self._grow_rows(2 * len(self._closed))
+        trade_id = self._first_id + self._size
+        self._closed[self._size] = False
+        self._size += 1
+        self._open[trade_id] = trade
+        if len(self._open) >= self._seal_at:
+            self._seal_closed()
+            self._seal_at = max(SEAL_BATCH, 2 * len(self._open))
+        return trade_id
+
+    def _grow_rows(self, capacity):
+        def grown(old):
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            return new
+        self._closed = grown(self._closed)
+        self._adjustment_starts = grown(self._adjustment_starts)
+        self._adjustment_stops = grown(self._adjustment_stops)
+        self._columns = {name: grown(values) for name, values in self._columns.items()}
+
+    def _label_code(self, name, value):
+        if value is None:
+            return -1
+        labels = self._labels[name]
+        try:
+            return labels.index(value)
+        except ValueError:
+            labels.append(value)
+            return len(labels) - 1
+
+    def _write_row(self, row, trade):
+        columns = self._columns
+        for name in FLOAT_FIELDS:
+            value = trade[name]
+            columns[name][row] = np.nan if value is None else value
+        for name in AMOUNT_FIELDS:
+            value = trade[name]
+            columns[name][row] = MISSING if value is None else value
+        for name in TIME_FIELDS:
+            columns[name][row] = _time_value(trade[name], self._time_zones, name)
+        for name in LABEL_FIELDS:
+            columns[name][row] = self._label_code(name, trade[name])
+        columns["partial_sale_done"][row] = bool(trade["partial_sale_done"])
+
+    def _seal(self, trade_id):
+        # Moves a trade dict (and its adjustment log) into the columns
+        trade = self._open.pop(trade_id)
+        row = trade_id - self._first_id
+        self._write_row(row, trade)
+        self._closed[row] = trade["remaining_reason"] is not None
+
+        adjustments = trade["adjustments"]
+        start = self._adjustment_size
+        stop = start + len(adjustments)
+        if stop > len(self._adjustments["adjusted_SL"]):
+            capacity = max(stop, 2 * len(self._adjustments["adjusted_SL"]))
+            for name, old in self._adjustments.items():
+                new = np.empty(capacity, dtype=old.dtype)
+                new[:start] = old[:start]
+                self._adjustments[name] = new
+        log = self._adjustments
+        for i, adjustment in enumerate(adjustments, start):
+            log["adjustment_date"][i] = _time_value(adjustment["adjustment_date"], self._time_zones,
+                                                    "adjustment_date")
+            log["adjusted_SL"][i] = adjustment["adjusted_SL"]
+            log["adjusted_PT"][i] = adjustment["adjusted_PT"]
+            log["adjustment_stage"][i] = self._label_code("adjustment_stage", adjustment["adjustment_stage"])
+        self._adjustment_starts[row] = start
+        self._adjustment_stops[row] = stop
+        self._adjustment_size = stop
+
+    def _sealed(self, rows):
+        # Mask of the rows already moved to the columns
+        sealed = np.ones(len(rows), dtype=bool)
+        if self._open and len(rows):
+            open_rows = np.fromiter(self._open, dtype=np.int64, count=len(self._open)) - self._first_id
+            sealed[np.isin(rows, open_rows)] = False
+        return sealed
+
+    def _seal_closed(self):
+        closed = [trade_id for trade_id, trade in self._open.items() if trade["remaining_reason"] is not None]
+        for trade_id in closed:
+            self._seal(trade_id)
+
+    # Mapping interface
+
+    def __len__(self):
+        return self._spilled + self._size
+
+    def __iter__(self):
+        return iter(range(self._first_id - self._spilled, self._first_id + self._size))
+
+    def __contains__(self, key):
+        return isinstance(key, (int, np.integer)) and self._first_id - self._spilled <= key < self.next_id
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in self._open:
+            return self._open[key]
+        if key >= self._first_id:
+            return self._row_dict(key - self._first_id)
+        for chunk in self._spilled_chunks():
+            ids = chunk["trade_id"]
+            if ids[0] <= key <= ids[-1]:
+                return TradeLedger._from_chunk(chunk)._row_dict(key - ids[0])
+        raise KeyError(key)
+
+    def items(self):
+        for chunk in self._spilled_chunks():
+            yield from self._chunk_items(chunk)
+        for row in range(self._size):
+            trade_id = self._first_id + row
+            yield trade_id, self._open[trade_id] if trade_id in self._open else self._row_dict(row)
+
+    def values(self):
+        for _, trade in self.items():
+            yield trade
+
+    def open_trades(self):
+        """
+        The trades not closed yet (trade id -> live trade dict), in id order.
+        """
+        self._seal_closed()
+        return dict(self._open)
+
+    def _row_dict(self, row):
+        columns = self._columns
+        trade = {}
+        for name in TRADE_FIELDS:
+            if name in FLOAT_FIELDS:
+                value = columns[name][row]
+                trade[name] = None if np.isnan(value) else float(value)
+            elif name in AMOUNT_FIELDS:
+                value = columns[name][row]
+                trade[name] = None if value == MISSING else int(value)
+            elif name in TIME_FIELDS:
+                value = columns[name][row]
+                trade[name] = None if value == MISSING else _timestamp(value, self._time_zones.get(name))
+            elif name in LABEL_FIELDS:
+                code = columns[name][row]
+                trade[name] = None if code < 0 else self._labels[name][code]
+            elif name == "partial_sale_done":
+                trade[name] = bool(columns[name][row])
+            else:
+                trade[name] = self._adjustment_dicts(self._adjustment_starts[row], self._adjustment_stops[row])
+        return trade
+
+    def _adjustment_dicts(self, start, stop):
+        log = self._adjustments
+        dates = _times(log["adjustment_date"][start:stop], self._time_zones.get("adjustment_date"))
+        stages = self._labels["adjustment_stage"]
+        return [
+            {
+                "adjustment_date": date,
+                "adjusted_SL": float(sl),
+                "adjusted_PT": float(pt),
+                "adjustment_stage": stages[stage]
+            }
+            for date, sl, pt, stage in zip(dates, log["adjusted_SL"][start:stop], log["adjusted_PT"][start:stop],
+                                           log["adjustment_stage"][start:stop])
+        ]
+
+    # Columns
+
+    def _row_columns(self, rows):
+        # Columns of the given in-memory rows in the format of columns() (open rows read from their dicts)
+        for trade_id, trade in self._open.items():
+            self._write_row(trade_id - self._first_id, trade)
+        columns = {"trade_id": self._first_id + rows, "closed": self._closed[rows]}
+        for name in TRADE_FIELDS:
+            if name == "adjustments":
+                continue
+            values = self._columns[name][rows]
+            if name in TIME_FIELDS:
+                values = _times(values, self._time_zones.get(name))
+            elif name in LABEL_FIELDS:
+                values = np.array(self._labels[name] + [None], dtype=object)[values]
+            columns[name] = values
+        return columns
+
+    def _row_adjustments(self, rows):
+        # Adjustment log of the given rows, by row and in logging order (open rows from their dicts)
+        sealed = rows[self._sealed(rows)]
+        starts, stops = self._adjustment_starts[sealed], self._adjustment_stops[sealed]
+        counts = stops - starts
+        entries = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        log = {"trade_id": np.repeat(self._first_id + sealed, counts)}
+        log.update({name: values[entries] for name, values in self._adjustments.items()})
+
+        if self._open:
+            row_set = set(rows.tolist())
+            extra = [(trade_id, adjustment) for trade_id, trade in self._open.items()
+                     if trade_id - self._first_id in row_set for adjustment in trade["adjustments"]]
+            if extra:
+                log["trade_id"] = np.concatenate([log["trade_id"], [trade_id for trade_id, _ in extra]])
+                log["adjustment_date"] = np.concatenate([log["adjustment_date"], [
+                    _time_value(adjustment["adjustment_date"], self._time_zones, "adjustment_date")
+                    for _, adjustment in extra]])
+                for name in ("adjusted_SL", "adjusted_PT"):
+                    log[name] = np.concatenate([log[name], [adjustment[name] for _, adjustment in extra]])
+                log["adjustment_stage"] = np.concatenate([log["adjustment_stage"], [
+                    self._label_code("adjustment_stage", adjustment["adjustment_stage"]) for _, adjustment in extra]])
+                order = np.argsort(log["trade_id"], kind="stable")
+                log = {name: values[order] for name, values in log.items()}
+        return log
+
+    def _spilled_chunks(self):
+        if not self._spilled:
+            return
+        for record in iter_ledger_records(self.spill_path):
+            if record["trades"] is not None:
+                yield record["trades"]
+
+    def _chunk_items(self, chunk):
+        # A spilled chunk as (trade id, trade dict) pairs
+        ledger = TradeLedger._from_chunk(chunk)
+        for row, trade_id in enumerate(chunk["trade_id"].tolist()):
+            yield trade_id, ledger._row_dict(row)
+
+    @classmethod
+    def _from_chunk(cls, chunk):
+        # Read-only ledger over one spilled chunk (its ids are consecutive)
+        n = len(chunk["trade_id"])
+        ledger = cls(capacity=max(1, n))
+        ledger._first_id = int(chunk["trade_id"][0])
+        ledger._size = n
+        ledger._closed[:n] = True
+        ledger._labels = {name: list(labels) for name, labels in chunk["labels"].items()}
+        ledger._time_zones = dict(chunk["time_zones"])
+        for name in ledger._columns:
+            ledger._columns[name][:n] = chunk["columns"][name]
+        counts = np.bincount(np.searchsorted(chunk["trade_id"], chunk["adjustments"]["trade_id"]), minlength=n)
+        ledger._adjustment_stops[:n] = np.cumsum(counts)
+        ledger._adjustment_starts[:n] = ledger._adjustment_stops[:n] - counts
+        ledger._adjustments = {name: np.asarray(chunk["adjustments"][name]) for name in ADJUSTMENT_FIELDS}
+        ledger._adjustment_size = len(ledger._adjustments["adjusted_SL"])
+        return ledger
+
+    def _chunk(self, rows):
+        # In-memory rows in the spill format (raw column values, labels and time zones)
+        return {
+            "trade_id": self._first_id + rows,
+            "columns": {name: values[rows].copy() for name, values in self._columns.items()},
+            "adjustments": self._row_adjustments(rows),
+            "labels": {name: list(labels) for name, labels in self._labels.items()},
+            "time_zones": dict(self._time_zones)
+        }
+
+    def columns(self):
+        """
+        The whole ledger (spilled trades included) as column arrays, in id
+        order: trade_id, closed, and one entry per trade field. Prices and
+        SL/PT levels are float64 (NaN: None), share counts int64 (MISSING:
+        None), dates DatetimeIndex (NaT: None), ticker and remaining_reason
+        object arrays. The adjustment log is in adjustment_columns().
+        """
+        self._seal_closed()
+        parts = [TradeLedger._from_chunk(chunk)._row_columns(np.arange(len(chunk["trade_id"])))
+                 for chunk in self._spilled_chunks()]
+        own = self._row_columns(np.arange(self._size))
+        parts.append(own)
+        if len(parts) == 1:
+            return own
+        return {name: _concatenate([part[name] for part in parts]) for name in own}
+
+    def adjustment_columns(self):
+        """
+        The SL/PT adjustment log as column arrays ordered by trade id, then in
+        logging order: trade_id, adjustment_date (DatetimeIndex), adjusted_SL,
+        adjusted_PT and adjustment_stage (object array).
+        """
+        self._seal_closed()
+        parts = [TradeLedger._from_chunk(chunk)._adjustment_view(np.arange(len(chunk["trade_id"])))
+                 for chunk in self._spilled_chunks()]
+        parts.append(self._adjustment_view(np.arange(self._size)))
+        if len(parts) == 1:
+            return parts[0]
+        return {name: _concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    def _adjustment_view(self, rows):
+        log = self._row_adjustments(rows)
+        return {
+            "trade_id": log["trade_id"],
+            "adjustment_date": _times(log["adjustment_date"], self._time_zones.get("adjustment_date")),
+            "adjusted_SL": log["adjusted_SL"],
+            "adjusted_PT": log["adjusted_PT"],
+            "adjustment_stage": np.array(self._labels["adjustment_stage"] + [None], dtype=object)[
+                log["adjustment_stage"]]
+        }
+
+    # Spilling
+
+    def spill(self, spill_path=None):
+        """
+        Appends the closed trades ahead of the oldest open trade to the ledger
+        file (default: self.spill_path) and drops them from memory.
+
+        Returns:
+            int: Trades spilled.
+        """
+        if spill_path is not None:
+            if self.spill_path not in (None, spill_path):
+                raise ValueError(f"Ledger already spills to {self.spill_path}")
+            self.spill_path = spill_path
+        if self.spill_path is None:
+            raise ValueError("No spill_path to spill the trade ledger to.")
+        self._seal_closed()
+        count = (min(self._open) - self._first_id) if self._open else self._size
+        if count == 0:
+            return 0
+        append_ledger_record(self.spill_path, trades=self._chunk(np.arange(count)))
+
+        # Keep the rest: rows shift down, the adjustment log of the spilled rows is dropped
+        keep = np.arange(count, self._size)
+        kept = keep[self._sealed(keep)]
+        new_log = {name: [] for name in self._adjustments}
+        new_starts = self._adjustment_starts.copy()
+        new_stops = self._adjustment_stops.copy()
+        position = 0
+        for row in kept.tolist():
+            start, stop = self._adjustment_starts[row], self._adjustment_stops[row]
+            for name, values in self._adjustments.items():
+                new_log[name].append(values[start:stop])
+            new_starts[row], new_stops[row] = position, position + stop - start
+            position += stop - start
+        for name, values in self._adjustments.items():
+            parts = new_log[name]
+            compact = np.concatenate(parts) if parts else values[:0]
+            grown = np.empty(max(len(compact), 1), dtype=values.dtype)
+            grown[:len(compact)] = compact
+            self._adjustments[name] = grown
+        self._adjustment_size = position
+
+        n = self._size - count
+        self._closed[:n] = self._closed[count:self._size]
+        self._adjustment_starts[:n] = new_starts[count:self._size]
+        self._adjustment_stops[:n] = new_stops[count:self._size]
+        for values in self._columns.values():
+            values[:n] = values[count:self._size]
+        self._first_id += count
+        self._size = n
+        self._spilled += count
+        return count
+
+    @classmethod
+    def load(cls, spill_path):
+        """
+        A ledger over all the trades spilled to a ledger file (e.g. by run_chunked_simulation).
+        """
+        ledger = cls(spill_path=spill_path)
+        for record in iter_ledger_records(spill_path):
+            if record["trades"] is not None:
+                ledger._spilled += len(record["trades"]["trade_id"])
+                ledger._first_id = int(record["trades"]["trade_id"][-1]) + 1
+        return ledger
+
+def _concatenate(parts):
+    if isinstance(parts[0], pd.DatetimeIndex):
+        return parts[0].append(parts[1:]) if len(parts) > 1 else parts[0]
+    return np.concatenate(parts)
+
+def trade_columns(trades):
+    """
+    Trades as column arrays (see TradeLedger.columns): read directly from a
+    TradeLedger, built once from any other mapping of trade dicts.
+    """
+    if isinstance(trades, TradeLedger):
+        return trades.columns()
+    columns = _ledger_of(trades).columns()
+    columns["trade_id"] = np.array(list(trades.keys()))
+    return columns
+
+def adjustment_columns(trades):
+    """
+    The SL/PT adjustment log of the trades as column arrays (see TradeLedger.adjustment_columns).
+    """
+    if isinstance(trades, TradeLedger):
+        return trades.adjustment_columns()
+    log = _ledger_of(trades).adjustment_columns()
+    if len(trades):
+        log["trade_id"] = np.array(list(trades.keys()))[log["trade_id"] - 1]
+    return log
+
+def _ledger_of(trades):
+    # Columnar copy of a mapping of trade dicts (ids renumbered 1, 2, ... in its order)
+    ledger = TradeLedger(capacity=max(1, len(trades)))
+    for trade in trades.values():
+        ledger.append(trade)
+    for trade_id in list(ledger._open):
+        ledger._seal(trade_id)
+    return ledger
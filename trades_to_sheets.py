@@ -1,33 +1,35 @@
-import gspread
-from google.oauth2.service_account import Credentials
 #from datetime import timedelta
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from sheets_client import get_sheets_client
+from time_index import rows_from
+from trade_ledger import MISSING, trade_columns
 
 # Configuration
 CREDENTIALS_PATH = r"fourth-gantry"
 OUTPUT_SHEET_URL = "Sheet url"
 
+# First date of the indicator rows written to the sheet
+SHEET_START_DATE = '2023-11-01'
+
 def append_trades_to_sheet(trades, full_data_with_indicators, sheet_url=OUTPUT_SHEET_URL):
     """
     Append indicator data first, then add Pos, Ticker, and Return for trade-specific rows.
 
     Parameters:
-        trades (dict): Dictionary of all trades and their details.
+        trades (TradeLedger or dict): All trades and their details (read as columns, see trade_columns).
         indicators (pd.DataFrame): DataFrame of indicators including all necessary columns.
         sheet_url (str): URL of the Google Sheet where data will be written.
     """
-    # Authenticate with Google Sheets
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 
-              'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_file(CREDENTIALS_PATH, scopes=scopes)
-    client = gspread.authorize(credentials)
+    # Shared, rate-limited Google Sheets session
+    client = get_sheets_client(CREDENTIALS_PATH)
 
     # Open the Google Sheet
-    sh = client.open_by_url(sheet_url)
+    sh = client.spreadsheet(sheet_url)
 
     # Duplicate the template sheet
-    template_ws = sh.worksheet("Template")
+    template_ws = client.worksheet(sheet_url, "Template")
     template_sheet_id = template_ws.id
     new_sheet_name = f"Trades_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     sh.batch_update({
@@ -39,10 +41,10 @@ def append_trades_to_sheet(trades, full_data_with_indicators, sheet_url=OUTPUT_S
             }
         }]
     })
-    worksheet = sh.worksheet(new_sheet_name)
+    worksheet = client.worksheet(sheet_url, new_sheet_name)
 
     # Step 1: Write All Indicator Data
-    indicators = full_data_with_indicators[full_data_with_indicators['Date'] >= '2023-11-01'].copy()  # Filter and create a copy
+    indicators = rows_from(full_data_with_indicators, 'Date', SHEET_START_DATE)  # searchsorted slice of the sorted dates
     indicators['Date'] = indicators['Date'].dt.strftime('%d/%m/%Y')  # Format as DD/MM/YYYY
 
 
@@ -70,16 +72,17 @@ def append_trades_to_sheet(trades, full_data_with_indicators, sheet_url=OUTPUT_S
     # Load back the written data to update with trades
     sheet_data = pd.DataFrame(worksheet.get_all_records())
 
-    for pos, trade in trades.items():
-        entry_date = trade.get("entry_date").strftime('%d/%m/%Y')
-        ticker = trade.get("ticker", "")
-        entry_price = trade.get("entry_price", 0)
-        initial_amount = trade.get("initial_amount", 0)
-        remaining_price = trade.get("remaining_price", entry_price)
-        total_cost = entry_price * initial_amount
-        final_value = remaining_price * initial_amount
-        trade_return = ((final_value - total_cost) / total_cost) if total_cost else 0
-
+    columns = trade_columns(trades)
+    initial_amount = columns["initial_amount"]
+    initial_amount = np.where(initial_amount == MISSING, 0, initial_amount).astype(np.float64)
+    total_cost = columns["entry_price"] * initial_amount
+    final_value = columns["remaining_price"] * initial_amount
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trade_returns = np.where(total_cost != 0, (final_value - total_cost) / total_cost, 0)
+    entry_dates = columns["entry_date"].strftime('%d/%m/%Y')
+
+    for pos, entry_date, ticker, trade_return in zip(columns["trade_id"].tolist(), entry_dates,
+                                                      columns["ticker"], trade_returns.tolist()):
         # Match row with the entry date
         row_index = sheet_data[sheet_data["Date"] == entry_date].index
         if not row_index.empty:
@@ -1,5 +1,11 @@
+import json
+import numbers
+import sys
 from datetime import datetime
 from collections import defaultdict
+import numpy as np
+import pandas as pd
+from trade_ledger import MISSING, trade_columns, adjustment_columns
 
 def get_user_inputs():
     """Returns predefined user inputs."""
@@ -15,183 +21,258 @@ def get_user_inputs():
     return user_inputs
 
 
-def trade_summary(trades):
+# Verbosity levels of trade_summary
+VERBOSITY_OFF = 0          # nothing is built or written (headless batch runs)
+VERBOSITY_SUMMARY = 1      # totals over all trades
+VERBOSITY_TRADES = 2       # one block per trade
+VERBOSITY_ADJUSTMENTS = 3  # per trade, including every SL/PT adjustment
+
+REPORT_FORMATS = ("text", "csv", "json")
+
+TRADE_REPORT_COLUMNS = [
+    "trade_id", "ticker", "entry_date", "entry_price", "initial_amount", "position_value",
+    "first_SL", "first_PT", "partial_sale_done", "partial_sale_date", "partial_sale_price",
+    "partial_sale_amount", "partial_sale_total", "second_SL", "second_PT", "remaining_reason",
+    "remaining_date", "remaining_price", "remaining_sale_amount", "final_sale_total",
+    "total_return_percentage", "total_return_dollars"
+]
+ADJUSTMENT_REPORT_COLUMNS = ["trade_id", "adjustment_date", "adjusted_SL", "adjusted_PT", "adjustment_stage"]
+
+def build_trade_report(trades, include_adjustments=True):
     """
-    Prints a summary of all trades, detailing entry, partial sale, adjustments, final sale, and total return.
+    Builds the trade summary once as columnar data.
 
     Args:
-        trades (dict): Dictionary where keys are trade IDs and values are trade details.
+        trades (TradeLedger or dict): Trade IDs -> trade details (read as columns, see trade_columns).
+        include_adjustments (bool): Also collect the SL/PT adjustment records.
+
+    Returns:
+        dict: {"trades": DataFrame (TRADE_REPORT_COLUMNS), "adjustments": DataFrame (ADJUSTMENT_REPORT_COLUMNS)}
     """
-    print("\nTrade Summary:")
-    print("-" * 50)
+    fields = [name for name in TRADE_REPORT_COLUMNS if name not in (
+        "position_value", "partial_sale_total", "final_sale_total",
+        "total_return_percentage", "total_return_dollars")]
+    columns = trade_columns(trades)
+    report = pd.DataFrame({name: columns[name] for name in fields})
+    # Share counts print as ints, with None where missing
+    for name in ("initial_amount", "partial_sale_amount", "remaining_sale_amount"):
+        values = columns[name]
+        report[name] = pd.Series(np.where(values == MISSING, None, values.astype(object)), dtype=object)
+
+    # Totals, vectorized (same arithmetic as per trade)
+    entry_price = report["entry_price"].to_numpy(dtype=float)
+    initial_amount = report["initial_amount"].to_numpy(dtype=float)
+    partial_done = report["partial_sale_done"].to_numpy(dtype=bool)
+    position_value = entry_price * initial_amount
+    partial_sale_total = np.where(
+        partial_done,
+        report["partial_sale_price"].to_numpy(dtype=float) * report["partial_sale_amount"].to_numpy(dtype=float),
+        np.nan
+    )
+    final_sale_total = (report["remaining_price"].to_numpy(dtype=float)
+                        * report["remaining_sale_amount"].to_numpy(dtype=float))
+    total_sale_value = np.where(partial_done, partial_sale_total, 0) + final_sale_total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return_percentage = np.where(
+            position_value != 0, ((total_sale_value / position_value) - 1) * 100, 0
+        )
+    report["position_value"] = position_value
+    report["partial_sale_total"] = partial_sale_total
+    report["final_sale_total"] = final_sale_total
+    report["total_return_percentage"] = total_return_percentage
+    report["total_return_dollars"] = total_sale_value - position_value
+    report = report[TRADE_REPORT_COLUMNS]
+
+    if include_adjustments:
+        log = adjustment_columns(trades)
+        adjustments = pd.DataFrame({name: log[name] for name in ADJUSTMENT_REPORT_COLUMNS})
+    else:
+        adjustments = pd.DataFrame({name: [] for name in ADJUSTMENT_REPORT_COLUMNS}, columns=ADJUSTMENT_REPORT_COLUMNS)
+
+    return {"trades": report, "adjustments": adjustments}
 
-    for trade_id, trade in trades.items():
-        # ----- ENTRY DETAILS -----
-        # Convert entry date/time to "DD/MM/YYYY HH:MM" format.
-        entry_date_str = (
-            trade["entry_date"].strftime("%d/%m/%Y")
-            if trade["entry_date"] else "N/A"
+def _format_dates(values, date_format):
+    """
+    Formats a column of dates in one vectorized call; missing dates become "N/A".
+    """
+    # Dates repeat a lot (adjustments happen on shared trading days): format each distinct date once
+    codes, uniques = pd.factorize(pd.to_datetime(pd.Series(values, dtype=object), errors='coerce'))
+    labels = np.array(list(uniques.strftime(date_format)) + ["N/A"], dtype=object)
+    return labels[codes].tolist()
+
+def _format_money(values):
+    return [f"{value:.2f}" for value in values.tolist()]
+
+def _render_text(report, verbosity):
+    trades = report["trades"]
+    lines = ["", "Trade Summary:", "-" * 50]
+
+    if verbosity == VERBOSITY_SUMMARY:
+        lines.append(
+            f"Trades: {len(trades)} | "
+            f"Partial sales: {int(trades['partial_sale_done'].sum())} | "
+            f"Total Return: ${trades['total_return_dollars'].sum():.2f}"
         )
-        entry_price = trade["entry_price"]
-        initial_amount = trade["initial_amount"]
-        position_value = entry_price * initial_amount
-        first_SL = trade["first_SL"]
-        first_PT = trade["first_PT"]
-
-        print(
-            f"Entry {entry_date_str} @ ${entry_price:.2f} | "
-            f"SL @ ${first_SL:.2f} | PT @ ${first_PT:.2f} | "
-            f"Size: {initial_amount} shares | Position: ${position_value:.2f}"
+        lines.append("-" * 50)
+        lines.append("End of Trade Summary")
+        return "\n".join(lines) + "\n"
+
+    entry_dates = _format_dates(trades["entry_date"], "%d/%m/%Y")
+    partial_dates = _format_dates(trades["partial_sale_date"], "%d/%m/%Y %H:%M")
+    remaining_dates = _format_dates(trades["remaining_date"], "%d/%m/%Y %H:%M")
+    entry_prices = _format_money(trades["entry_price"])
+    first_SLs = _format_money(trades["first_SL"])
+    first_PTs = _format_money(trades["first_PT"])
+    position_values = _format_money(trades["position_value"])
+    remaining_prices = _format_money(trades["remaining_price"])
+    final_totals = _format_money(trades["final_sale_total"])
+    return_percentages = _format_money(trades["total_return_percentage"])
+    return_dollars = _format_money(trades["total_return_dollars"])
+    reason_labels = {"adjusted_SL": "Stop loss", "adjusted_PT": "Profit target"}
+
+    # Adjustment lines grouped by trade and stage, formatted in one pass
+    adjustment_lines = defaultdict(list)
+    if verbosity >= VERBOSITY_ADJUSTMENTS and not report["adjustments"].empty:
+        adjustments = report["adjustments"]
+        adjustment_dates = _format_dates(adjustments["adjustment_date"], "%d/%m/%Y")
+        for trade_id, stage, date_str, adjusted_SL, adjusted_PT in zip(
+                adjustments["trade_id"].tolist(), adjustments["adjustment_stage"].tolist(), adjustment_dates,
+                _format_money(adjustments["adjusted_SL"]), _format_money(adjustments["adjusted_PT"])):
+            adjustment_lines[(trade_id, stage)].append(
+                f"Adjusted targets on {date_str} | SL @ ${adjusted_SL} | PT @ ${adjusted_PT}"
+            )
+
+    for i, trade in enumerate(trades.itertuples(index=False)):
+        lines.append(
+            f"Entry {entry_dates[i]} @ ${entry_prices[i]} | "
+            f"SL @ ${first_SLs[i]} | PT @ ${first_PTs[i]} | "
+            f"Size: {trade.initial_amount} shares | Position: ${position_values[i]}"
         )
+        lines.extend(adjustment_lines.get((trade.trade_id, "entry"), []))
 
-        # ----- ENTRY ADJUSTMENTS -----
-        # We will print "Adjusted targets on ..." with **just the date**.
-        for adjustment in trade["adjustments"]:
-            if adjustment["adjustment_stage"] == "entry":
-                # Convert the adjustment date/time but only print the date (DD/MM/YYYY)
-                # for the "Adjusted targets on ..." line.
-                if adjustment["adjustment_date"] is not None:
-                    # Here is the key difference: we use "%d/%m/%Y" only
-                    adjustment_date_str = adjustment["adjustment_date"].strftime("%d/%m/%Y")
-                else:
-                    adjustment_date_str = "N/A"
-
-                adjusted_SL = adjustment["adjusted_SL"]
-                adjusted_PT = adjustment["adjusted_PT"]
-
-                print(
-                    f"Adjusted targets on {adjustment_date_str} | "
-                    f"SL @ ${adjusted_SL:.2f} | PT @ ${adjusted_PT:.2f}"
-                )
-
-        # ----- PARTIAL SALE -----
-        if trade["partial_sale_done"]:
-            # Convert partial sale date/time to "DD/MM/YYYY HH:MM"
-            partial_sale_date_str = (
-                trade["partial_sale_date"].strftime("%d/%m/%Y %H:%M")
-                if trade["partial_sale_date"] else "N/A"
-            )
-            partial_sale_price = trade["partial_sale_price"]
-            partial_sale_amount = trade["partial_sale_amount"]
-            partial_sale_total = partial_sale_price * partial_sale_amount
-            second_SL = trade["second_SL"]
-            second_PT = trade["second_PT"]
-
-            print(
-                f"First profit target hit on {partial_sale_date_str} @ ${partial_sale_price:.2f} | "
-                f"SL @ ${second_SL:.2f} | PT @ ${second_PT:.2f} | "
-                f"Shares sold: {partial_sale_amount} | Total Sale: ${partial_sale_total:.2f}"
+        if trade.partial_sale_done:
+            lines.append(
+                f"First profit target hit on {partial_dates[i]} @ ${trade.partial_sale_price:.2f} | "
+                f"SL @ ${trade.second_SL:.2f} | PT @ ${trade.second_PT:.2f} | "
+                f"Shares sold: {trade.partial_sale_amount} | Total Sale: ${trade.partial_sale_total:.2f}"
             )
+            lines.extend(adjustment_lines.get((trade.trade_id, "partial"), []))
 
-            # ----- PARTIAL SALE ADJUSTMENTS -----
-            # Again, let's do the same for partial adjustments: only date, no HH:MM.
-            for adjustment in trade["adjustments"]:
-                if adjustment["adjustment_stage"] == "partial":
-                    if adjustment["adjustment_date"] is not None:
-                        adjustment_date_str = adjustment["adjustment_date"].strftime("%d/%m/%Y")
-                    else:
-                        adjustment_date_str = "N/A"
-                    adjusted_SL = adjustment["adjusted_SL"]
-                    adjusted_PT = adjustment["adjusted_PT"]
-                    print(
-                        f"Adjusted targets on {adjustment_date_str} | "
-                        f"SL @ ${adjusted_SL:.2f} | PT @ ${adjusted_PT:.2f}"
-                    )
-
-        # ----- FINAL (OR REMAINING) SALE -----
-        # Convert final sale date/time to "DD/MM/YYYY HH:MM"
-        remaining_date_str = (
-            trade["remaining_date"].strftime("%d/%m/%Y %H:%M")
-            if trade["remaining_date"] else "N/A"
-        )
-        remaining_price = trade["remaining_price"]
-        remaining_sale_amount = trade["remaining_sale_amount"]
-        final_sale_total = remaining_price * remaining_sale_amount
-
-        # Map 'adjusted_SL' -> 'Stop loss' or 'adjusted_PT' -> 'Profit target'
-        # If your logic sets "remaining_reason" to "End of Simulation", you might want a fallback label.
-        if trade["remaining_reason"] == "adjusted_SL":
-            reason_str = "Stop loss"
-        elif trade["remaining_reason"] == "adjusted_PT":
-            reason_str = "Profit target"
-        else:
-            reason_str = "End of Simulation"
-
-        print(
-            f"{reason_str} hit on {remaining_date_str} @ ${remaining_price:.2f} | "
-            f"Shares sold: {remaining_sale_amount} | Total Sale: ${final_sale_total:.2f}."
+        reason_str = reason_labels.get(trade.remaining_reason, "End of Simulation")
+        lines.append(
+            f"{reason_str} hit on {remaining_dates[i]} @ ${remaining_prices[i]} | "
+            f"Shares sold: {trade.remaining_sale_amount} | Total Sale: ${final_totals[i]}."
         )
+        lines.append(f"Total Return: {return_percentages[i]}% (${return_dollars[i]}).")
+        lines.append("-" * 50)
 
-        # ----- TOTAL RETURN -----
-        total_sale_value = (
-            (partial_sale_total if trade["partial_sale_done"] else 0) + final_sale_total
-        )
-        total_return_percentage = ((total_sale_value / position_value) - 1) * 100 if position_value != 0 else 0
-        total_return_dollars = total_sale_value - position_value
+    lines.append("End of Trade Summary")
+    return "\n".join(lines) + "\n"
 
-        print(f"Total Return: {total_return_percentage:.2f}% (${total_return_dollars:.2f}).")
-        print("-" * 50)
+def render_trade_report(report, fmt="text", verbosity=VERBOSITY_ADJUSTMENTS):
+    """
+    Renders a report from build_trade_report to a string.
 
-    print("End of Trade Summary")
+    Args:
+        report (dict): Output of build_trade_report.
+        fmt (str): "text" (the classic trade summary), "csv" or "json".
+        verbosity (int): One of the VERBOSITY_* levels.
 
+    Returns:
+        str: The rendered report ("" for VERBOSITY_OFF).
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"fmt must be one of {REPORT_FORMATS}, got {fmt!r}")
+    if verbosity <= VERBOSITY_OFF:
+        return ""
+    if fmt == "text":
+        return _render_text(report, verbosity)
+
+    trades = report["trades"]
+    if verbosity == VERBOSITY_SUMMARY:
+        trades = pd.DataFrame([{
+            "trades": len(trades),
+            "partial_sales": int(trades["partial_sale_done"].sum()),
+            "total_return_dollars": trades["total_return_dollars"].sum()
+        }])
+    include_adjustments = verbosity >= VERBOSITY_ADJUSTMENTS
+
+    if fmt == "csv":
+        text = trades.to_csv(index=False, date_format="%Y-%m-%d %H:%M:%S")
+        if include_adjustments:
+            # Second table, separated by an empty line
+            text += "\n" + report["adjustments"].to_csv(index=False, date_format="%Y-%m-%d %H:%M:%S")
+        return text
+
+    payload = {"trades": json.loads(trades.to_json(orient="records", date_format="iso"))}
+    if include_adjustments:
+        payload["adjustments"] = json.loads(report["adjustments"].to_json(orient="records", date_format="iso"))
+    return json.dumps(payload) + "\n"
+
+def trade_summary(trades, verbosity=VERBOSITY_ADJUSTMENTS, fmt="text", stream=None):
+    """
+    Prints a summary of all trades, detailing entry, partial sale, adjustments, final sale, and total return.
+    The report is built as columnar data once and written in a single buffered write.
 
+    Args:
+        trades (TradeLedger or dict): Trade IDs -> trade details (read as columns, see trade_columns).
+        verbosity (int): VERBOSITY_OFF skips all formatting; see the VERBOSITY_* levels.
+        fmt (str): "text", "csv" or "json".
+        stream (file): Where to write (default: sys.stdout).
+    """
+    if verbosity <= VERBOSITY_OFF:
+        return
+    report = build_trade_report(trades, include_adjustments=verbosity >= VERBOSITY_ADJUSTMENTS)
+    output = render_trade_report(report, fmt, verbosity)
+    (stream if stream is not None else sys.stdout).write(output)
 
 
-def final_summary(trades, budget_manager, stock_data, ticker):
+def _amounts(values):
+    # Share count column as float64, NaN where missing
+    return np.where(values == MISSING, np.nan, values.astype(np.float64))
+
+def _running_total(values):
+    # Sum in trade order (same rounding as adding the trades one by one)
+    return float(np.cumsum(values)[-1]) if len(values) else 0
+
+def summary_metrics(trades, budget_manager, stock_data):
     """
-    Prints a final summary of the trading simulation.
+    Computes the final summary metrics of a trading simulation.
 
     Args:
-        trades (dict): Dictionary of trades grouped by ticker.
+        trades (TradeLedger or dict): Trades (read as columns, see trade_columns).
         budget_manager (BudgetManager): Manages liquidity and contributions.
         stock_data (pd.DataFrame): Stock data used in the simulation.
-        ticker (str): Ticker symbol of the stock being traded.
+
+    Returns:
+        dict: Summary metrics (profit, returns, win rate, commissions, ...).
     """
-    # Initialize metrics
-    total_trades = 0
-    total_winning_trades = 0
-    total_losing_trades = 0
-    total_profit = 0
+    columns = trade_columns(trades)
     total_capital = budget_manager.get_total_liquidity()
     total_contributions = budget_manager.get_total_contributions()
-    total_hold_time_days = 0  # Sum of all hold times
-
-    # Lists to store individual trade returns for computing average win/loss
-    winning_returns = []
-    losing_returns = []
-
-    # Process each trade
-    for trade_id, trade in trades.items():
-        total_trades += 1
-
-        # Calculate total sale value
-        partial_sale_value = (trade["partial_sale_amount"] * trade["partial_sale_price"]
-                              if trade["partial_sale_done"] else 0)
-        remaining_sale_value = trade["remaining_sale_amount"] * trade["remaining_price"]
-        total_trade_profit = (partial_sale_value + remaining_sale_value) - (
-            trade["entry_price"] * trade["initial_amount"])
-
-        # Trade return percentage
-        entry_cost = trade["entry_price"] * trade["initial_amount"]
-        trade_return_percentage = (total_trade_profit / entry_cost * 100) if entry_cost != 0 else 0
-
-        # Update total profit
-        total_profit += total_trade_profit
-
-        # Determine winning/losing trade
-        if (trade["partial_sale_done"] and trade["partial_sale_price"] > trade["entry_price"]) or \
-           (trade["remaining_price"] > trade["entry_price"]):
-            total_winning_trades += 1
-            winning_returns.append(trade_return_percentage)
-        else:
-            total_losing_trades += 1
-            losing_returns.append(trade_return_percentage)
-
-        # Calculate hold time for the trade
-        entry_date = trade["entry_date"]
-        remaining_date = trade["remaining_date"]
-        hold_time_days = (remaining_date - entry_date).days
-        total_hold_time_days += hold_time_days
+
+    # Per-trade sale values, profit and return (same arithmetic as per trade)
+    entry_price = columns["entry_price"]
+    partial_done = columns["partial_sale_done"]
+    partial_price = columns["partial_sale_price"]
+    remaining_price = columns["remaining_price"]
+    partial_sale_value = np.where(partial_done, _amounts(columns["partial_sale_amount"]) * partial_price, 0)
+    remaining_sale_value = _amounts(columns["remaining_sale_amount"]) * remaining_price
+    entry_cost = entry_price * _amounts(columns["initial_amount"])
+    total_trade_profit = (partial_sale_value + remaining_sale_value) - entry_cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trade_return_percentage = np.where(entry_cost != 0, total_trade_profit / entry_cost * 100, 0)
+
+    # Winning trade: partial sale or final sale above the entry price
+    winning = (partial_done & (partial_price > entry_price)) | (remaining_price > entry_price)
+    winning_returns = trade_return_percentage[winning]
+    losing_returns = trade_return_percentage[~winning]
+
+    total_trades = len(entry_price)
+    total_winning_trades = int(winning.sum())
+    total_losing_trades = total_trades - total_winning_trades
+    total_profit = _running_total(total_trade_profit)
+    total_hold_time_days = int((columns["remaining_date"] - columns["entry_date"]).days.to_numpy().sum())
 
     # Calculate final metrics
     win_rate = (total_winning_trades / total_trades * 100) if total_trades > 0 else 0
@@ -199,8 +280,8 @@ def final_summary(trades, budget_manager, stock_data, ticker):
     average_hold_time_days = (total_hold_time_days / total_trades) if total_trades > 0 else 0
 
     # Compute average win/loss
-    average_win = sum(winning_returns) / len(winning_returns) if winning_returns else 0
-    average_loss = sum(losing_returns) / len(losing_returns) if losing_returns else 0
+    average_win = _running_total(winning_returns) / len(winning_returns) if len(winning_returns) else 0
+    average_loss = _running_total(losing_returns) / len(losing_returns) if len(losing_returns) else 0
 
     # Stock performance
     initial_price = stock_data.iloc[0]["Close"]
@@ -209,7 +290,7 @@ def final_summary(trades, budget_manager, stock_data, ticker):
 
     # S&P return for the period
     sp_data = stock_data["Index"].iloc[0] if "Index" in stock_data.columns else "N/A"
-    sp_return = sp_data * 100 if isinstance(sp_data, (float, int)) else "N/A"
+    sp_return = float(sp_data) * 100 if isinstance(sp_data, numbers.Real) else "N/A"
 
     # Compute commissions after all trades processed
     total_commissions = calculate_commissions(trades)
@@ -220,31 +301,76 @@ def final_summary(trades, budget_manager, stock_data, ticker):
     else:
         return_after_commissions = 0
 
-    # Print summary
+    return {
+        "total_profit": total_profit,
+        "total_return_percentage": total_return_percentage,
+        "total_capital": total_capital,
+        "total_contributions": total_contributions,
+        "total_trades": total_trades,
+        "total_winning_trades": total_winning_trades,
+        "total_losing_trades": total_losing_trades,
+        "win_rate": win_rate,
+        "average_hold_time_days": average_hold_time_days,
+        "average_win": average_win,
+        "average_loss": average_loss,
+        "total_commissions": total_commissions,
+        "return_after_commissions": return_after_commissions,
+        "initial_price": initial_price,
+        "final_price": final_price,
+        "stock_return": stock_return,
+        "sp_return": sp_return
+    }
+
+
+def print_summary_metrics(metrics, ticker):
+    """
+    Prints summary metrics produced by summary_metrics.
+
+    Args:
+        metrics (dict): Output of summary_metrics.
+        ticker (str): Ticker symbol of the stock being traded.
+    """
+    sp_return = metrics["sp_return"]
+
     print("\nFinal Summary:")
     print("-" * 50)
     print(
-        f"Total Profit/Loss: ${total_profit:.2f}  | Total Return: {total_return_percentage:.2f}%  | "
-        f"Total Capital: ${total_capital:.2f} | Total Contributions: ${total_contributions:.2f}"
+        f"Total Profit/Loss: ${metrics['total_profit']:.2f}  | Total Return: {metrics['total_return_percentage']:.2f}%  | "
+        f"Total Capital: ${metrics['total_capital']:.2f} | Total Contributions: ${metrics['total_contributions']:.2f}"
     )
     print(
-        f"Total Trades Executed: {total_trades} | Winning Trades: {total_winning_trades} | "
-        f"Losing Trades: {total_losing_trades} | Win Rate: {win_rate:.2f}%"
+        f"Total Trades Executed: {metrics['total_trades']} | Winning Trades: {metrics['total_winning_trades']} | "
+        f"Losing Trades: {metrics['total_losing_trades']} | Win Rate: {metrics['win_rate']:.2f}%"
     )
     print(
-        f"Average Position Hold Time: {average_hold_time_days:.1f} days | "
-        f"Average win: {average_win:.2f}% | Average loss: {average_loss:.2f}%"
+        f"Average Position Hold Time: {metrics['average_hold_time_days']:.1f} days | "
+        f"Average win: {metrics['average_win']:.2f}% | Average loss: {metrics['average_loss']:.2f}%"
     )
     print(
-        f"Commissions: ${total_commissions:.2f} | Return After Commissions: {return_after_commissions:.2f}%"
+        f"Commissions: ${metrics['total_commissions']:.2f} | "
+        f"Return After Commissions: {metrics['return_after_commissions']:.2f}%"
     )
     print(
         f"Ticker Traded: {ticker}\n"
-        f"{ticker} Performance: ${initial_price:.2f} -> ${final_price:.2f} ({stock_return:.2f}%). "
+        f"{ticker} Performance: ${metrics['initial_price']:.2f} -> ${metrics['final_price']:.2f} "
+        f"({metrics['stock_return']:.2f}%). "
         f"S&P Return: {sp_return if isinstance(sp_return, str) else f'{sp_return:.2f}%'}."
     )
     print("-" * 50)
 
+
+def final_summary(trades, budget_manager, stock_data, ticker):
+    """
+    Prints a final summary of the trading simulation.
+
+    Args:
+        trades (TradeLedger or dict): Trades (read as columns, see trade_columns).
+        budget_manager (BudgetManager): Manages liquidity and contributions.
+        stock_data (pd.DataFrame): Stock data used in the simulation.
+        ticker (str): Ticker symbol of the stock being traded.
+    """
+    print_summary_metrics(summary_metrics(trades, budget_manager, stock_data), ticker)
+
 def calculate_commissions(trades):
     """
     Calculates the total commissions paid for all trades based on Interactive Brokers fee structure.
@@ -260,43 +386,36 @@ def calculate_commissions(trades):
     - Maximum per order: 1% of the trade value (shares * execution_price).
 
     Args:
-        trades (dict): Dictionary of all trades.
+        trades (TradeLedger or dict): Trades (read as columns, see trade_columns).
 
     Returns:
         float: The total commissions paid.
     """
-    total_commissions = 0.0
+    columns = trade_columns(trades)
 
-    def commission_for_order(shares, price):
-        if shares <= 0:
-            return 0.0
-        # Calculate raw commission
+    def commission_for_orders(shares, price, placed):
+        # Calculate raw commission, then apply minimum ($1) and maximum (1% of trade value)
         raw_commission = shares * 0.005
         trade_value = shares * price
-        # Apply minimum and maximum
-        commission = max(raw_commission, 1.0)  # minimum $1
-        commission = min(commission, 0.01 * trade_value)  # max 1% of trade value
-        return commission
-
-    for trade_id, trade in trades.items():
-        # Entry commission
-        entry_shares = trade["initial_amount"]
-        entry_price = trade["entry_price"]
-        total_commissions += commission_for_order(entry_shares, entry_price)
-
-        # Partial sale commission (if applicable)
-        if trade["partial_sale_done"] and trade["partial_sale_amount"] and trade["partial_sale_price"]:
-            partial_shares = trade["partial_sale_amount"]
-            partial_price = trade["partial_sale_price"]
-            total_commissions += commission_for_order(partial_shares, partial_price)
-
-        # Remaining sale commission
-        # At end of trade, remaining shares are sold at remaining_price
-        if trade["remaining_sale_amount"] and trade["remaining_price"]:
-            remaining_shares = trade["remaining_sale_amount"]
-            remaining_price = trade["remaining_price"]
-            total_commissions += commission_for_order(remaining_shares, remaining_price)
-
-    return total_commissions
+        commission = np.minimum(np.maximum(raw_commission, 1.0), 0.01 * trade_value)
+        return np.where(placed & (shares > 0), commission, 0.0)
+
+    # Entry, partial sale (if applicable) and remaining sale (at the end of the trade) orders
+    entry_shares = _amounts(columns["initial_amount"])
+    partial_shares = _amounts(columns["partial_sale_amount"])
+    partial_price = columns["partial_sale_price"]
+    remaining_shares = _amounts(columns["remaining_sale_amount"])
+    remaining_price = columns["remaining_price"]
+    with np.errstate(invalid='ignore'):
+        orders = np.column_stack([
+            commission_for_orders(entry_shares, columns["entry_price"], np.ones(len(entry_shares), dtype=bool)),
+            commission_for_orders(partial_shares, partial_price, columns["partial_sale_done"]
+                                  & (partial_shares > 0) & (partial_price != 0) & ~np.isnan(partial_price)),
+            commission_for_orders(remaining_shares, remaining_price, (remaining_shares != 0)
+                                  & ~np.isnan(remaining_shares) & (remaining_price != 0) & ~np.isnan(remaining_price))
+        ])
+
+    # Summed order by order, trade by trade
+    return float(np.cumsum(orders.ravel())[-1]) if orders.size else 0.0
 
 